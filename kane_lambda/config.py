@@ -2,6 +2,7 @@
 """
 Configuration module for feature toggles and constants.
 """
+import os
 
 # Feature toggles
 ENABLE_K_SHEET_CLEAN = False
@@ -557,4 +558,145 @@ You are a structured news assistant.
 
         INPUT:
         {batch}
-"""
\ No newline at end of file
+"""
+
+# Sheets write-behind buffer (see k_sheet_writer.py)
+SHEET_APPEND_MAX_ROWS = 200  # max rows per append call
+SHEET_APPEND_MAX_BYTES = 512 * 1024  # max JSON payload bytes per append call
+SHEET_APPEND_FLUSH_SECONDS = 30  # flush pending rows at least this often
+SHEET_APPEND_MAX_RETRIES = 5  # retries per chunk on transient errors
+SHEET_APPEND_SPILL_DIR = "/tmp/kane_spill"  # unflushed rows are dumped here if all retries fail
+
+# Google API quotas per minute for the service account (see k_api_scheduler.py)
+SHEETS_READ_QUOTA_PER_MIN = 60
+SHEETS_WRITE_QUOTA_PER_MIN = 60
+DOCS_READ_QUOTA_PER_MIN = 300
+DOCS_WRITE_QUOTA_PER_MIN = 60
+DRIVE_WRITE_QUOTA_PER_MIN = 60
+API_MAX_RETRIES = 5  # retries on 429/5xx before giving up
+API_BACKOFF_CAP_SECONDS = 32
+
+# Archive tier for rows dropped by k_sheet_clean (see k_archive.py)
+# Local directory or s3://bucket/prefix. Lambda's /tmp goes away with the container, so archiving
+# is only on by default for an s3:// root; KANE_ARCHIVE=1 turns it on for a local one outside Lambda
+ARCHIVE_ROOT = os.environ.get("KANE_ARCHIVE_ROOT", "/tmp/kane_archive")
+ENABLE_ARCHIVE = os.environ.get("KANE_ARCHIVE", "1" if ARCHIVE_ROOT.startswith("s3://") else "0") == "1"
+
+# Google API backend: "google" for the live APIs, "emulator" for the in-process stand-in (see k_emulator.py)
+GOOGLE_BACKEND = os.environ.get("KANE_GOOGLE_BACKEND", "google")
+EMULATOR_LATENCY_MS = float(os.environ.get("KANE_EMULATOR_LATENCY_MS", "0"))  # mean added latency per call
+EMULATOR_LATENCY_JITTER_MS = float(os.environ.get("KANE_EMULATOR_LATENCY_JITTER_MS", "0"))
+EMULATOR_ERROR_RATE = float(os.environ.get("KANE_EMULATOR_ERROR_RATE", "0"))  # fraction of calls failing with 503
+EMULATOR_READ_QUOTA_PER_MIN = int(os.environ.get("KANE_EMULATOR_READ_QUOTA", "0"))  # 0 = unlimited
+EMULATOR_WRITE_QUOTA_PER_MIN = int(os.environ.get("KANE_EMULATOR_WRITE_QUOTA", "0"))
+EMULATOR_SEED_FILE = os.environ.get("KANE_EMULATOR_SEED", "")  # optional JSON snapshot to preload
+
+# Story ID allocation (see k_id_allocator.py)
+ID_ALLOCATOR_BACKEND = os.environ.get("KANE_ID_ALLOCATOR", "sheet")  # "sheet" or "local"
+ID_ALLOCATOR_SHEET = "id_blocks"  # tab that records one row per reservation; created on first use
+ID_BLOCK_SIZE = 1000  # IDs taken by each row written before reservations recorded their exact size
+ID_BLOCK_BASE = 100000  # reserved IDs start above any ID clean_sheets can renumber to
+ID_ALLOCATOR_READ_ROWS = 50  # reservation rows read back per request while looking for the last recorded ID
+ID_ALLOCATOR_LOCAL_PATH = os.environ.get("KANE_ID_ALLOCATOR_PATH", "/tmp/kane_story_id")
+
+# Rolling newsletter output docs (see k_doc_shards.py)
+DOC_ROLLOVER = os.environ.get("KANE_DOC_ROLLOVER", "none")  # "none" (EXISTING_DOC_ID), "week" or "month"
+DOC_INDEX_SHEET = "doc_index"  # row per period: period key, doc ID, created at
+DOC_INDEX_EPOCH = "2024-01-01"  # period 0; a period's row is its number since this date + 2
+DOC_TITLE_TEMPLATE = "Exponential View Special AI Daily Newsletter — {period}"
+# Emails given writer access to new docs, comma-separated. Required with a rollover: new docs are
+# owned by the service account, so nobody else could open them
+DOC_SHARE_WITH = [e.strip() for e in os.environ.get("KANE_DOC_SHARE_WITH", "").split(",") if e.strip()]
+
+# Newsletter story selection (see k_selection.py)
+SELECTION_PER_CATEGORY = 6
+# Max stories from one source across the whole newsletter, not per category. Before
+# k_selection there was no cap, so this changes which stories appear; 0 turns it off
+SELECTION_PER_SOURCE_CAP = int(os.environ.get("KANE_SELECTION_PER_SOURCE_CAP", "2"))
+SELECTION_DEDUP_THRESHOLD = 0.6  # word-set Jaccard similarity above which blurbs count as duplicates
+SELECTION_CANDIDATE_FACTOR = 4  # heap keeps factor * per_category candidates to absorb caps/dedup
+SELECTION_RECENCY_DAYS = 7  # recency bonus decays linearly to 0 over this many days
+SELECTION_WEIGHTS = {
+    "significance_score": 1.0,  # 0-10 from the significance model
+    "relevant": 3.0,  # bonus when the relevance model said yes
+    "human_priority": 5.0,  # per point of manual priority
+    "recency": 2.0,  # 1.0 for today, 0.0 at SELECTION_RECENCY_DAYS
+}
+
+# Rendered newsletters (HTML/Markdown/text) are cached here per date (see k_render.py)
+RENDER_CACHE_DIR = os.environ.get("KANE_RENDER_CACHE_DIR", "/tmp/kane_renders")
+
+# Date index tabs for pushdown reads (see k_sheet_index.py)
+ENABLE_SHEET_INDEX = True
+SHEET_INDEX_SUFFIX = "_index"  # "prioritizer" is indexed in "prioritizer_index"
+SHEET_INDEX_BLOCK_ROWS = 200  # rows per index entry when clean_sheets rebuilds an index
+
+# Pipeline stage executor (see k_dag.py and k_master.py)
+# Timeouts are checked by the stages between LLM batches, so only the stages
+# that batch have one; the others run to completion. The Lambda itself is capped at 900s.
+STAGE_TIMEOUTS = {  # seconds
+    "headscanner": 300,
+    "prioritizer": 480,
+}
+
+# Lambda deadline handling (see k_deadline.py)
+LAMBDA_SAFETY_MARGIN_SECONDS = 30  # kept free at the end of an invocation for flushing writes and returning
+PRIORITIZER_BATCH_ESTIMATE_SECONDS = 60  # assumed length of the first batch, before any has been timed
+HEADSCANNER_BATCH_ESTIMATE_SECONDS = 30
+
+# Sharded fan-out across concurrent invocations (see k_fanout.py)
+FANOUT_SHARDS = int(os.environ.get("KANE_FANOUT_SHARDS", "4"))
+FANOUT_INVOKER = os.environ.get("KANE_FANOUT_INVOKER", "lambda")  # "lambda" (invoke this function per shard) or "local" (process pool)
+# Function invoked per shard; the Lambda runtime sets AWS_LAMBDA_FUNCTION_NAME for the current function
+FANOUT_FUNCTION_NAME = os.environ.get("KANE_FANOUT_FUNCTION", os.environ.get("AWS_LAMBDA_FUNCTION_NAME", ""))
+
+# Container-scoped caches reused by warm Lambda invocations (see k_state.py)
+ENABLE_CONTAINER_CACHE = os.environ.get("KANE_CONTAINER_CACHE", "1") != "0"
+CREDENTIALS_CACHE_TTL_SECONDS = 3000  # google-auth refreshes the token itself; this only bounds reuse of the object
+DEDUP_CACHE_TTL_SECONDS = 6 * 3600  # full re-read of the headscanner source_url column at least this often
+FEED_CACHE_TTL_SECONDS = 6 * 3600  # ETag/Last-Modified validators and entries per feed URL
+LLM_CACHE_TTL_SECONDS = 6 * 3600
+LLM_CACHE_MAX_ENTRIES = 512  # oldest responses are dropped first
+LLM_TIMEOUT_SECONDS = 600  # cap on waiting for one completion; shortened to the current deadline
+
+# Span tracing (see k_trace.py)
+ENABLE_TRACING = os.environ.get("KANE_TRACING", "1") != "0"
+# Comma-separated: "jsonl" (one span per line under TRACE_DIR), "emf" (CloudWatch embedded metrics in the logs)
+TRACE_EXPORT = os.environ.get("KANE_TRACE_EXPORT", "emf")
+TRACE_DIR = os.environ.get("KANE_TRACE_DIR", "/tmp/kane_traces")
+TRACE_METRIC_NAMESPACE = "Kane/Pipeline"
+TRACE_SUMMARY_TOP = 12  # rows in the end-of-run time-sink table
+
+# LLM token and cost accounting (see k_usage.py)
+USAGE_ROOT = os.environ.get("KANE_USAGE_ROOT", ARCHIVE_ROOT)  # local dir or s3://bucket/prefix; stored under llm_usage/dt=...
+# Persist each run's usage records for trend analysis; like the archive, on by default only for an s3:// root
+ENABLE_USAGE_LOG = os.environ.get("KANE_USAGE_LOG", "1" if USAGE_ROOT.startswith("s3://") else "0") == "1"
+# USD per million (prompt, completion) tokens, only used when OpenRouter's usage block has no cost
+LLM_PRICES_PER_MTOK = {}
+
+# Outbound HTTP (feeds, OpenRouter): "live", "record" (live + append every exchange to HTTP_ARCHIVE) or "replay"
+HTTP_MODE = os.environ.get("KANE_HTTP_MODE", "live")
+HTTP_ARCHIVE = os.environ.get("KANE_HTTP_ARCHIVE", "/tmp/kane_http/exchanges.jsonl.gz")
+HTTP_REPLAY_LATENCY_SCALE = float(os.environ.get("KANE_HTTP_REPLAY_LATENCY", "1"))  # 1 = recorded latency, 0 = none
+HTTP_TIMEOUT_SECONDS = 30
+
+# On-demand stage profiling (see k_profile.py); a Lambda event's "profile" key overrides the stages per invocation
+PROFILE_STAGES = os.environ.get("KANE_PROFILE_STAGES", "")  # comma-separated stage names, or "all"; empty = off
+PROFILE_KINDS = os.environ.get("KANE_PROFILE_KINDS", "cpu,memory")
+# Local dir or s3://bucket/prefix; defaults to profiles/ under the archive root. In Lambda a local
+# root would vanish with the container, so reports are then only logged
+PROFILE_ROOT = os.environ.get("KANE_PROFILE_ROOT", f"{ARCHIVE_ROOT.rstrip('/')}/profiles")
+PROFILE_TOP = 25  # functions / allocation sites per report
+PROFILE_TRACEMALLOC_FRAMES = 1  # stack depth recorded per allocation; deeper is slower
+
+# Paged sheet reads (see k_sheet_rows.py)
+SHEET_PAGE_ROWS = int(os.environ.get("KANE_SHEET_PAGE_ROWS", "2000"))  # rows per values.get; one page is held in memory at a time
+
+# Feed parsing (see k_feedparse.py): "fast" (iterparse, feedparser fallback for malformed feeds) or "feedparser"
+FEED_PARSER = os.environ.get("KANE_FEED_PARSER", "fast")
+FEED_STALE_RUN = 5  # stop reading a feed after this many entries in a row older than the cutoff; 0 = read it all
+
+# Feed scheduling in the headscanner: feeds take turns in proportion to their weight (label -> weight, default 1;
+# 0 skips the feed), and a feed stops contributing once it reaches its quota (label -> max stories per run)
+FEED_WEIGHTS = {}
+FEED_QUOTAS = {}
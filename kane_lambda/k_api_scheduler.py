@@ -0,0 +1,228 @@
+"""
+Quota-aware scheduler for Google Sheets and Docs API calls.
+
+Every request goes through ApiScheduler.execute(), which keeps a sliding
+one-minute window per (api, kind) bucket, waits when the configured quota
+would be exceeded, and retries 429/5xx responses with jittered exponential
+backoff. Writes aren't idempotent: after a timeout or 5xx the server may
+have applied them, so they are only retried on 429 (rejected outright)
+unless the caller passes retry_transient=True because a repeat is harmless
+or it reconciles afterwards. Sheets reads can also be queued and coalesced
+into one batchGet; a failed batch is raised to every read queued in it.
+"""
+import random
+import threading
+import time
+from collections import deque
+
+from kane_lambda.config import (
+    SHEETS_READ_QUOTA_PER_MIN,
+    SHEETS_WRITE_QUOTA_PER_MIN,
+    DOCS_READ_QUOTA_PER_MIN,
+    DOCS_WRITE_QUOTA_PER_MIN,
+    DRIVE_WRITE_QUOTA_PER_MIN,
+    API_MAX_RETRIES,
+    API_BACKOFF_CAP_SECONDS,
+)
+from kane_lambda.k_trace import span
+
+WINDOW_SECONDS = 60.0
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+
+DEFAULT_QUOTAS = {
+    ("sheets", "read"): SHEETS_READ_QUOTA_PER_MIN,
+    ("sheets", "write"): SHEETS_WRITE_QUOTA_PER_MIN,
+    ("docs", "read"): DOCS_READ_QUOTA_PER_MIN,
+    ("docs", "write"): DOCS_WRITE_QUOTA_PER_MIN,
+    ("drive", "write"): DRIVE_WRITE_QUOTA_PER_MIN,
+}
+
+
+def error_status(exc):
+    # googleapiclient.errors.HttpError carries the HTTP response as .resp
+    status = getattr(getattr(exc, "resp", None), "status", None)
+    return int(status) if status is not None else None
+
+
+def is_transient_error(exc):
+    status = error_status(exc)
+    if status is not None:
+        return status in TRANSIENT_STATUSES
+    return isinstance(exc, (TimeoutError, ConnectionError))
+
+
+def retry_after_seconds(exc):
+    resp = getattr(exc, "resp", None)
+    try:
+        return float(resp.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class PendingRead:
+    def __init__(self, scheduler, sheet, spreadsheet_id, range_name):
+        self.scheduler = scheduler
+        self.sheet = sheet
+        self.spreadsheet_id = spreadsheet_id
+        self.range_name = range_name
+        self.values = None
+        self.error = None
+        self.done = False
+        self.ready = threading.Event()
+
+    def result(self):
+        if not self.done:
+            self.scheduler.flush_reads()
+            # Another thread's flush may have taken this read; wait for it to finish
+            self.ready.wait()
+        if self.error is not None:
+            raise self.error
+        return self.values
+
+    def _finish(self, values=None, error=None):
+        self.values = values
+        self.error = error
+        self.done = True
+        self.ready.set()
+
+
+class ApiScheduler:
+    def __init__(self, quotas=None, max_retries=API_MAX_RETRIES, backoff_cap=API_BACKOFF_CAP_SECONDS):
+        self.quotas = dict(DEFAULT_QUOTAS if quotas is None else quotas)
+        self.max_retries = max_retries
+        self.backoff_cap = backoff_cap
+        self.lock = threading.Lock()
+        self.windows = {key: deque() for key in self.quotas}
+        self.stats = {
+            key: {"calls": 0, "peak_per_min": 0, "throttle_seconds": 0.0, "retries": 0, "coalesced": 0}
+            for key in self.quotas
+        }
+        self.pending_reads = []
+
+    def execute(self, request, api="sheets", kind="read", max_retries=None, retry_transient=None):
+        """Runs `request` within the quota, retrying transient errors.
+
+        `retry_transient` defaults to True for reads and False for writes,
+        which are then only retried on 429.
+        """
+        # googleapiclient requests carry methodId ("sheets.spreadsheets.values.get"), emulator ones method
+        name = getattr(request, "methodId", None) or getattr(request, "method", None) or f"{api}.{kind}"
+        body = getattr(request, "body", None)
+        with span(name, api=api, kind=kind,
+                  request_bytes=len(body) if isinstance(body, (str, bytes)) else None) as s:
+            return self._execute(request, api, kind, max_retries, retry_transient, s)
+
+    def _execute(self, request, api, kind, max_retries, retry_transient, s):
+        max_retries = self.max_retries if max_retries is None else max_retries
+        if retry_transient is None:
+            retry_transient = kind != "write"
+        attempt = 0
+        while True:
+            self._acquire(api, kind)
+            try:
+                return request.execute()
+            except Exception as e:
+                if attempt >= max_retries or not is_transient_error(e):
+                    raise
+                if not retry_transient and error_status(e) != 429:
+                    raise
+                attempt += 1
+                s.set(retries=attempt)
+                self.stats[(api, kind)]["retries"] += 1
+                # Full jitter, but never retry sooner than the server asked us to
+                delay = random.uniform(0, min(self.backoff_cap, 2 ** attempt))
+                delay = max(delay, retry_after_seconds(e) or 0)
+                print(f"⚠️ {api} {kind} failed ({e}); retry {attempt}/{max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def queue_read(self, sheet, spreadsheet_id, range_name):
+        pending = PendingRead(self, sheet, spreadsheet_id, range_name)
+        with self.lock:
+            self.pending_reads.append(pending)
+        return pending
+
+    def flush_reads(self):
+        with self.lock:
+            pending, self.pending_reads = self.pending_reads, []
+
+        # One batchGet per spreadsheet; identical ranges are fetched once
+        groups = {}
+        for p in pending:
+            groups.setdefault(p.spreadsheet_id, []).append(p)
+
+        for spreadsheet_id, reads in groups.items():
+            ranges = list(dict.fromkeys(p.range_name for p in reads))
+            sheet = reads[0].sheet
+            try:
+                if len(ranges) == 1:
+                    result = self.execute(
+                        sheet.values().get(spreadsheetId=spreadsheet_id, range=ranges[0]))
+                    value_ranges = [result]
+                else:
+                    result = self.execute(
+                        sheet.values().batchGet(spreadsheetId=spreadsheet_id, ranges=ranges))
+                    value_ranges = result.get("valueRanges", [])
+            except Exception as e:
+                # Each read in the batch raises it from result(), not only the one that flushed
+                for p in reads:
+                    p._finish(error=e)
+                continue
+            self.stats[("sheets", "read")]["coalesced"] += len(reads) - 1
+
+            by_range = {r: vr.get("values", []) for r, vr in zip(ranges, value_ranges)}
+            for p in reads:
+                p._finish(by_range.get(p.range_name, []))
+
+    def _acquire(self, api, kind):
+        key = (api, kind)
+        limit = self.quotas[key]
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                window = self.windows[key]
+                while window and now - window[0] >= WINDOW_SECONDS:
+                    window.popleft()
+                if len(window) < limit:
+                    window.append(now)
+                    stats = self.stats[key]
+                    stats["calls"] += 1
+                    stats["peak_per_min"] = max(stats["peak_per_min"], len(window))
+                    return
+                wait = WINDOW_SECONDS - (now - window[0]) + random.uniform(0, 0.5)
+            self.stats[key]["throttle_seconds"] += wait
+            print(f"⏳ {api} {kind} quota reached ({limit}/min); waiting {wait:.1f}s")
+            time.sleep(wait)
+
+    def headroom(self):
+        report = {}
+        for (api, kind), limit in self.quotas.items():
+            stats = self.stats[(api, kind)]
+            report[f"{api}_{kind}"] = {
+                **stats,
+                "limit_per_min": limit,
+                "headroom": round(1 - stats["peak_per_min"] / limit, 3) if limit else 0.0,
+            }
+        return report
+
+    def report(self):
+        for name, r in self.headroom().items():
+            if not r["calls"]:
+                continue
+            print(
+                f"📈 {name}: {r['calls']} calls, peak {r['peak_per_min']}/{r['limit_per_min']} per min "
+                f"({r['headroom']:.0%} headroom), {r['retries']} retries, "
+                f"{r['coalesced']} coalesced, {r['throttle_seconds']:.1f}s throttled"
+            )
+
+
+_scheduler = ApiScheduler()
+
+
+def get_scheduler():
+    return _scheduler
+
+
+def reset_scheduler():
+    global _scheduler
+    _scheduler = ApiScheduler()
+    return _scheduler
@@ -0,0 +1,160 @@
+"""
+Compressed, date-partitioned archive for rows removed from the live sheets.
+
+Layout under ARCHIVE_ROOT (a local directory or s3://bucket/prefix):
+
+    <sheet>/dt=YYYY-MM-DD/part-<epoch_ms>-<pid>.jsonl.gz
+
+Each line is one row dict plus `_archived_at` and `_archive_reason`.
+Range scans only open the partitions whose date falls inside the range.
+Inside Lambda the root must be on S3: /tmp is lost with the container, so
+archive_rows refuses a local root rather than drop the rows there.
+"""
+import gzip
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from kane_lambda.config import ARCHIVE_ROOT
+from kane_lambda.k_dates import to_iso_date
+
+UNKNOWN_PARTITION = "unknown"
+
+
+def partition_for(row, date_field="publication_date"):
+    return to_iso_date(row.get(date_field), default=UNKNOWN_PARTITION)
+
+
+def archive_rows(sheet_name, rows, reason="", root=ARCHIVE_ROOT, date_field="publication_date"):
+    """Write rows to one new gzip part per date partition; returns rows written."""
+    if not rows:
+        return 0
+    if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") and not _is_s3(root):
+        raise RuntimeError(f"Archive root {root!r} is local storage, which Lambda discards; "
+                           "set KANE_ARCHIVE_ROOT (or KANE_USAGE_ROOT) to an s3:// prefix")
+
+    archived_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    by_partition = {}
+    for row in rows:
+        record = dict(row)
+        record["_archived_at"] = archived_at
+        record["_archive_reason"] = row.get("_archive_reason", reason)
+        by_partition.setdefault(partition_for(row, date_field), []).append(record)
+
+    part_name = f"part-{int(time.time() * 1000)}-{os.getpid()}.jsonl.gz"
+    for dt, records in by_partition.items():
+        payload = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        write_bytes(root, f"{sheet_name}/dt={dt}/{part_name}", gzip.compress(payload.encode("utf-8")))
+
+    print(f"🗄️ Archived {len(rows)} rows from '{sheet_name}' into {len(by_partition)} partitions")
+    return len(rows)
+
+
+def list_partitions(sheet_name, root=ARCHIVE_ROOT):
+    """Sorted partition dates for a sheet (UNKNOWN_PARTITION sorts last)."""
+    names = [p[3:] for p in _list_dirs(root, sheet_name) if p.startswith("dt=")]
+    return sorted(names, key=lambda d: (d == UNKNOWN_PARTITION, d))
+
+
+def scan_archive(sheet_name, start=None, end=None, where=None, root=ARCHIVE_ROOT, include_unknown=False):
+    """Yield archived rows with start <= partition date <= end (ISO strings or dates).
+
+    Partitions outside the range are never opened; `where` is an optional
+    row predicate applied while streaming.
+    """
+    start = str(start) if start else None
+    end = str(end) if end else None
+
+    for dt in list_partitions(sheet_name, root):
+        if dt == UNKNOWN_PARTITION:
+            if not include_unknown:
+                continue
+        elif (start and dt < start) or (end and dt > end):
+            continue
+
+        for part in sorted(_list_files(root, f"{sheet_name}/dt={dt}")):
+            with gzip.open(io.BytesIO(_read_bytes(root, part)), "rt", encoding="utf-8") as f:
+                for line in f:
+                    row = json.loads(line)
+                    if where is None or where(row):
+                        yield row
+
+
+# === STORAGE BACKENDS ===
+def _is_s3(root):
+    return root.startswith("s3://")
+
+
+def _s3_location(root, key=""):
+    bucket, _, prefix = root[len("s3://"):].partition("/")
+    prefix = prefix.strip("/")
+    return bucket, "/".join(p for p in (prefix, key) if p)
+
+
+def _s3_client():
+    import boto3  # available in the Lambda runtime; only needed for s3:// roots
+    return boto3.client("s3")
+
+
+def write_bytes(root, key, data):
+    """Writes `data` to `key` under a local directory or s3://bucket/prefix root."""
+    if _is_s3(root):
+        bucket, s3_key = _s3_location(root, key)
+        _s3_client().put_object(Bucket=bucket, Key=s3_key, Body=data)
+        return
+    path = os.path.join(root, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _read_bytes(root, key):
+    if _is_s3(root):
+        bucket, s3_key = _s3_location(root, key)
+        return _s3_client().get_object(Bucket=bucket, Key=s3_key)["Body"].read()
+    with open(os.path.join(root, key), "rb") as f:
+        return f.read()
+
+
+def _list_dirs(root, key):
+    if _is_s3(root):
+        bucket, prefix = _s3_location(root, key)
+        paginator = _s3_client().get_paginator("list_objects_v2")
+        names = []
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix + "/", Delimiter="/"):
+            for cp in page.get("CommonPrefixes", []):
+                names.append(cp["Prefix"].rstrip("/").rsplit("/", 1)[-1])
+        return names
+    path = os.path.join(root, key)
+    if not os.path.isdir(path):
+        return []
+    return [name for name in os.listdir(path) if os.path.isdir(os.path.join(path, name))]
+
+
+def _list_files(root, key):
+    # Returns keys relative to root
+    if _is_s3(root):
+        bucket, prefix = _s3_location(root, key)
+        base_len = len(_s3_location(root)[1])
+        paginator = _s3_client().get_paginator("list_objects_v2")
+        keys = []
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix + "/"):
+            for obj in page.get("Contents", []):
+                keys.append(obj["Key"][base_len:].lstrip("/"))
+        return keys
+    path = os.path.join(root, key)
+    if not os.path.isdir(path):
+        return []
+    return [f"{key}/{name}" for name in os.listdir(path) if name.endswith(".jsonl.gz")]
+
+
+if __name__ == "__main__":
+    # Usage: python -m kane_lambda.k_archive <sheet> [start] [end]
+    sheet = sys.argv[1] if len(sys.argv) > 1 else "prioritizer"
+    start_arg = sys.argv[2] if len(sys.argv) > 2 else None
+    end_arg = sys.argv[3] if len(sys.argv) > 3 else None
+    for archived in scan_archive(sheet, start_arg, end_arg):
+        print(json.dumps(archived, ensure_ascii=False))
@@ -0,0 +1,82 @@
+"""
+Client factory for the Google Sheets and Docs services used by every stage.
+
+config.GOOGLE_BACKEND selects the live googleapiclient services ("google")
+or the in-process stand-ins from k_emulator ("emulator"). Credentials and
+parsed discovery documents are container-scoped (k_state), so warm
+invocations skip the key parsing and token fetch.
+"""
+import json
+import os
+
+from kane_lambda import config
+from kane_lambda.config import CREDENTIALS_CACHE_TTL_SECONDS
+from kane_lambda.k_state import container_cache
+
+CREDS_FILE = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "service_account.json"))
+
+SHEETS_SCOPE = "https://www.googleapis.com/auth/spreadsheets"
+SHEETS_READONLY_SCOPE = "https://www.googleapis.com/auth/spreadsheets.readonly"
+DOCS_SCOPE = "https://www.googleapis.com/auth/documents"
+DRIVE_FILE_SCOPE = "https://www.googleapis.com/auth/drive.file"
+
+
+def use_emulator():
+    return config.GOOGLE_BACKEND == "emulator"
+
+
+def _credentials(creds_file, scopes):
+    """Service account credentials, shared by every client in the container.
+
+    Sharing one object means one token fetch per hour instead of one per
+    client; the cached entry is dropped if the key file changes.
+    """
+    from google.oauth2 import service_account
+
+    cache = container_cache("credentials", CREDENTIALS_CACHE_TTL_SECONDS)
+    key = (creds_file, tuple(scopes))
+    mtime = os.path.getmtime(creds_file)
+    entry = cache.get(key, validate=lambda e: e["mtime"] == mtime)
+    if entry is None:
+        creds = service_account.Credentials.from_service_account_file(creds_file, scopes=scopes)
+        entry = cache.put(key, {"mtime": mtime, "creds": creds})
+    return entry["creds"]
+
+
+def _build(api, version, scopes, creds_file):
+    # Parsed discovery documents are cached; each client still gets its own
+    # (not thread-safe) httplib2 connection
+    from googleapiclient import discovery_cache
+    from googleapiclient.discovery import build, build_from_document
+
+    credentials = _credentials(creds_file, scopes)
+    cache = container_cache("discovery", float("inf"))
+    document = cache.get((api, version))
+    if document is None:
+        raw = discovery_cache.get_static_doc(api, version)
+        if raw is None:
+            return build(api, version, credentials=credentials)
+        document = cache.put((api, version), json.loads(raw))
+    return build_from_document(document, credentials=credentials)
+
+
+def build_sheets_service(creds_file=CREDS_FILE, readonly=False):
+    if use_emulator():
+        from kane_lambda import k_emulator
+        return k_emulator.sheets_service()
+    return _build('sheets', 'v4', [SHEETS_READONLY_SCOPE if readonly else SHEETS_SCOPE], creds_file)
+
+
+def build_docs_service(creds_file=CREDS_FILE):
+    if use_emulator():
+        from kane_lambda import k_emulator
+        return k_emulator.docs_service()
+    return _build('docs', 'v1', [DOCS_SCOPE], creds_file)
+
+
+def build_drive_service(creds_file=CREDS_FILE):
+    # Only used to share docs the service account creates
+    if use_emulator():
+        from kane_lambda import k_emulator
+        return k_emulator.drive_service()
+    return _build('drive', 'v3', [DRIVE_FILE_SCOPE], creds_file)
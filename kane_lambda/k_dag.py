@@ -0,0 +1,219 @@
+"""
+Small DAG executor for pipeline stages.
+
+Each Stage names the artifacts it reads (inputs) and produces (outputs).
+run_dag() runs the stages one at a time in the calling thread, each once
+every stage producing one of its inputs has finished (declaration order
+breaks ties). It never raises for a stage: failures, timeouts and skips
+are recorded in the per-stage result dicts it returns, and only the
+stages downstream of a failure are blocked.
+
+A stage's timeout is cooperative. While the stage runs, get_deadline()
+returns a deadline at the stage timeout or the Lambda deadline, whichever
+comes first; the stage checks it between batches and raises
+DeadlineReached with its progress rather than start a batch that won't
+finish. A stage that never checks its deadline runs to completion, so
+only stages that do are given a timeout (STAGE_TIMEOUTS).
+
+Stage statuses: ok, skipped (disabled, or finished in an earlier
+invocation), failed, timeout (stopped at its own timeout; what it wrote
+stands, so its dependents still run, with None for its outputs), blocked
+(an upstream stage failed), deferred (the Lambda deadline from
+k_deadline was reached: the stage stopped at it or was not started; its
+dependents are deferred too). continuation() turns deferred stages into
+a marker that run_dag(resume_from=...) picks up in the next invocation,
+skipping the stages that already finished.
+"""
+import time
+import traceback
+
+from kane_lambda.k_deadline import Deadline, get_deadline, set_deadline, DeadlineReached
+from kane_lambda.k_profile import profiled
+from kane_lambda.k_trace import span
+
+# A stage that stopped at its own timeout has written what it finished, and
+# the stages after it read the sheets, so a timeout doesn't block them
+BLOCKING_STATUSES = {"failed", "blocked"}
+
+
+class Stage:
+    def __init__(self, name, fn, inputs=(), outputs=(), timeout=None, enabled=True):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.timeout = timeout
+        self.enabled = enabled
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, inputs={self.inputs}, outputs={self.outputs})"
+
+
+def _producers(stages, initial):
+    producer_of = {}
+    for stage in stages:
+        for name in stage.outputs:
+            if name in producer_of:
+                raise ValueError(f"Artifact {name!r} produced by both {producer_of[name]!r} and {stage.name!r}")
+            producer_of[name] = stage.name
+    for stage in stages:
+        for name in stage.inputs:
+            if name not in producer_of and name not in initial:
+                raise ValueError(f"Stage {stage.name!r} needs {name!r}, which nothing produces")
+    return producer_of
+
+
+def _check_acyclic(stages, producer_of):
+    deps = {s.name: {producer_of[i] for i in s.inputs if i in producer_of} for s in stages}
+    done = set()
+    while len(done) < len(deps):
+        ready = [name for name, d in deps.items() if name not in done and d <= done]
+        if not ready:
+            raise ValueError(f"Stage graph has a cycle among: {sorted(set(deps) - done)}")
+        done.update(ready)
+    return deps
+
+
+def _ancestors(deps, names):
+    seen = set()
+    stack = [d for name in names for d in deps[name]]
+    while stack:
+        name = stack.pop()
+        if name not in seen:
+            seen.add(name)
+            stack.extend(deps[name])
+    return seen
+
+
+def _result(name, status, reason="", seconds=0.0, started=None, output=None):
+    return {
+        "stage": name,
+        "status": status,
+        "reason": reason,
+        "seconds": round(seconds, 3),
+        "started_at": round(started, 3) if started is not None else None,
+        "output": output,
+    }
+
+
+def _outputs_from(stage, value):
+    # A dict return maps output names to values; anything else feeds every declared output
+    if isinstance(value, dict) and set(value) <= set(stage.outputs) and value:
+        return value
+    return {name: value for name in stage.outputs}
+
+
+def _call_stage(stage, kwargs):
+    with span(f"stage.{stage.name}") as s, profiled(stage.name):
+        value = stage.fn(**kwargs)
+        if isinstance(value, (int, float, str)):
+            s.set(output=value)
+        return value
+
+
+def _unresolved(name, deps, results, deadline, finished_earlier, stage):
+    """A result for a stage that won't run, or None when it should."""
+    upstream = [d for d in deps[name] if results[d]["status"] in BLOCKING_STATUSES]
+    deferred = [d for d in deps[name] if results[d]["status"] == "deferred"]
+    if name in finished_earlier:
+        return _result(name, "skipped", "finished in an earlier invocation")
+    if not stage.enabled:
+        return _result(name, "skipped", "disabled by config")
+    if upstream:
+        return _result(name, "blocked", f"upstream {upstream[0]} {results[upstream[0]]['status']}")
+    if deferred:
+        return _result(name, "deferred", f"upstream {deferred[0]} deferred")
+    if deadline.near():
+        return _result(name, "deferred", "Lambda deadline reached before start")
+    return None
+
+
+def run_dag(stages, initial=None, resume_from=None):
+    """Runs `stages` respecting their input/output dependencies; returns {stage name: result dict}.
+
+    `resume_from` (a stage name or list, from continuation()) skips every
+    stage upstream of those stages; their outputs come from `initial`.
+    """
+    artifacts = dict(initial or {})
+    by_name = {s.name: s for s in stages}
+    if isinstance(resume_from, str):
+        resume_from = [resume_from]
+    unknown = [name for name in resume_from or [] if name not in by_name]
+    if unknown:
+        raise ValueError(f"Cannot resume from unknown stage(s): {unknown}")
+
+    producer_of = _producers(stages, artifacts)
+    deps = _check_acyclic(stages, producer_of)
+    finished_earlier = _ancestors(deps, resume_from or [])
+    deadline = get_deadline()
+
+    results = {}
+    pending = [s.name for s in stages]
+    t0 = time.monotonic()
+    while pending:
+        name = next(n for n in pending if deps[n] <= set(results))
+        pending.remove(name)
+        stage = by_name[name]
+        skipped = _unresolved(name, deps, results, deadline, finished_earlier, stage)
+        if skipped:
+            results[name] = skipped
+            print(f"⏭️ Stage {name} {skipped['status']}: {skipped['reason']}")
+            continue
+
+        # The stage sees whichever comes first: its own timeout or the Lambda deadline
+        timeout = deadline.clip(stage.timeout)
+        own_timeout = stage.timeout is not None and timeout == stage.timeout
+        stage_deadline = Deadline.after(timeout, margin_seconds=0) if timeout is not None else deadline
+        kwargs = {i: artifacts.get(i) for i in stage.inputs}
+        start = time.monotonic()
+        print(f"▶️ Stage {name} started")
+        set_deadline(stage_deadline)
+        try:
+            value = _call_stage(stage, kwargs)
+        except DeadlineReached as e:
+            if own_timeout:
+                results[name] = _result(name, "timeout", f"stopped at its {stage.timeout}s timeout: {e}",
+                                        time.monotonic() - start, start - t0, e.progress)
+            else:
+                results[name] = _result(name, "deferred", str(e), time.monotonic() - start, start - t0, e.progress)
+        except Exception as e:
+            traceback.print_exc()
+            results[name] = _result(name, "failed", f"{type(e).__name__}: {e}", time.monotonic() - start, start - t0)
+        else:
+            artifacts.update(_outputs_from(stage, value))
+            results[name] = _result(name, "ok", "", time.monotonic() - start, start - t0, value)
+        finally:
+            set_deadline(deadline)
+        print(f"⏹️ Stage {name} {results[name]['status']} in {results[name]['seconds']:.1f}s")
+
+    return {s.name: results[s.name] for s in stages}
+
+
+def continuation(results):
+    """Marker for the next invocation, or None when nothing was deferred.
+
+    Only deferred stages whose own upstream wasn't deferred are listed;
+    their dependents run again after them.
+    """
+    deferred = [name for name, r in results.items() if r["status"] == "deferred"]
+    if not deferred:
+        return None
+    downstream = {name for name in deferred if results[name]["reason"].startswith("upstream ")}
+    roots = [name for name in deferred if name not in downstream]
+    return {
+        "resume_from": roots,
+        "progress": {name: results[name]["output"] for name in roots if results[name]["output"]},
+    }
+
+
+def dag_ok(results):
+    return all(r["status"] not in BLOCKING_STATUSES for r in results.values())
+
+
+def report(results):
+    print("🧭 Stage summary:")
+    for r in results.values():
+        line = f"   {r['stage']:<14} {r['status']:<8} {r['seconds']:>8.2f}s"
+        if r["reason"]:
+            line += f"  ({r['reason']})"
+        print(line)
@@ -0,0 +1,81 @@
+"""
+Shared publication-date parsing for every stage.
+
+Almost every value in the sheets is a YYYY-MM-DD string written by
+format_date(), so parse_date() handles ISO dates/datetimes and Google Sheets
+date serials without touching dateutil. Anything else goes through a
+memoized dateutil fallback, so each distinct odd value is parsed (and
+warned about) once per process; dateutil itself is only imported then. parse_dates() parses a whole column,
+resolving each distinct value once.
+"""
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+# Google Sheets / Excel serial day 0
+SERIAL_EPOCH = datetime(1899, 12, 30, tzinfo=timezone.utc)
+FALLBACK_CACHE_SIZE = 4096
+
+
+def _as_utc(dt):
+    return dt.astimezone(timezone.utc) if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _fast_parse(text):
+    """ISO date/datetime or 5-digit serial; returns None when the fast path doesn't apply."""
+    if len(text) == 10 and text[4] == "-" and text[7] == "-":
+        try:
+            return datetime(int(text[:4]), int(text[5:7]), int(text[8:]), tzinfo=timezone.utc)
+        except ValueError:
+            return None
+    if len(text) == 5 and text.isdigit():
+        return SERIAL_EPOCH + timedelta(days=int(text))
+    if len(text) > 10 and text[4] == "-" and text[10] in "T ":
+        try:
+            return _as_utc(datetime.fromisoformat(text))
+        except ValueError:
+            return None
+    return None
+
+
+@lru_cache(maxsize=FALLBACK_CACHE_SIZE)
+def _fallback_parse(text):
+    from dateutil import parser as date_parser
+
+    try:
+        return _as_utc(date_parser.parse(text))
+    except Exception as e:
+        print(f"⚠️ Failed to parse date: '{text}' → {e}")
+        return None
+
+
+def parse_date(value):
+    """Returns a UTC-aware datetime for a sheet/feed date value, or None."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return _as_utc(value)
+    text = str(value).strip()
+    if not text:
+        return None
+    return _fast_parse(text) or _fallback_parse(text)
+
+
+def parse_dates(values):
+    """Parses a column of date values; each distinct value is parsed once."""
+    parsed = {}
+    out = []
+    for value in values:
+        if value not in parsed:
+            parsed[value] = parse_date(value)
+        out.append(parsed[value])
+    return out
+
+
+def to_iso_date(value, default=None):
+    """Normalizes a date value to YYYY-MM-DD (UTC); returns `default` if it can't be parsed."""
+    dt = parse_date(value)
+    return dt.strftime("%Y-%m-%d") if dt else default
+
+
+def cache_info():
+    return _fallback_parse.cache_info()
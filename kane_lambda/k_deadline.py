@@ -0,0 +1,97 @@
+"""
+Lambda deadline tracking for long stages.
+
+lambda_handler wraps the invocation context in a Deadline and installs it
+with set_deadline(); long-running loops call get_deadline().near(seconds)
+before starting a unit of work that takes about that long, and raise
+DeadlineReached (with their progress) instead of starting it. While a
+stage with a timeout runs, k_dag installs a deadline at that timeout if it
+comes first. Outside Lambda and stage timeouts the deadline is unlimited
+and near() is always False.
+"""
+import time
+
+from kane_lambda.config import LAMBDA_SAFETY_MARGIN_SECONDS
+
+
+class DeadlineReached(Exception):
+    """Raised by a stage that stopped early; `progress` says where it got to."""
+
+    def __init__(self, message, progress=None):
+        super().__init__(message)
+        self.progress = progress or {}
+
+
+class Deadline:
+    def __init__(self, remaining_ms_fn=None, margin_seconds=LAMBDA_SAFETY_MARGIN_SECONDS):
+        # remaining_ms_fn is context.get_remaining_time_in_millis in Lambda
+        self.remaining_ms_fn = remaining_ms_fn
+        self.margin_seconds = margin_seconds
+
+    @classmethod
+    def from_context(cls, context, margin_seconds=LAMBDA_SAFETY_MARGIN_SECONDS):
+        fn = getattr(context, "get_remaining_time_in_millis", None)
+        return cls(fn, margin_seconds)
+
+    @classmethod
+    def after(cls, seconds, margin_seconds=LAMBDA_SAFETY_MARGIN_SECONDS):
+        """A deadline `seconds` from now, for local runs and tests."""
+        end = time.monotonic() + seconds
+        return cls(lambda: max(0, (end - time.monotonic()) * 1000), margin_seconds)
+
+    @property
+    def active(self):
+        return self.remaining_ms_fn is not None
+
+    def remaining(self):
+        """Seconds left before the safety margin, or None when unlimited."""
+        if self.remaining_ms_fn is None:
+            return None
+        return self.remaining_ms_fn() / 1000 - self.margin_seconds
+
+    def near(self, needed_seconds=0.0):
+        """True when work taking `needed_seconds` would run into the safety margin."""
+        remaining = self.remaining()
+        return remaining is not None and remaining < needed_seconds
+
+    def clip(self, timeout):
+        """Shortens a timeout (None = unlimited) so it ends before the deadline."""
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        remaining = max(0.0, remaining)
+        return remaining if timeout is None else min(timeout, remaining)
+
+
+_deadline = Deadline()
+
+
+def get_deadline():
+    return _deadline
+
+
+def set_deadline(deadline):
+    global _deadline
+    _deadline = deadline or Deadline()
+    return _deadline
+
+
+class BatchTimer:
+    """Tracks batch durations so loops can ask whether one more batch still fits."""
+
+    def __init__(self, first_guess_seconds=0.0):
+        self.longest = first_guess_seconds
+        self.count = 0
+        self.started = None
+
+    def start(self):
+        self.started = time.monotonic()
+
+    def stop(self):
+        if self.started is not None:
+            self.longest = max(self.longest, time.monotonic() - self.started)
+            self.count += 1
+            self.started = None
+
+    def fits(self, deadline=None):
+        return not (deadline or get_deadline()).near(self.longest)
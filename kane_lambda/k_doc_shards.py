@@ -0,0 +1,132 @@
+"""
+Rolling output documents for the newsletter: one Google Doc per week or month.
+
+The date -> doc ID index lives in the DOC_INDEX_SHEET tab with one row per
+period at a fixed position (period number since DOC_INDEX_EPOCH, plus 2 for
+the header), so resolving the current doc reads exactly one row; the tab
+is created if it doesn't exist. Docs are created on demand the first time
+a period is used, and shared with DOC_SHARE_WITH, which a rollover
+requires.
+
+Two runs can both find a period's row empty and each create a doc. Each
+reads the row again before writing it and after: a run that finds the
+other's doc there deletes its own and uses that one. Sheets has no
+compare-and-set, so this narrows the race without closing it: if both
+runs read the row back before either writes it, each keeps its own doc
+and the index ends up naming the one written last. The other run's
+newsletter is then in a doc the index doesn't list.
+"""
+from datetime import date, datetime, timezone
+
+from kane_lambda.config import (
+    DOC_ROLLOVER,
+    DOC_INDEX_SHEET,
+    DOC_INDEX_EPOCH,
+    DOC_TITLE_TEMPLATE,
+    DOC_SHARE_WITH,
+)
+from kane_lambda.k_clients import build_sheets_service, build_docs_service, build_drive_service, CREDS_FILE
+from kane_lambda.k_api_scheduler import get_scheduler
+from kane_lambda.k_sheet_rows import add_tab, is_missing_tab
+
+EPOCH = date.fromisoformat(DOC_INDEX_EPOCH)
+
+# period key -> doc ID, reused for the life of the process
+_resolved = {}
+
+
+def period_for(day, rollover=DOC_ROLLOVER):
+    """Returns (period_key, index_row) for a date under the given rollover."""
+    day = day.date() if isinstance(day, datetime) else day
+    if rollover == "month":
+        number = (day.year - EPOCH.year) * 12 + (day.month - EPOCH.month)
+        key = day.strftime("%Y-%m")
+    elif rollover == "week":
+        # Weeks start on Monday, matching ISO week numbering
+        number = (day.toordinal() - day.weekday() - (EPOCH.toordinal() - EPOCH.weekday())) // 7
+        iso = day.isocalendar()
+        key = f"{iso[0]}-W{iso[1]:02d}"
+    else:
+        raise ValueError(f"Unknown DOC_ROLLOVER: {rollover!r}")
+    if number < 0:
+        raise ValueError(f"{day} is before DOC_INDEX_EPOCH {DOC_INDEX_EPOCH}")
+    return key, number + 2
+
+
+def resolve_output_doc(spreadsheet_id, default_doc_id, day=None, rollover=DOC_ROLLOVER, creds_file=CREDS_FILE):
+    """Returns the doc ID newsletters for `day` go into, creating it if needed."""
+    if rollover == "none":
+        return default_doc_id
+    if not DOC_SHARE_WITH:
+        raise ValueError(f"DOC_ROLLOVER={rollover!r} needs KANE_DOC_SHARE_WITH: "
+                         "new docs belong to the service account and nobody else could open them")
+
+    key, row = period_for(day or datetime.now(timezone.utc), rollover)
+    if key in _resolved:
+        return _resolved[key]
+
+    sheet = build_sheets_service(creds_file).spreadsheets()
+    cell_range = f"{DOC_INDEX_SHEET}!A{row}:C{row}"
+    doc_id = _read_index_row(sheet, spreadsheet_id, cell_range, key)
+
+    if not doc_id:
+        created = create_period_doc(key, creds_file)
+        # Another run may have created the period's doc meanwhile
+        doc_id = _read_index_row(sheet, spreadsheet_id, cell_range, key)
+        if not doc_id:
+            stamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+            get_scheduler().execute(sheet.values().update(
+                spreadsheetId=spreadsheet_id,
+                range=cell_range,
+                valueInputOption="RAW",
+                body={"values": [[key, created, stamp]]}
+            ), kind="write")
+            # Read back so two runs that both wrote converge on whichever row write landed last
+            doc_id = _read_index_row(sheet, spreadsheet_id, cell_range, key) or created
+        if doc_id != created:
+            print(f"🤝 Another run created the doc for {key}; using it")
+            delete_doc(created, creds_file)
+
+    _resolved[key] = doc_id
+    print(f"📄 Output doc for {key}: https://docs.google.com/document/d/{doc_id}/edit")
+    return doc_id
+
+
+def create_period_doc(key, creds_file=CREDS_FILE):
+    docs = build_docs_service(creds_file)
+    doc = get_scheduler().execute(
+        docs.documents().create(body={"title": DOC_TITLE_TEMPLATE.format(period=key)}),
+        api="docs", kind="write")
+    doc_id = doc["documentId"]
+    print(f"🆕 Created newsletter doc for {key}: {doc_id}")
+
+    if DOC_SHARE_WITH:
+        drive = build_drive_service(creds_file)
+        for email in DOC_SHARE_WITH:
+            get_scheduler().execute(drive.permissions().create(
+                fileId=doc_id,
+                body={"type": "user", "role": "writer", "emailAddress": email},
+                sendNotificationEmail=False,
+            ), api="drive", kind="write")
+    return doc_id
+
+
+def delete_doc(doc_id, creds_file=CREDS_FILE):
+    """Deletes a doc this run created but lost to another run's."""
+    drive = build_drive_service(creds_file)
+    get_scheduler().execute(drive.files().delete(fileId=doc_id), api="drive", kind="write")
+    print(f"🗑️ Deleted duplicate newsletter doc {doc_id}")
+
+
+def _read_index_row(sheet, spreadsheet_id, cell_range, key):
+    try:
+        result = get_scheduler().execute(sheet.values().get(spreadsheetId=spreadsheet_id, range=cell_range))
+    except Exception as e:
+        if not is_missing_tab(e):
+            raise
+        add_tab(sheet, spreadsheet_id, DOC_INDEX_SHEET)
+        return ""
+    values = result.get("values", [])
+    if values and len(values[0]) >= 2 and values[0][0] == key:
+        return values[0][1]
+    return ""
@@ -0,0 +1,657 @@
+"""
+In-process stand-in for the Google Sheets and Docs APIs.
+
+Implements the subset the pipeline uses:
+  - Sheets: spreadsheets().values().get / batchGet / append / clear / update,
+            spreadsheets().batchUpdate (addSheet)
+  - Docs:   documents().get / batchUpdate / create
+  - Drive:  permissions().create (recorded only), files().delete
+
+Select it with KANE_GOOGLE_BACKEND=emulator; k_clients then returns these
+services instead of googleapiclient ones. Latency, error rate and per-minute
+quotas are configurable (see the EMULATOR_* settings in config.py) so stages
+can be run and load-tested without credentials.
+
+    python -m kane_lambda.k_emulator [rows]
+
+seeds both sheets with synthetic stories and times clean_sheets/run_selector.
+"""
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+
+from kane_lambda.config import (
+    EMULATOR_LATENCY_MS,
+    EMULATOR_LATENCY_JITTER_MS,
+    EMULATOR_ERROR_RATE,
+    EMULATOR_READ_QUOTA_PER_MIN,
+    EMULATOR_WRITE_QUOTA_PER_MIN,
+    EMULATOR_SEED_FILE,
+)
+
+# Header rows used when a known tab is created on first access
+DEFAULT_SHEET_HEADERS = {
+    "headscanner": [
+        "story_id", "author", "headline", "context_snippet", "source_url",
+        "publication_date", "human_priority", "input_type",
+    ],
+    "prioritizer": [
+        "story_id", "author", "publication_date", "headline", "source_name",
+        "fact_summary", "source_url", "category", "category_reason",
+        "significance_score", "relevant", "human_priority", "input_type",
+    ],
+}
+
+CELL_RE = re.compile(r"^([A-Za-z]*)(\d*)$")
+
+
+class EmulatorHttpError(Exception):
+    """Mimics googleapiclient.errors.HttpError closely enough for retry logic."""
+
+    def __init__(self, status, message):
+        super().__init__(f"<HttpError {status}: {message}>")
+        self.resp = _Response(status)
+        self.status_code = status
+
+
+class _Response(dict):
+    def __init__(self, status):
+        super().__init__(status=str(status))
+        self.status = status
+
+
+# === A1 NOTATION ===
+def col_to_index(letters):
+    index = 0
+    for ch in letters.upper():
+        index = index * 26 + (ord(ch) - ord("A") + 1)
+    return index - 1
+
+
+def index_to_col(index):
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord("A") + rem) + letters
+    return letters
+
+
+def parse_range(range_str):
+    """Returns (sheet, row0, col0, row1, col1); rows are 1-based, None means open-ended."""
+    sheet, _, cells = range_str.partition("!")
+    sheet = sheet.strip("'")
+    if not cells:
+        return sheet, 1, 0, None, None
+
+    start, _, end = cells.partition(":")
+    m_start, m_end = CELL_RE.match(start), CELL_RE.match(end) if end else None
+    if not m_start or (end and not m_end):
+        raise EmulatorHttpError(400, f"Unable to parse range: {range_str}")
+
+    row0 = int(m_start.group(2)) if m_start.group(2) else 1
+    col0 = col_to_index(m_start.group(1)) if m_start.group(1) else 0
+    if not end:
+        # A single cell
+        return sheet, row0, col0, row0, col0
+    row1 = int(m_end.group(2)) if m_end.group(2) else None
+    col1 = col_to_index(m_end.group(1)) if m_end.group(1) else None
+    return sheet, row0, col0, row1, col1
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    return str(value)
+
+
+def _trim(rows):
+    rows = [list(r) for r in rows]
+    for r in rows:
+        while r and r[-1] == "":
+            r.pop()
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+
+# === FIELD MASKS (partial responses via `fields=`) ===
+def parse_fields(fields):
+    """Parses e.g. "namedRanges,body.content(endIndex)" into a nested dict."""
+    tree, pos = _parse_field_list(fields.replace(" ", ""), 0)
+    return tree
+
+
+def _parse_field_list(text, pos):
+    tree = {}
+    while pos < len(text) and text[pos] != ")":
+        start = pos
+        while pos < len(text) and text[pos] not in ",()":
+            pos += 1
+        path = text[start:pos].split(".")
+        sub = None
+        if pos < len(text) and text[pos] == "(":
+            sub, pos = _parse_field_list(text, pos + 1)
+            pos += 1  # closing paren
+        node = tree
+        for name in path[:-1]:
+            if name in node and node[name] is None:
+                node = None  # parent already selected in full
+                break
+            node = node.setdefault(name, {})
+        if node is not None:
+            _merge_field(node, path[-1], sub)
+        if pos < len(text) and text[pos] == ",":
+            pos += 1
+    return tree, pos
+
+
+def _merge_field(node, name, sub):
+    if name in node and (node[name] is None or sub is None):
+        node[name] = None
+    elif name in node:
+        for k, v in sub.items():
+            _merge_field(node[name], k, v)
+    else:
+        node[name] = sub
+
+
+def apply_fields(obj, tree):
+    if tree is None or "*" in tree:
+        return obj
+    if isinstance(obj, list):
+        return [apply_fields(item, tree) for item in obj]
+    if isinstance(obj, dict):
+        return {k: apply_fields(obj[k], sub) for k, sub in tree.items() if k in obj}
+    return obj
+
+
+# === UTF-16 HELPERS (Docs indexes count UTF-16 code units) ===
+def utf16_len(text):
+    return len(text.encode("utf-16-le")) // 2
+
+
+def utf16_to_py_index(text, offset):
+    units = 0
+    for i, ch in enumerate(text):
+        if units >= offset:
+            return i
+        units += 2 if ord(ch) > 0xFFFF else 1
+    return len(text)
+
+
+# === STATE ===
+class EmulatorState:
+    def __init__(self, latency_ms=EMULATOR_LATENCY_MS, jitter_ms=EMULATOR_LATENCY_JITTER_MS,
+                 error_rate=EMULATOR_ERROR_RATE, read_quota=EMULATOR_READ_QUOTA_PER_MIN,
+                 write_quota=EMULATOR_WRITE_QUOTA_PER_MIN, auto_create=True):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.quotas = {"read": read_quota, "write": write_quota}
+        self.auto_create = auto_create
+
+        self.lock = threading.RLock()
+        self.spreadsheets = {}  # spreadsheet_id -> {sheet_name: [[str, ...], ...]}
+        self.documents = {}  # doc_id -> {"title", "text", "named_ranges", "revision"}
+        self.permissions = {}  # file_id -> [permission body, ...]
+        self.windows = {"read": deque(), "write": deque()}
+        self.calls = Counter()
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.injected_errors = 0
+
+    # --- seeding / snapshots ---
+    def seed_sheet(self, spreadsheet_id, sheet_name, rows):
+        with self.lock:
+            self.spreadsheets.setdefault(spreadsheet_id, {})[sheet_name] = [[_cell(v) for v in r] for r in rows]
+
+    def seed_document(self, doc_id, text="", title="Untitled"):
+        with self.lock:
+            self.documents[doc_id] = {
+                "title": title,
+                "text": text if text.endswith("\n") else text + "\n",
+                "named_ranges": {},
+                "revision": 0,
+            }
+
+    def load_snapshot(self, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for spreadsheet_id, sheets in data.get("sheets", {}).items():
+            for sheet_name, rows in sheets.items():
+                self.seed_sheet(spreadsheet_id, sheet_name, rows)
+        for doc_id, doc in data.get("docs", {}).items():
+            self.seed_document(doc_id, doc.get("text", ""), doc.get("title", "Untitled"))
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "sheets": {sid: {name: [list(r) for r in rows] for name, rows in tabs.items()}
+                           for sid, tabs in self.spreadsheets.items()},
+                "docs": {did: {"title": d["title"], "text": d["text"]} for did, d in self.documents.items()},
+            }
+
+    def stats(self):
+        return {
+            "calls": dict(self.calls),
+            "total_calls": sum(self.calls.values()),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "injected_errors": self.injected_errors,
+        }
+
+    # --- call plumbing ---
+    def run(self, method, kind, fn, body=None):
+        if self.latency_ms or self.jitter_ms:
+            delay = max(0.0, random.gauss(self.latency_ms, self.jitter_ms)) / 1000.0
+            time.sleep(delay)
+
+        with self.lock:
+            self.calls[method] += 1
+            if body is not None:
+                self.bytes_in += len(json.dumps(body))
+            self._check_quota(kind)
+            if self.error_rate and random.random() < self.error_rate:
+                self.injected_errors += 1
+                raise EmulatorHttpError(503, "The service is currently unavailable (injected).")
+            result = fn()
+            self.bytes_out += len(json.dumps(result))
+            return result
+
+    def _check_quota(self, kind):
+        limit = self.quotas.get(kind)
+        if not limit:
+            return
+        now = time.monotonic()
+        window = self.windows[kind]
+        while window and now - window[0] >= 60.0:
+            window.popleft()
+        if len(window) >= limit:
+            raise EmulatorHttpError(429, f"Quota exceeded for {kind} requests per minute.")
+        window.append(now)
+
+    def _sheet(self, spreadsheet_id, sheet_name):
+        tabs = self.spreadsheets.get(spreadsheet_id)
+        if tabs is None:
+            if not self.auto_create:
+                raise EmulatorHttpError(404, f"Requested entity was not found: {spreadsheet_id}")
+            tabs = self.spreadsheets[spreadsheet_id] = {}
+        if sheet_name not in tabs:
+            if not self.auto_create:
+                raise EmulatorHttpError(400, f"Unable to parse range: {sheet_name}")
+            headers = DEFAULT_SHEET_HEADERS.get(sheet_name)
+            tabs[sheet_name] = [list(headers)] if headers else []
+        return tabs[sheet_name]
+
+    def _document(self, doc_id):
+        if doc_id not in self.documents:
+            if not self.auto_create:
+                raise EmulatorHttpError(404, f"Requested entity was not found: {doc_id}")
+            self.seed_document(doc_id)
+        return self.documents[doc_id]
+
+    # --- sheets operations ---
+    def spreadsheet_batch_update(self, spreadsheet_id, requests):
+        tabs = self.spreadsheets.setdefault(spreadsheet_id, {})
+        replies = []
+        for req in requests:
+            if "addSheet" not in req:
+                raise EmulatorHttpError(400, f"Unsupported request: {list(req)}")
+            title = req["addSheet"]["properties"]["title"]
+            if title in tabs:
+                raise EmulatorHttpError(400, f'A sheet with the name "{title}" already exists.')
+            tabs[title] = []
+            replies.append({"addSheet": {"properties": {"title": title, "sheetId": len(tabs)}}})
+        return {"spreadsheetId": spreadsheet_id, "replies": replies}
+
+    def values_get(self, spreadsheet_id, range_str):
+        sheet_name, row0, col0, row1, col1 = parse_range(range_str)
+        rows = self._sheet(spreadsheet_id, sheet_name)
+        end_row = len(rows) if row1 is None else min(row1, len(rows))
+        selected = [r[col0:None if col1 is None else col1 + 1] for r in rows[row0 - 1:end_row]]
+        result = {"range": range_str, "majorDimension": "ROWS"}
+        values = _trim(selected)
+        if values:
+            result["values"] = values
+        return result
+
+    def values_append(self, spreadsheet_id, range_str, values):
+        sheet_name, _, col0, _, _ = parse_range(range_str)
+        rows = self._sheet(spreadsheet_id, sheet_name)
+        while rows and not any(rows[-1]):
+            rows.pop()
+        start = len(rows) + 1
+        width = 0
+        for v in values:
+            rows.append([""] * col0 + [_cell(c) for c in v])
+            width = max(width, len(v))
+        end = len(rows)
+        updated = f"{sheet_name}!{index_to_col(col0)}{start}:{index_to_col(col0 + max(width, 1) - 1)}{end}"
+        return {
+            "spreadsheetId": spreadsheet_id,
+            "updates": {
+                "spreadsheetId": spreadsheet_id,
+                "updatedRange": updated,
+                "updatedRows": len(values),
+                "updatedColumns": width,
+                "updatedCells": sum(len(v) for v in values),
+            },
+        }
+
+    def values_update(self, spreadsheet_id, range_str, values):
+        sheet_name, row0, col0, _, _ = parse_range(range_str)
+        rows = self._sheet(spreadsheet_id, sheet_name)
+        for i, v in enumerate(values):
+            r = row0 - 1 + i
+            while len(rows) <= r:
+                rows.append([])
+            row = rows[r]
+            needed = col0 + len(v)
+            if len(row) < needed:
+                row.extend([""] * (needed - len(row)))
+            row[col0:needed] = [_cell(c) for c in v]
+        return {
+            "spreadsheetId": spreadsheet_id,
+            "updatedRange": range_str,
+            "updatedRows": len(values),
+            "updatedCells": sum(len(v) for v in values),
+        }
+
+    def values_clear(self, spreadsheet_id, range_str):
+        sheet_name, row0, col0, row1, col1 = parse_range(range_str)
+        rows = self._sheet(spreadsheet_id, sheet_name)
+        end_row = len(rows) if row1 is None else min(row1, len(rows))
+        for row in rows[row0 - 1:end_row]:
+            stop = len(row) if col1 is None else min(col1 + 1, len(row))
+            for c in range(col0, stop):
+                row[c] = ""
+        rows[:] = _trim(rows)
+        return {"spreadsheetId": spreadsheet_id, "clearedRange": range_str}
+
+    # --- docs operations ---
+    def document_get(self, doc_id):
+        doc = self._document(doc_id)
+        content = [{"startIndex": 0, "endIndex": 1, "sectionBreak": {}}]
+        index = 1
+        for line in doc["text"].splitlines(keepends=True):
+            end = index + utf16_len(line)
+            content.append({
+                "startIndex": index,
+                "endIndex": end,
+                "paragraph": {"elements": [{"startIndex": index, "endIndex": end, "textRun": {"content": line}}]},
+            })
+            index = end
+        named = {}
+        for name, ranges in doc["named_ranges"].items():
+            named[name] = {"name": name, "namedRanges": [dict(r, ranges=[dict(x) for x in r["ranges"]]) for r in ranges]}
+        return {
+            "documentId": doc_id,
+            "title": doc["title"],
+            "revisionId": str(doc["revision"]),
+            "body": {"content": content},
+            "namedRanges": named,
+        }
+
+    def document_create(self, title):
+        doc_id = uuid.uuid4().hex
+        self.seed_document(doc_id, title=title)
+        return self.document_get(doc_id)
+
+    def file_delete(self, file_id):
+        with self.lock:
+            if self.documents.pop(file_id, None) is None:
+                raise EmulatorHttpError(404, f"File not found: {file_id}")
+            self.permissions.pop(file_id, None)
+        return ""
+
+    def permission_create(self, file_id, body):
+        self.permissions.setdefault(file_id, []).append(dict(body))
+        return {"kind": "drive#permission", "id": str(len(self.permissions[file_id])), **body}
+
+    def document_batch_update(self, doc_id, requests):
+        doc = self._document(doc_id)
+        replies = []
+        for req in requests:
+            if "insertText" in req:
+                self._insert_text(doc, req["insertText"])
+                replies.append({})
+            elif "createNamedRange" in req:
+                replies.append({"createNamedRange": {"namedRangeId": self._create_named_range(doc, req["createNamedRange"])}})
+            elif "updateTextStyle" in req or "createParagraphBullets" in req or "updateParagraphStyle" in req:
+                # Styling does not change text or indexes; only validate the range
+                body = req.get("updateTextStyle") or req.get("createParagraphBullets") or req.get("updateParagraphStyle")
+                self._check_range(doc, body["range"])
+                replies.append({})
+            else:
+                raise EmulatorHttpError(400, f"Unsupported request: {list(req)}")
+        doc["revision"] += 1
+        return {"documentId": doc_id, "replies": replies, "writeControl": {"requiredRevisionId": str(doc["revision"])}}
+
+    def _check_range(self, doc, rng):
+        end_index = 1 + utf16_len(doc["text"])
+        if not (1 <= rng["startIndex"] <= rng["endIndex"] <= end_index):
+            raise EmulatorHttpError(400, f"Invalid range {rng} for document ending at {end_index}")
+
+    def _insert_text(self, doc, body):
+        text = doc["text"]
+        if "endOfSegmentLocation" in body:
+            offset = utf16_len(text) - 1
+        else:
+            offset = body["location"]["index"] - 1
+        if not 0 <= offset < utf16_len(text):
+            raise EmulatorHttpError(400, f"Index {offset + 1} must be less than the end index of the segment.")
+        pos = utf16_to_py_index(text, offset)
+        doc["text"] = text[:pos] + body["text"] + text[pos:]
+
+        # Shift named ranges that sit after the insertion point
+        index, length = offset + 1, utf16_len(body["text"])
+        for ranges in doc["named_ranges"].values():
+            for named in ranges:
+                for r in named["ranges"]:
+                    if r["startIndex"] >= index:
+                        r["startIndex"] += length
+                    if r["endIndex"] > index:
+                        r["endIndex"] += length
+
+    def _create_named_range(self, doc, body):
+        self._check_range(doc, body["range"])
+        range_id = f"kix.{len(doc['named_ranges']) + 1}.{doc['revision']}"
+        doc["named_ranges"].setdefault(body["name"], []).append({
+            "namedRangeId": range_id,
+            "name": body["name"],
+            "ranges": [{"startIndex": body["range"]["startIndex"], "endIndex": body["range"]["endIndex"]}],
+        })
+        return range_id
+
+
+# === googleapiclient-shaped facades ===
+class EmulatorRequest:
+    def __init__(self, state, method, kind, fn, body=None):
+        self.state = state
+        self.method = method
+        self.kind = kind
+        self.fn = fn
+        self.body = body
+
+    def execute(self, num_retries=0):
+        return self.state.run(self.method, self.kind, self.fn, self.body)
+
+
+class _Values:
+    def __init__(self, state):
+        self.state = state
+
+    def get(self, spreadsheetId, range, **kwargs):
+        return EmulatorRequest(self.state, "sheets.values.get", "read",
+                               lambda: self.state.values_get(spreadsheetId, range))
+
+    def batchGet(self, spreadsheetId, ranges, **kwargs):
+        def fn():
+            return {"spreadsheetId": spreadsheetId,
+                    "valueRanges": [self.state.values_get(spreadsheetId, r) for r in ranges]}
+        return EmulatorRequest(self.state, "sheets.values.batchGet", "read", fn)
+
+    def append(self, spreadsheetId, range, body, **kwargs):
+        return EmulatorRequest(self.state, "sheets.values.append", "write",
+                               lambda: self.state.values_append(spreadsheetId, range, body.get("values", [])), body)
+
+    def update(self, spreadsheetId, range, body, **kwargs):
+        return EmulatorRequest(self.state, "sheets.values.update", "write",
+                               lambda: self.state.values_update(spreadsheetId, range, body.get("values", [])), body)
+
+    def clear(self, spreadsheetId, range, body=None, **kwargs):
+        return EmulatorRequest(self.state, "sheets.values.clear", "write",
+                               lambda: self.state.values_clear(spreadsheetId, range))
+
+
+class _Spreadsheets:
+    def __init__(self, state):
+        self.state = state
+
+    def values(self):
+        return _Values(self.state)
+
+    def batchUpdate(self, spreadsheetId, body, **kwargs):
+        return EmulatorRequest(self.state, "sheets.spreadsheets.batchUpdate", "write",
+                               lambda: self.state.spreadsheet_batch_update(spreadsheetId, body.get("requests", [])), body)
+
+
+class SheetsService:
+    def __init__(self, state):
+        self.state = state
+
+    def spreadsheets(self):
+        return _Spreadsheets(self.state)
+
+
+class _Documents:
+    def __init__(self, state):
+        self.state = state
+
+    def get(self, documentId, fields=None, **kwargs):
+        def fn():
+            doc = self.state.document_get(documentId)
+            return apply_fields(doc, parse_fields(fields)) if fields else doc
+        return EmulatorRequest(self.state, "docs.documents.get", "read", fn)
+
+    def batchUpdate(self, documentId, body, **kwargs):
+        return EmulatorRequest(self.state, "docs.documents.batchUpdate", "write",
+                               lambda: self.state.document_batch_update(documentId, body.get("requests", [])), body)
+
+    def create(self, body, **kwargs):
+        return EmulatorRequest(self.state, "docs.documents.create", "write",
+                               lambda: self.state.document_create(body.get("title", "Untitled")), body)
+
+
+class DocsService:
+    def __init__(self, state):
+        self.state = state
+
+    def documents(self):
+        return _Documents(self.state)
+
+
+class _Permissions:
+    def __init__(self, state):
+        self.state = state
+
+    def create(self, fileId, body, **kwargs):
+        return EmulatorRequest(self.state, "drive.permissions.create", "write",
+                               lambda: self.state.permission_create(fileId, body), body)
+
+
+class _Files:
+    def __init__(self, state):
+        self.state = state
+
+    def delete(self, fileId, **kwargs):
+        return EmulatorRequest(self.state, "drive.files.delete", "write", lambda: self.state.file_delete(fileId))
+
+
+class DriveService:
+    def __init__(self, state):
+        self.state = state
+
+    def permissions(self):
+        return _Permissions(self.state)
+
+    def files(self):
+        return _Files(self.state)
+
+
+_state = None
+
+
+def get_state():
+    global _state
+    if _state is None:
+        _state = EmulatorState()
+        if EMULATOR_SEED_FILE:
+            _state.load_snapshot(EMULATOR_SEED_FILE)
+    return _state
+
+
+def reset_state(**kwargs):
+    global _state
+    _state = EmulatorState(**kwargs)
+    return _state
+
+
+def sheets_service():
+    return SheetsService(get_state())
+
+
+def docs_service():
+    return DocsService(get_state())
+
+
+def drive_service():
+    return DriveService(get_state())
+
+
+def seed_synthetic_stories(spreadsheet_id, count, days=10):
+    """Fills headscanner/prioritizer with `count` synthetic stories spread over `days`."""
+    from datetime import datetime, timedelta, timezone
+
+    categories = ["Product_Research", "Capital_Corporate_Moves", "Infrastructure_Supply",
+                  "Market_Financial_Signals", "Policy_Geopolitics"]
+    vocab = [f"w{n}" for n in range(400)]
+    rng = random.Random(count)
+    now = datetime.now(timezone.utc)
+    head = [DEFAULT_SHEET_HEADERS["headscanner"]]
+    prio = [DEFAULT_SHEET_HEADERS["prioritizer"]]
+    for i in range(1, count + 1):
+        pub = (now - timedelta(days=(i * days) / count)).strftime("%Y-%m-%d")
+        url = f"https://example{i % 25}.com/story/{i}"
+        summary = " ".join(rng.sample(vocab, 12)) + "."
+        head.append([str(i), f"Author {i % 50}", f"Headline {i}", summary, url, pub, "0", "RSS"])
+        prio.append([str(i), f"Author {i % 50}", pub, f"Headline {i}", f"EXAMPLE{i % 25}", summary, url,
+                     categories[i % len(categories)], "synthetic", str(rng.randint(0, 10)),
+                     rng.choice(["TRUE", "FALSE"]), "0", "RSS"])
+    state = get_state()
+    state.seed_sheet(spreadsheet_id, "headscanner", head)
+    state.seed_sheet(spreadsheet_id, "prioritizer", prio)
+
+
+if __name__ == "__main__":
+    from kane_lambda import config
+    config.GOOGLE_BACKEND = "emulator"
+    # Use the importable module, not __main__, so stages share the same state
+    from kane_lambda import k_emulator, k_selector, k_sheet_clean
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    k_emulator.seed_synthetic_stories(k_sheet_clean.SPREADSHEET_ID, rows)
+
+    for name, stage in (("run_selector", k_selector.run_selector), ("clean_sheets", k_sheet_clean.clean_sheets)):
+        start = time.perf_counter()
+        stage()
+        print(f"⏱️ {name}: {time.perf_counter() - start:.3f}s for {rows} rows")
+    print(json.dumps(k_emulator.get_state().stats(), indent=2))
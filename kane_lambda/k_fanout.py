@@ -0,0 +1,263 @@
+"""
+Sharded fan-out: one stage on one shard per invocation.
+
+Shard events (run_shard) run a single stage on part of its input:
+
+    {"mode": "shard", "stage": "headscanner",
+     "shard": {"index": 0, "count": 4, "feeds": [0, 4, 8]}, "max_stories": 75}
+    {"mode": "shard", "stage": "prioritizer",
+     "shard": {"index": 1, "count": 4, "story_ids": [100201, 100400]}}
+
+`feeds` are indexes into RSS_FEEDS; `story_ids` is an inclusive range of
+headscanner story IDs. A coordinator event (run_fanout) plans the shards
+for each stage, runs them concurrently through an invoker, merges the
+per-shard results, and then runs the rest of the pipeline itself:
+
+    {"mode": "fanout", "stages": ["headscanner", "prioritizer"], "shards": 4, "invoker": "lambda"}
+
+The "lambda" invoker calls FANOUT_FUNCTION_NAME once per shard; "local"
+simulates the fan-out with a process pool. Shards are safe to run
+side by side: story IDs come from the block allocator, and the
+prioritizers skip IDs already in the output sheet and duplicate source
+URLs. Re-sending the coordinator event is the retry for failed or
+deferred shards, since prioritizer shards are planned from what's still
+unprocessed. After each stage the coordinator checks its own Lambda
+deadline: when the time left is under the next stage's STAGE_TIMEOUTS
+budget, it returns a continuation (a fanout event for the remaining
+sharded stages, or a resume_from marker for the rest of the pipeline)
+instead of starting it.
+"""
+import contextvars
+import json
+import math
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from kane_lambda.config import (
+    FANOUT_SHARDS,
+    FANOUT_INVOKER,
+    FANOUT_FUNCTION_NAME,
+    STAGE_TIMEOUTS,
+    USE_SPLIT_PRIORITIZER,
+)
+from kane_lambda.k_dag import Stage, run_dag, BLOCKING_STATUSES
+from kane_lambda.k_deadline import get_deadline
+from kane_lambda.k_headscanner import RSS_FEEDS, run_headscanner
+from kane_lambda.k_prioritizer import (
+    SHEET_ID,
+    INPUT_SHEET_NAME,
+    OUTPUT_SHEET_NAME,
+    CREDS_FILE,
+    run_prioritizer,
+    read_input_and_processed,
+    stories_from_values,
+    select_unprocessed,
+)
+from kane_lambda.k_prioritizer_split import run_split_prioritizer
+from kane_lambda.k_master import HEADSCANNER_MAX_STORIES, build_pipeline, run_kane_pipeline
+from kane_lambda.k_profile import configure as configure_profiling, event_settings as profile_settings
+from kane_lambda.k_trace import span
+
+SHARDED_STAGES = ("headscanner", "prioritizer")
+
+
+# === PLANNING ===
+def plan_headscanner_shards(count, max_stories=HEADSCANNER_MAX_STORIES):
+    """Deals RSS_FEEDS round-robin into at most `count` shards, splitting the story cap evenly."""
+    groups = [list(range(i, len(RSS_FEEDS), count)) for i in range(min(count, len(RSS_FEEDS)))]
+    per_shard = math.ceil(max_stories / len(groups)) if groups else 0
+    return [
+        {"mode": "shard", "stage": "headscanner",
+         "shard": {"index": i, "count": len(groups), "feeds": feeds}, "max_stories": per_shard}
+        for i, feeds in enumerate(groups)
+    ]
+
+
+def plan_prioritizer_shards(count):
+    """Splits the unprocessed story IDs into `count` contiguous ranges of similar size."""
+    input_values, processed_ids = read_input_and_processed(SHEET_ID, INPUT_SHEET_NAME, OUTPUT_SHEET_NAME, CREDS_FILE)
+    ids = sorted(
+        int(s["story_id"]) for s in select_unprocessed(stories_from_values(input_values), processed_ids)
+        if str(s["story_id"]).strip().isdigit()
+    )
+    if not ids:
+        return []
+    size = math.ceil(len(ids) / count)
+    chunks = [ids[i:i + size] for i in range(0, len(ids), size)]
+    return [
+        {"mode": "shard", "stage": "prioritizer",
+         "shard": {"index": i, "count": len(chunks), "story_ids": [chunk[0], chunk[-1]]}}
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+def plan_shards(stage, count=FANOUT_SHARDS):
+    if stage == "headscanner":
+        return plan_headscanner_shards(count)
+    if stage == "prioritizer":
+        return plan_prioritizer_shards(count)
+    raise ValueError(f"Stage {stage!r} can't be sharded; choose from {SHARDED_STAGES}")
+
+
+# === SHARD EXECUTION ===
+def run_shard(event):
+    """Runs one stage on one shard; returns the stage result dict (JSON-serializable) plus the shard."""
+    stage = event.get("stage")
+    shard = event.get("shard", {})
+    if "profile" in event:
+        # Local process-pool shards don't go through lambda_handler
+        configure_profiling(event["profile"], event.get("profile_kinds"))
+    if stage == "headscanner":
+        feeds = [RSS_FEEDS[i] for i in shard.get("feeds", range(len(RSS_FEEDS)))]
+        max_stories = event.get("max_stories", HEADSCANNER_MAX_STORIES)
+        fn = lambda: run_headscanner(max_stories, feeds)
+    elif stage == "prioritizer":
+        id_range = tuple(shard["story_ids"]) if shard.get("story_ids") else None
+        prioritizer = run_split_prioritizer if USE_SPLIT_PRIORITIZER else run_prioritizer
+        fn = lambda: prioritizer(id_range)
+    else:
+        raise ValueError(f"Stage {stage!r} can't be sharded; choose from {SHARDED_STAGES}")
+
+    print(f"🧩 Running {stage} shard {shard.get('index', 0) + 1}/{shard.get('count', 1)}: {shard}")
+    result = run_dag([Stage(stage, fn, timeout=STAGE_TIMEOUTS.get(stage))])[stage]
+    result["shard"] = shard
+    return result
+
+
+def _failed_shard(event, reason):
+    return {"stage": event.get("stage"), "status": "failed", "reason": reason, "seconds": 0.0,
+            "started_at": None, "output": None, "shard": event.get("shard", {})}
+
+
+def invoke_local(events, max_workers=None):
+    """Runs shard events in a process pool, one process per shard."""
+    if not events:
+        return []
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers or len(events)) as pool:
+        futures = [pool.submit(run_shard, event) for event in events]
+        for event, future in zip(events, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(_failed_shard(event, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def invoke_lambda(events, function_name=FANOUT_FUNCTION_NAME):
+    """Invokes this function once per shard event, concurrently, and collects the shard results."""
+    if not events:
+        return []
+    if not function_name:
+        raise ValueError("FANOUT_FUNCTION_NAME is not set; can't invoke shards")
+    import boto3  # available in the Lambda runtime; only needed for the lambda invoker
+    from botocore.config import Config
+    # A shard can run for the full 15 minutes. The default 60s read timeout and
+    # retries would re-invoke a shard that is still running and duplicate its rows.
+    client = boto3.client("lambda", config=Config(read_timeout=900, connect_timeout=10, retries={"max_attempts": 0}))
+
+    def invoke(event):
+        with span("shard.invoke", stage=event.get("stage"), shard=event.get("shard", {}).get("index")) as s:
+            try:
+                response = client.invoke(FunctionName=function_name, InvocationType="RequestResponse",
+                                         Payload=json.dumps(event).encode("utf-8"))
+                payload = json.loads(response["Payload"].read() or b"{}")
+            except Exception as e:
+                return _failed_shard(event, f"{type(e).__name__}: {e}")
+            # The shard's own spans are in its invocation's trace
+            s.set(shard_trace_id=payload.get("trace_id"))
+            if response.get("FunctionError"):
+                return _failed_shard(event, payload.get("errorMessage", response["FunctionError"]))
+            return payload.get("result") or _failed_shard(event, "shard returned no result")
+
+    with ThreadPoolExecutor(max_workers=len(events)) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, invoke, event) for event in events]
+        return [f.result() for f in futures]
+
+
+INVOKERS = {"local": invoke_local, "lambda": invoke_lambda}
+
+
+# === COORDINATION ===
+def merge_results(stage, results):
+    """One stage-level result from the per-shard results."""
+    statuses = [r["status"] for r in results]
+    if any(s in BLOCKING_STATUSES for s in statuses):
+        status = "failed"
+    elif "deferred" in statuses:
+        status = "deferred"
+    elif "timeout" in statuses:
+        status = "timeout"
+    else:
+        status = "ok"
+    return {
+        "stage": stage,
+        "status": status,
+        "shards": len(results),
+        "output": sum(r["output"] for r in results if isinstance(r.get("output"), int)),
+        "seconds": max((r["seconds"] for r in results), default=0.0),
+        # Shards invoked through Lambda report their own LLM usage (k_usage)
+        "cost": round(sum((r.get("usage") or {}).get("total_cost", 0.0) for r in results), 6),
+        "unfinished": [r["shard"] for r in results if r["status"] not in ("ok", "skipped")],
+        "results": results,
+    }
+
+
+def stage_after(stages):
+    """The pipeline stage following the last of `stages`, or None when they end the pipeline."""
+    order = [s.name for s in build_pipeline()]
+    following = order[max(order.index(name) for name in stages) + 1:]
+    return following[0] if following else None
+
+
+def deadline_continuation(next_stage, sharded_rest, shards, invoker):
+    """A continuation when the time left won't cover `next_stage`'s budget, else None."""
+    budget = STAGE_TIMEOUTS.get(next_stage, 0)
+    deadline = get_deadline()
+    if next_stage is None or not deadline.near(budget):
+        return None
+    print(f"⏸️ {deadline.remaining():.0f}s left, under the {budget}s {next_stage} budget; stopping before it")
+    if sharded_rest:
+        return {"mode": "fanout", "stages": list(sharded_rest), "shards": shards, "invoker": invoker}
+    return {"resume_from": [next_stage], "progress": {}}
+
+
+def run_fanout(stages=SHARDED_STAGES, shards=FANOUT_SHARDS, invoker=FANOUT_INVOKER):
+    """Fans each stage out over `shards` invocations in turn, then runs the rest of the pipeline here.
+
+    Returns a continuation instead of starting a stage the Lambda deadline leaves too little time for.
+    """
+    invoke = INVOKERS[invoker]
+    merged = {}
+    last_stage = stage_after(stages)
+    for i, stage in enumerate(stages):
+        events = plan_shards(stage, shards)
+        for event in events:
+            event.update(profile_settings())
+        print(f"🪓 {stage}: {len(events)} shards via {invoker}")
+        with span(f"fanout.{stage}", shards=len(events), invoker=invoker):
+            merged[stage] = merge_results(stage, invoke(events))
+        m = merged[stage]
+        print(f"🧮 {stage}: {m['status']}, output {m['output']} from {m['shards']} shards "
+              f"in {m['seconds']:.1f}s (slowest shard)")
+        if m["status"] == "timeout":
+            # As in run_dag: what the shards wrote stands, and the next run picks up the rest
+            print(f"⏱️ {len(m['unfinished'])} {stage} shards stopped at their timeout; continuing")
+        elif m["status"] != "ok":
+            print(f"⚠️ {len(m['unfinished'])} {stage} shards unfinished; re-send the fanout event to retry")
+            return {"stages": merged, "pipeline": None, "continuation": None}
+        rest = stages[i + 1:]
+        marker = deadline_continuation(rest[0] if rest else last_stage, rest, shards, invoker)
+        if marker:
+            return {"stages": merged, "pipeline": None, "continuation": marker}
+
+    # The stages after the last fanned-out one (selection and cleaning read the
+    # whole sheet once, so they aren't sharded) run here
+    pipeline = run_kane_pipeline(resume_from=[last_stage]) if last_stage else None
+    return {"stages": merged, "pipeline": pipeline, "continuation": None}
+
+
+if __name__ == "__main__":
+    # Usage: python -m kane_lambda.k_fanout [shards]  (local process-pool simulation)
+    import sys
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else FANOUT_SHARDS
+    print(json.dumps(run_fanout(shards=count, invoker="local"), indent=2, default=str))
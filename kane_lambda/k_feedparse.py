@@ -0,0 +1,194 @@
+"""
+Fast RSS/Atom parsing for the headscanner.
+
+parse_feed() streams a feed through xml.etree's iterparse and keeps only
+the fields discover_articles_from_rss reads: title, link, summary,
+published_parsed and author. They follow feedparser's rules:
+  - summary:          <description>/<summary>, else the entry's content
+                      (content:encoded, Atom <content>)
+  - link:             <link>, the Atom alternate link, else a permalink guid/id
+  - published_parsed: <pubDate>, Atom <published>/<issued>, dcterms:issued
+                      (not dc:date or <updated>, which feedparser calls "updated"),
+                      as a UTC struct_time
+  - author:           <author>, dc:creator, Atom author name "(email)"
+Unlike feedparser, summaries are passed through as the feed's HTML, not
+sanitized, and an RFC 822 date without a zone is read as UTC (feedparser
+leaves it unparsed). Dates that are neither RFC 822 with a zone nor ISO
+8601 go to k_dates.parse_date's dateutil fallback.
+
+Feeds list newest first, so given a cutoff the parser stops after
+FEED_STALE_RUN entries in a row published before it. The entries it has
+already read, stale ones included, are still returned. Anything the fast
+path can't read goes to feedparser.parse: malformed XML (which
+feedparser's loose parser copes with), undefined HTML entities, an
+unknown root element, or XHTML content.
+
+    python -m kane_lambda.k_feedparse FILE.xml   # fast vs feedparser on a saved feed
+"""
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_tz
+from io import BytesIO
+from urllib.parse import urljoin
+from xml.etree.ElementTree import iterparse, ParseError
+
+from kane_lambda.config import FEED_PARSER, FEED_STALE_RUN
+from kane_lambda import k_dates
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+ATOM_03 = "{http://purl.org/atom/ns#}"
+RSS_10 = "{http://purl.org/rss/1.0/}"
+RSS_090 = "{http://my.netscape.com/rdf/simple/0.9/}"
+DC = "{http://purl.org/dc/elements/1.1/}"
+DCTERMS = "{http://purl.org/dc/terms/}"
+CONTENT = "{http://purl.org/rss/1.0/modules/content/}"
+RDF = "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}"
+
+FEED_ROOTS = {"rss", f"{RDF}RDF", f"{ATOM}feed", f"{ATOM_03}feed"}
+ENTRY_TAGS = {"item", f"{RSS_10}item", f"{RSS_090}item", f"{ATOM}entry", f"{ATOM_03}entry"}
+TITLE_TAGS = {"title", f"{RSS_10}title", f"{RSS_090}title", f"{ATOM}title", f"{ATOM_03}title", f"{DC}title"}
+LINK_TAGS = {"link", f"{RSS_10}link", f"{RSS_090}link", f"{ATOM}link", f"{ATOM_03}link"}
+SUMMARY_TAGS = {"description", f"{RSS_10}description", f"{ATOM}summary", f"{ATOM_03}summary",
+                f"{DC}description", "summary"}
+CONTENT_TAGS = {f"{CONTENT}encoded", f"{ATOM}content", f"{ATOM_03}content", "fullitem"}
+PUBLISHED_TAGS = {"pubDate", f"{ATOM}published", f"{ATOM}issued", f"{ATOM_03}issued", f"{DCTERMS}issued",
+                  "published", "issued"}
+AUTHOR_TAGS = {"author", f"{DC}creator", f"{ATOM}author", f"{ATOM_03}author"}
+GUID_TAGS = {"guid", f"{ATOM}id", f"{ATOM_03}id"}
+HTML_TYPES = {"text/html", "html", "application/xhtml+xml", "text", "text/plain", ""}
+CONTENT_TYPES = HTML_TYPES | {"xhtml"}  # XHTML content is only picked up to hand the feed to feedparser
+
+
+class Unsupported(Exception):
+    """Something the fast path doesn't handle; the feed goes to feedparser."""
+
+
+class FeedResult(dict):
+    """feedparser-style result: a dict whose keys are also attributes."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+def parse_date(value):
+    """UTC struct_time for an RFC 822 or ISO 8601 date, like feedparser's published_parsed."""
+    value = (value or "").strip()
+    if not value:
+        return None
+    parts = parsedate_tz(value)
+    if parts and parts[9] is not None:
+        try:
+            dt = datetime(*parts[:6], tzinfo=timezone.utc) - timedelta(seconds=parts[9])
+            return dt.utctimetuple()
+        except (OverflowError, ValueError):
+            pass
+    # ISO 8601, then (zoneless RFC 822, odd formats) dateutil, imported only for these
+    dt = k_dates.parse_date(value)
+    return dt.utctimetuple() if dt else None
+
+
+def _text(elem):
+    if elem.get("type") in ("xhtml", "application/xhtml+xml") and len(elem):
+        raise Unsupported("XHTML content")
+    return (elem.text or "").strip()
+
+
+def _author(elem):
+    if not len(elem):
+        return _text(elem)
+    name = email = ""
+    for child in elem:
+        local = child.tag.rsplit("}", 1)[-1]
+        if local == "name":
+            name = (child.text or "").strip()
+        elif local == "email":
+            email = (child.text or "").strip()
+    return f"{name} ({email})" if name and email else name or email
+
+
+def _entry(elem, base):
+    entry = {}
+    link = guid_link = content = None
+    for child in elem:
+        tag = child.tag
+        if tag in TITLE_TAGS:
+            entry.setdefault("title", _text(child))
+        elif tag in LINK_TAGS:
+            href = child.get("href")
+            if href is None:
+                link = _text(child)
+            elif child.get("rel", "alternate") == "alternate" and child.get("type", "text/html") in HTML_TYPES:
+                link = urljoin(base, href.strip())
+        elif tag in SUMMARY_TAGS:
+            entry["summary"] = _text(child)
+        elif tag in CONTENT_TAGS:
+            if content is None and child.get("type", "") in CONTENT_TYPES:
+                content = _text(child)
+        elif tag in PUBLISHED_TAGS:
+            entry["published_parsed"] = parse_date(child.text)
+        elif tag in AUTHOR_TAGS:
+            entry.setdefault("author", _author(child))
+        elif tag in GUID_TAGS:
+            if child.get("isPermaLink", "true") == "true" and guid_link is None:
+                guid_link = _text(child)
+    if "summary" not in entry and content is not None:
+        entry["summary"] = content
+    if link or guid_link:
+        entry["link"] = link or guid_link
+    return entry
+
+
+def fast_parse(content, cutoff=None, base="", stale_run=FEED_STALE_RUN):
+    """The feed's entries as dicts, read up to a run of `stale_run` entries published before `cutoff`.
+
+    Raises ParseError or Unsupported for feeds feedparser should handle.
+    """
+    entries = []
+    cutoff_struct = cutoff.astimezone(timezone.utc).timetuple()[:6] if cutoff else None
+    stale = 0
+    root = None
+    for event, elem in iterparse(BytesIO(content), events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+                if elem.tag not in FEED_ROOTS:
+                    raise Unsupported(f"root element {elem.tag}")
+            continue
+        if elem.tag not in ENTRY_TAGS:
+            continue
+        entry = _entry(elem, base)
+        elem.clear()
+        entries.append(entry)
+        published = entry.get("published_parsed")
+        if cutoff_struct and published:
+            stale = stale + 1 if tuple(published[:6]) < cutoff_struct else 0
+            if stale_run and stale >= stale_run:
+                return FeedResult(bozo=0, entries=entries, feed={}, stopped_early=True, parser="fast")
+    return FeedResult(bozo=0, entries=entries, feed={}, stopped_early=False, parser="fast")
+
+
+def parse_feed(content, response_headers=None, cutoff=None, base="", parser=FEED_PARSER):
+    """Parses feed bytes with the fast path, falling back to feedparser.parse."""
+    if parser == "fast":
+        try:
+            return fast_parse(content, cutoff, base)
+        except (ParseError, Unsupported, ValueError) as e:
+            print(f"↪️ Falling back to feedparser for {base or 'feed'}: {e}")
+    import feedparser
+    result = feedparser.parse(content, response_headers=response_headers)
+    result["parser"] = "feedparser"
+    return result
+
+
+if __name__ == "__main__":
+    # Usage: python -m kane_lambda.k_feedparse FILE.xml
+    with open(sys.argv[1], "rb") as f:
+        data = f.read()
+    for name in ("fast", "feedparser"):
+        start = time.perf_counter()
+        parsed = parse_feed(data, parser=name)
+        print(f"{name:<10} {len(parsed.entries):>5} entries in {(time.perf_counter() - start) * 1000:8.2f} ms")
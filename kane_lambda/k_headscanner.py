@@ -1,22 +1,26 @@
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning)
-import feedparser
-import sys
 import re
 from datetime import datetime, timedelta, timezone
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-import requests
 import json
 from urllib.parse import urlparse
 from html import unescape
 import math
 import os
-from kane_lambda.config import HEADSCANNER_MODEL, HEADSCANNER_PROMPT_TEMPLATE
+from collections import Counter
+from kane_lambda.config import HEADSCANNER_MODEL, HEADSCANNER_PROMPT_TEMPLATE, DEDUP_CACHE_TTL_SECONDS, FEED_CACHE_TTL_SECONDS
+from kane_lambda.config import FEED_WEIGHTS, FEED_QUOTAS, HEADSCANNER_BATCH_ESTIMATE_SECONDS
+from kane_lambda.k_sheet_writer import SheetAppendBuffer
+from kane_lambda.k_clients import build_sheets_service
+from kane_lambda.k_api_scheduler import get_scheduler
+from kane_lambda.k_deadline import get_deadline, BatchTimer
+from kane_lambda.k_id_allocator import reserve_story_ids
+from kane_lambda.k_llm import chat_completion, forget
+from kane_lambda.k_http import fetch_feed, clock
+from kane_lambda.k_state import container_cache
+from kane_lambda.k_trace import span
 
 # === CONFIG ===
-API_KEY = os.environ.get("OPENROUTER_API_KEY", "")
-
 SHEET_ID = "11hRH6mnlTGO1qIQUsqkSZawigy1LQlzBPYnJNbpb_RQ"
 INPUT_SHEET_NAME = "headscanner"
 CREDS_FILE = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "service_account.json"))
@@ -82,7 +86,8 @@ def format_date(published_struct):
 
 def extract_real_url(summary: str) -> str:
     summary = unescape(summary)
-    match = re.search(r'href="(https?://[^"]+)"', summary)
+    # Fast-parsed summaries keep the feed's own quoting; feedparser's sanitizer rewrites it to double quotes
+    match = re.search(r'href=["\'](https?://[^"\']+)["\']', summary)
     return match.group(1) if match else ""
 
 def extract_snippet_author_batch(summaries, headlines, known_authors=None, batch_size=5):
@@ -92,7 +97,16 @@ def extract_snippet_author_batch(summaries, headlines, known_authors=None, batch
         known_authors = [""] * len(summaries)
 
     results = []
+    deadline = get_deadline()
+    timer = BatchTimer(HEADSCANNER_BATCH_ESTIMATE_SECONDS)
     for i in range(0, len(summaries), batch_size):
+        # Stop before a batch that would run past the stage timeout or the Lambda deadline.
+        # The stories left out aren't written, so the next run finds them again.
+        timer.stop()
+        if not timer.fits(deadline):
+            print(f"⏰ Stopping before batch {i // batch_size + 1}; {len(summaries) - i} stories left for the next run")
+            break
+        timer.start()
         batch = [
             {
                 "title": headlines[i + j],
@@ -104,17 +118,9 @@ def extract_snippet_author_batch(summaries, headlines, known_authors=None, batch
 
         prompt = HEADSCANNER_PROMPT_TEMPLATE.replace("{batch}", json.dumps(batch, indent=2))
 
-        headers = {"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"}
-        payload = {
-            "model": HEADSCANNER_MODEL,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.3,
-        }
-
         try:
-            response = requests.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=payload)
-            response.raise_for_status()
-            content = response.json()["choices"][0]["message"]["content"].strip()
+            with span("headscanner.batch", batch=i // batch_size + 1, stories=len(batch)):
+                content = chat_completion(prompt, HEADSCANNER_MODEL, temperature=0.3, stage="headscanner").strip()
 
             # 🧹 Strip markdown/code blocks and noise
             content = re.sub(r"^```(?:json)?\s*", "", content)
@@ -137,15 +143,10 @@ def extract_snippet_author_batch(summaries, headlines, known_authors=None, batch
 
         except Exception as e:
             print("⚠️ LLM batch extraction failed:", e)
-            # Log model, prompt, request and response details
-            try:
-                print("🔍 Model:", HEADSCANNER_MODEL)
-                print("🔍 Prompt to model:\n", prompt)
-                print("🔍 Request payload:", json.dumps(payload))
-                print("🔍 Response status:", response.status_code)
-                print("🔍 Response body:", response.text)
-            except Exception:
-                pass
+            # HTTP details are logged by k_llm; don't keep a response we couldn't use
+            forget(prompt, HEADSCANNER_MODEL, temperature=0.3)
+            print("🔍 Model:", HEADSCANNER_MODEL)
+            print("🔍 Prompt to model:\n", prompt)
             print("🔎 Raw response snippet:\n", content[:300])
             for _ in batch:
                 results.append({"context_snippet": "", "author": ""})
@@ -153,33 +154,41 @@ def extract_snippet_author_batch(summaries, headlines, known_authors=None, batch
     return results
 
 
-def get_existing_sources_and_last_id(spreadsheet_id, sheet_name, creds_file):
-    SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
-    creds = service_account.Credentials.from_service_account_file(creds_file, scopes=SCOPES)
-    service = build('sheets', 'v4', credentials=creds)
+def get_existing_sources(spreadsheet_id, sheet_name, creds_file):
+    # Only the source_url column is needed now that IDs come from k_id_allocator
+    service = build_sheets_service(creds_file, readonly=True)
     sheet = service.spreadsheets()
-
-    result = sheet.values().get(
+    scheduler = get_scheduler()
+
+    # A warm container only reads the rows appended since the last invocation
+    cache = container_cache("dedup", DEDUP_CACHE_TTL_SECONDS)
+    cached = cache.get((spreadsheet_id, sheet_name))
+    if cached and cached["last"]:
+        last_row = cached["rows"] + 1
+        values = scheduler.execute(sheet.values().get(
+            spreadsheetId=spreadsheet_id,
+            range=f"{sheet_name}!E{last_row}:E"
+        )).get('values', [])
+        # clean_sheets rewrites the sheet, moving rows; then the cached last row won't line up
+        if values and values[0] and values[0][0] == cached["last"]:
+            sources = cached["sources"] | {row[0] for row in values[1:] if row}
+            cache.put((spreadsheet_id, sheet_name),
+                      {"sources": sources, "rows": cached["rows"] + len(values) - 1, "last": values[-1][0]})
+            print(f"♻️ Reused cached source index; read {len(values) - 1} new rows")
+            return sources
+        print("🔄 Headscanner sheet changed since the source index was cached; reading it all")
+
+    values = scheduler.execute(sheet.values().get(
         spreadsheetId=spreadsheet_id,
-        range=f"{sheet_name}!A2:E"
-    ).execute()
-
-    values = result.get('values', [])
-    sources = set()
-    last_id = 0
-
-    for row in values:
-        if len(row) >= 5:
-            sources.add(row[4])
-        if row and row[0].isdigit():
-            last_id = max(last_id, int(row[0]))
-
-    return sources, last_id
+        range=f"{sheet_name}!E2:E"
+    )).get('values', [])
+    sources = {row[0] for row in values if row}
+    last = values[-1][0] if values and values[-1] else ""
+    cache.put((spreadsheet_id, sheet_name), {"sources": sources, "rows": len(values), "last": last})
+    return sources
 
 def append_stories_to_sheet(spreadsheet_id, sheet_name, stories, creds_file):
-    SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
-    creds = service_account.Credentials.from_service_account_file(creds_file, scopes=SCOPES)
-    service = build('sheets', 'v4', credentials=creds)
+    service = build_sheets_service(creds_file)
     sheet = service.spreadsheets()
 
     values = []
@@ -199,76 +208,137 @@ def append_stories_to_sheet(spreadsheet_id, sheet_name, stories, creds_file):
         print("⚠️ No new stories to write.")
         return
 
-    body = {"values": values}
-    sheet.values().append(
-        spreadsheetId=spreadsheet_id,
-        range=f"{sheet_name}!A1",
-        valueInputOption="USER_ENTERED",
-        insertDataOption="INSERT_ROWS",
-        body=body
-    ).execute()
+    with SheetAppendBuffer(sheet, spreadsheet_id, f"{sheet_name}!A1", key_column=HEADERS.index("story_id")) as buffer:
+        buffer.extend(values)
 
     print(f"✅ Appended {len(values)} new stories to '{sheet_name}'.")
 
-def discover_articles_from_rss(feeds, existing_sources, cutoff, max_stories):
-    candidates = []
+def feed_entries(url, label, feed_cache, cutoff):
+    """Yields a feed's entries; the feed is fetched when the first one is asked for."""
+    print(f"📡 Fetching feed: {label}")
+    # Conditional GET: an unchanged feed answers 304 and its cached entries are re-filtered
+    cached = feed_cache.get(url) or {}
+    with span("feed.fetch", feed=label) as s:
+        feed = fetch_feed(url, etag=cached.get("etag"), modified=cached.get("modified"), cutoff=cutoff)
+        s.set(status=feed.get("status"), entries=len(feed.entries), parser=feed.get("parser"),
+              stopped_early=feed.get("stopped_early", False))
+    if cached and feed.get("status") == 304:
+        print(f"♻️ {label} unchanged since the last fetch")
+        entries = cached["entries"]
+    else:
+        entries = feed.entries
+        if feed.get("status") == 200 and (feed.get("etag") or feed.get("modified")):
+            feed_cache.put(url, {"etag": feed.get("etag"), "modified": feed.get("modified"), "entries": entries})
+    yield from entries
+
+def feed_candidates(label, entries, existing_sources, cutoff, seen):
+    """Yields one feed's new stories; the parser has already stopped reading past the cutoff (k_feedparse)."""
+    for entry in entries:
+        raw_link = entry.get("link", "").strip()
+        summary = entry.get("summary", "").strip()
+        real_url = extract_real_url(summary) or raw_link
+
+        if not real_url:
+            print(f"⏭️ Skipping entry with no valid link: {entry.get('title', 'No Title')}")
+            continue
 
-    for url,label in feeds:
-        print(f"📡 Fetching feed: {label}")
-        feed = feedparser.parse(url)
+        pub_time = entry.get("published_parsed")
+        pub_dt = datetime(*pub_time[:6], tzinfo=timezone.utc) if pub_time else datetime.now(timezone.utc)
 
-        for entry in feed.entries:
-            if len(candidates) >= max_stories:
-                break
+        if pub_dt < cutoff:
+            print(f"⏱️ Skipping old article: {entry.get('title', 'No Title')} ({pub_dt})")
+            continue
 
-            raw_link = entry.get("link", "").strip()
-            summary = entry.get("summary", "").strip()
-            real_url = extract_real_url(summary) or raw_link
+        if real_url in existing_sources or real_url in seen:
+            print(f"🧾 Already processed: {real_url}")
+            continue
+        seen.add(real_url)
 
-            if not real_url:
-                print(f"⏭️ Skipping entry with no valid link: {entry.get('title', 'No Title')}")
-                continue
+        author = entry.get("dc:creator") or entry.get("author", "")
+        author = author.strip()
 
-            if real_url in existing_sources:
-                print(f"🧾 Already processed: {real_url}")
-                continue
+        yield {
+            "headline": clean_headline(entry.get("title", "Untitled").strip()),
+            "summary": summary,
+            "source": real_url,
+            "publication_date": format_date(pub_time),
+            "author": author
+        }
 
-            pub_time = entry.get("published_parsed")
-            pub_dt = datetime(*pub_time[:6], tzinfo=timezone.utc) if pub_time else datetime.now(timezone.utc)
+def interleave(streams, weights, quotas, limit):
+    """Yields (stream index, item) in smooth weighted round-robin order, up to `limit` items.
+
+    A stream leaves the rotation when it runs dry or reaches its quota (None
+    = no quota); its turns go to the others. Streams weighted 0 or with a
+    quota of 0 are never read.
+    """
+    active = [i for i, w in enumerate(weights) if w > 0 and quotas[i] != 0]
+    credit = dict.fromkeys(active, 0.0)
+    taken = dict.fromkeys(active, 0)
+    produced = 0
+    while active and produced < limit:
+        total = sum(weights[i] for i in active)
+        for i in active:
+            credit[i] += weights[i]
+        pick = max(active, key=credit.get)
+        credit[pick] -= total
+        item = next(streams[pick], None)
+        if item is None:
+            active.remove(pick)
+            credit = dict.fromkeys(active, 0.0)  # restart the rotation among the rest
+            continue
+        taken[pick] += 1
+        produced += 1
+        if quotas[pick] is not None and taken[pick] >= quotas[pick]:
+            active.remove(pick)
+            credit = dict.fromkeys(active, 0.0)
+        yield pick, item
 
-            if pub_dt < cutoff:
-                print(f"⏱️ Skipping old article: {entry.get('title', 'No Title')} ({pub_dt})")
-                continue
 
-            author = entry.get("dc:creator") or entry.get("author", "")
-            author = author.strip()
+def discover_articles_from_rss(feeds, existing_sources, cutoff, max_stories):
+    """Up to `max_stories` new stories, taken from the feeds in turn by FEED_WEIGHTS and capped by FEED_QUOTAS.
+
+    Each feed is fetched when its first turn comes and read only as far as
+    its turns, quota and the cutoff need, so one long feed can't fill the
+    run before the others are read.
+    """
+    feed_cache = container_cache("feeds", FEED_CACHE_TTL_SECONDS)
+    seen = set()  # the same story often appears in several Techmeme feeds
+    labels = [label for _, label in feeds]
+    streams = [
+        feed_candidates(label, feed_entries(url, label, feed_cache, cutoff), existing_sources, cutoff, seen)
+        for url, label in feeds
+    ]
+    weights = [FEED_WEIGHTS.get(label, 1.0) for label in labels]
+    quotas = [FEED_QUOTAS.get(label) for label in labels]
 
-            candidates.append({
-                "headline": clean_headline(entry.get("title", "Untitled").strip()),
-                "summary": summary,
-                "source": real_url,
-                "publication_date": format_date(pub_time),
-                "author": author
-            })
+    candidates = []
+    per_feed = Counter()
+    for i, story in interleave(streams, weights, quotas, max_stories):
+        candidates.append(story)
+        per_feed[labels[i]] += 1
 
     print(f"✅ Found {len(candidates)} new articles within cutoff.")
+    if per_feed:
+        print("📊 Per feed: " + ", ".join(f"{label} {n}" for label, n in per_feed.most_common()))
     return candidates
 
-def run_headscanner(max_stories):
+def run_headscanner(max_stories, feeds=None):
+    # feeds: a subset of RSS_FEEDS when running as one fan-out shard
+    feeds = RSS_FEEDS if feeds is None else feeds
 
-    # 📌 Step 1: Load existing sources and last used story ID
-    existing_sources, last_id = get_existing_sources_and_last_id(SHEET_ID, INPUT_SHEET_NAME, CREDS_FILE)
+    # 📌 Step 1: Load existing sources (story IDs are reserved later, without a sheet scan)
+    existing_sources = get_existing_sources(SHEET_ID, INPUT_SHEET_NAME, CREDS_FILE)
 
-    # 📌 Step 2: Define time cutoff (last 24h, timezone-aware)
-    cutoff = datetime.now(timezone.utc) - timedelta(days=1)
-    next_id = last_id + 1
+    # 📌 Step 2: Define time cutoff (last 24h, timezone-aware; the recording's time when replaying)
+    cutoff = clock() - timedelta(days=1)
 
     # 📌 Step 3: Discover articles via RSS feeds
-    candidates = discover_articles_from_rss(RSS_FEEDS, existing_sources, cutoff, max_stories)
+    candidates = discover_articles_from_rss(feeds, existing_sources, cutoff, max_stories)
 
     if not candidates:
         print("✅ No new recent stories found.")
-        sys.exit(0)
+        return 0
 
     # 📌 Step 4: Prepare inputs for LLM
     summaries = [c["summary"] for c in candidates]
@@ -289,7 +359,7 @@ def run_headscanner(max_stories):
             continue
 
         fresh_stories.append({
-            "story_id": str(next_id),
+            "story_id": "",
             "author": final_author,
             "headline": headlines[i],
             "context_snippet": snippet,
@@ -299,10 +369,13 @@ def run_headscanner(max_stories):
             "input_type": "RSS"
         })
         print(f"✅ Added: {headlines[i][:60]}...")
-        next_id += 1
 
-    # 📌 Step 6: Upload to Google Sheets
+    # 📌 Step 6: Reserve a block of IDs and upload to Google Sheets
     if fresh_stories:
+        story_ids = reserve_story_ids(SHEET_ID, len(fresh_stories), CREDS_FILE)
+        for story, story_id in zip(fresh_stories, story_ids):
+            story["story_id"] = str(story_id)
         append_stories_to_sheet(SHEET_ID, INPUT_SHEET_NAME, fresh_stories, CREDS_FILE)
     else:
-        print("✅ No new stories to add.")
\ No newline at end of file
+        print("✅ No new stories to add.")
+    return len(fresh_stories)
\ No newline at end of file
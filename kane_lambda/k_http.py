@@ -0,0 +1,295 @@
+"""
+Outbound HTTP for feed fetches and OpenRouter calls, with record/replay.
+
+KANE_HTTP_MODE picks the transport:
+  - live:   plain requests (the default)
+  - record: live, and every request/response pair is appended to
+            HTTP_ARCHIVE with its latency
+  - replay: nothing goes out. Responses come from HTTP_ARCHIVE, delayed
+            by their recorded latency times HTTP_REPLAY_LATENCY_SCALE
+            (0 = no delay).
+
+The archive is gzip'd JSON lines, one gzip member per exchange, so
+concurrent stages and fan-out processes can append to it safely.
+Authorization headers are never written. Replay serves an exact
+(method, URL, body) match first. Failing that, it serves the next
+unserved response recorded for the same method, URL and model. IDs in
+prioritizer prompts come from the sheet, so a replay against different
+sheet state still gets an answer of the right shape. A request with no
+recording raises ReplayMiss. In replay mode, clock() returns the time
+the archive was recorded, so feed cutoffs select the same entries.
+
+    python -m kane_lambda.k_http [archive]   # summarize a recording
+
+Benchmarks and tests can swap the transport with set_transport().
+"""
+import base64
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+from kane_lambda.config import HTTP_MODE, HTTP_ARCHIVE, HTTP_REPLAY_LATENCY_SCALE, HTTP_TIMEOUT_SECONDS
+
+RECORDED_HEADERS = {"content-type", "etag", "last-modified", "location", "retry-after"}
+UNRECORDED_REQUEST_HEADERS = {"authorization", "cookie"}
+# What feedparser sends, so feed servers see the same client whichever parser runs
+FEED_USER_AGENT = "feedparser/6.0.14 +https://github.com/kurtmckee/feedparser/"
+FEED_ACCEPT_HEADER = ("application/atom+xml,application/rdf+xml,application/rss+xml,application/x-netcdf,"
+                      "application/xml;q=0.9,text/xml;q=0.2,*/*;q=0.1")
+
+
+class ReplayMiss(Exception):
+    """No recorded response for a request made in replay mode."""
+
+
+class Response:
+    def __init__(self, status_code, headers, content, url, elapsed=0.0):
+        self.status_code = status_code
+        self.headers = {k.lower(): v for k, v in headers.items()}
+        self.content = content
+        self.url = url
+        self.elapsed = elapsed
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+# === TRANSPORTS ===
+def live_transport(method, url, headers, body, timeout):
+    import requests
+
+    start = time.perf_counter()
+    r = requests.request(method, url, headers=headers, data=body, timeout=timeout)
+    return Response(r.status_code, r.headers, r.content, r.url, time.perf_counter() - start)
+
+
+def _request_key(method, url, body):
+    digest = hashlib.sha256(body or b"").hexdigest()[:32]
+    return f"{method} {url} {digest}"
+
+
+def _loose_key(method, url, body):
+    # Same endpoint and model; prompts may differ in sheet-assigned IDs
+    model = ""
+    if body:
+        try:
+            model = json.loads(body).get("model", "")
+        except (ValueError, AttributeError):
+            pass
+    return f"{method} {url} {model}"
+
+
+class Recorder:
+    def __init__(self, path, transport=live_transport):
+        self.path = path
+        self.transport = transport
+        self.lock = threading.Lock()
+
+    def __call__(self, method, url, headers, body, timeout):
+        response = self.transport(method, url, headers, body, timeout)
+        record = {
+            "ts": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "method": method,
+            "url": url,
+            "key": _request_key(method, url, body),
+            "loose_key": _loose_key(method, url, body),
+            "request_headers": {k: v for k, v in headers.items() if k.lower() not in UNRECORDED_REQUEST_HEADERS},
+            "request_body": body.decode("utf-8", errors="replace") if body else "",
+            "status": response.status_code,
+            "headers": {k: v for k, v in response.headers.items() if k in RECORDED_HEADERS},
+            "elapsed_ms": round(response.elapsed * 1000, 1),
+            **_encode_body(response.content),
+        }
+        line = gzip.compress((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        with self.lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # One write per member: appends from other processes never interleave inside it
+            with open(self.path, "ab") as f:
+                f.write(line)
+        return response
+
+
+class Replayer:
+    def __init__(self, path, latency_scale=HTTP_REPLAY_LATENCY_SCALE):
+        self.latency_scale = latency_scale
+        self.lock = threading.Lock()
+        self.records = list(read_archive(path))
+        self.used = [False] * len(self.records)
+        self.exact = defaultdict(deque)
+        self.loose = defaultdict(deque)
+        self.last = {}
+        for i, record in enumerate(self.records):
+            self.exact[record["key"]].append(i)
+            self.loose[record["loose_key"]].append(i)
+        self.recorded_at = self.records[0]["ts"] if self.records else None
+        self.served = Counter()
+        print(f"📼 Replaying {len(self.records)} recorded HTTP exchanges from {path}")
+
+    def _next(self, index, key):
+        queue = index.get(key)
+        while queue and self.used[queue[0]]:
+            queue.popleft()
+        if queue:
+            i = self.last[key] = queue.popleft()
+            self.used[i] = True
+            return self.records[i]
+        # Asked more often than recorded: serve the last match again
+        i = self.last.get(key)
+        return self.records[i] if i is not None else None
+
+    def __call__(self, method, url, headers, body, timeout):
+        with self.lock:
+            record, kind = self._next(self.exact, _request_key(method, url, body)), "exact"
+            if record is None:
+                record, kind = self._next(self.loose, _loose_key(method, url, body)), "loose"
+            self.served[kind if record is not None else "miss"] += 1
+        if record is None:
+            raise ReplayMiss(f"no recording for {method} {url}")
+        elapsed = record["elapsed_ms"] / 1000 * self.latency_scale
+        if elapsed:
+            time.sleep(elapsed)
+        return Response(record["status"], record["headers"], _decode_body(record), url, elapsed)
+
+    def report(self):
+        s = self.served
+        print(f"📼 Replay: {s['exact']} exact, {s['loose']} by endpoint and model, {s['miss']} missing")
+
+
+def _encode_body(content):
+    try:
+        return {"body": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"body_b64": base64.b64encode(content).decode("ascii")}
+
+
+def _decode_body(record):
+    if "body_b64" in record:
+        return base64.b64decode(record["body_b64"])
+    return record.get("body", "").encode("utf-8")
+
+
+def read_archive(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _default_transport():
+    if HTTP_MODE == "record":
+        print(f"⏺️ Recording HTTP exchanges to {HTTP_ARCHIVE}")
+        return Recorder(HTTP_ARCHIVE)
+    if HTTP_MODE == "replay":
+        return Replayer(HTTP_ARCHIVE)
+    return live_transport
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = _default_transport()
+        return _transport
+
+
+def set_transport(transport):
+    """Routes every request through `transport(method, url, headers, body, timeout)`; None restores KANE_HTTP_MODE."""
+    global _transport
+    with _transport_lock:
+        _transport = transport
+
+
+def report():
+    transport = get_transport()
+    if isinstance(transport, Replayer):
+        transport.report()
+
+
+def clock():
+    """Now, or when the archive was recorded while replaying."""
+    transport = get_transport()
+    if isinstance(transport, Replayer) and transport.recorded_at:
+        return datetime.strptime(transport.recorded_at, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc)
+
+
+# === REQUESTS ===
+def request(method, url, headers=None, body=None, timeout=HTTP_TIMEOUT_SECONDS):
+    return get_transport()(method, url, dict(headers or {}), body, timeout)
+
+
+def post_json(url, payload, headers=None, timeout=HTTP_TIMEOUT_SECONDS):
+    headers = {"Content-Type": "application/json", **(headers or {})}
+    return request("POST", url, headers, json.dumps(payload).encode("utf-8"), timeout)
+
+
+def fetch_feed(url, etag=None, modified=None, timeout=HTTP_TIMEOUT_SECONDS, cutoff=None):
+    """Parsed feed for `url` (see k_feedparse), fetched with a conditional GET.
+
+    Like feedparser.parse(url), it never raises: a failed fetch gives an
+    empty bozo result. status/etag/modified are set as feedparser sets them.
+    With `cutoff`, parsing may stop once entries fall behind it.
+    """
+    from kane_lambda.k_feedparse import FeedResult, parse_feed
+
+    headers = {"User-Agent": FEED_USER_AGENT, "Accept": FEED_ACCEPT_HEADER}
+    if etag:
+        headers["If-None-Match"] = etag
+    if modified:
+        headers["If-Modified-Since"] = modified
+    try:
+        response = request("GET", url, headers, timeout=timeout)
+    except Exception as e:
+        print(f"⚠️ Feed fetch failed for {url}: {e}")
+        return FeedResult(bozo=1, bozo_exception=e, entries=[], feed={})
+    if response.status_code == 304:
+        result = FeedResult(bozo=0, entries=[], feed={})
+    else:
+        result = parse_feed(response.content, response.headers, cutoff=cutoff, base=response.url)
+    result["status"] = response.status_code
+    result["href"] = response.url
+    if response.headers.get("etag"):
+        result["etag"] = response.headers["etag"]
+    if response.headers.get("last-modified"):
+        result["modified"] = response.headers["last-modified"]
+    return result
+
+
+def summarize_archive(path):
+    """Per host: exchanges, response bytes and recorded seconds."""
+    hosts = {}
+    for record in read_archive(path):
+        host = hosts.setdefault(urlparse(record["url"]).netloc, {"requests": 0, "bytes": 0, "seconds": 0.0, "errors": 0})
+        host["requests"] += 1
+        host["bytes"] += len(_decode_body(record))
+        host["seconds"] += record["elapsed_ms"] / 1000
+        host["errors"] += 1 if record["status"] >= 400 else 0
+    return hosts
+
+
+if __name__ == "__main__":
+    # Usage: python -m kane_lambda.k_http [archive]
+    path = sys.argv[1] if len(sys.argv) > 1 else HTTP_ARCHIVE
+    print(f"{'host':<40} {'requests':>8} {'KB':>9} {'seconds':>9} {'errors':>6}")
+    for host, h in sorted(summarize_archive(path).items(), key=lambda item: -item[1]["seconds"]):
+        print(f"{host:<40} {h['requests']:>8} {h['bytes'] / 1024:>9.1f} {h['seconds']:>9.2f} {h['errors']:>6}")
@@ -0,0 +1,138 @@
+"""
+Story ID allocation without scanning the headscanner sheet.
+
+The "sheet" backend appends one row per reservation to ID_ALLOCATOR_SHEET:
+
+    reserved_at | count | ids taken | last id
+
+Sheets serializes appends, so by the time the API reports back the row it
+wrote, the rows above it are final. This reservation starts right after
+the IDs they took:
+
+    (last id of the nearest row above that has one) + (IDs taken by the rows in between) + 1
+
+The last id is filled in once the reservation knows its IDs, so it is
+usually on the row just above, and the read-back stays at one short
+window (ID_ALLOCATOR_READ_ROWS rows) however long the tab grows. It only
+reaches further up when rows above haven't recorded theirs yet, and
+reaches the top once, after an upgrade, summing from ID_BLOCK_BASE.
+Overlapping runs therefore never hand out the same IDs, and a run takes
+only the IDs it asked for. Rows written before reservations recorded
+their size have no third column and took ID_BLOCK_SIZE IDs each. The tab
+is created if it doesn't exist. The "local" backend keeps a counter in a
+file under an exclusive lock, for local and emulator runs.
+"""
+import fcntl
+import os
+from datetime import datetime, timezone
+
+from kane_lambda.config import (
+    ID_ALLOCATOR_BACKEND,
+    ID_ALLOCATOR_SHEET,
+    ID_BLOCK_SIZE,
+    ID_BLOCK_BASE,
+    ID_ALLOCATOR_READ_ROWS,
+    ID_ALLOCATOR_LOCAL_PATH,
+)
+from kane_lambda.k_clients import build_sheets_service, CREDS_FILE
+from kane_lambda.k_api_scheduler import get_scheduler
+from kane_lambda.k_sheet_index import appended_rows
+from kane_lambda.k_sheet_rows import add_tab, is_missing_tab
+
+
+def reserve_story_ids(spreadsheet_id, count, creds_file=CREDS_FILE, backend=ID_ALLOCATOR_BACKEND):
+    """Reserves `count` consecutive story IDs and returns them as a range."""
+    if count <= 0:
+        return range(0)
+    if backend == "local":
+        return reserve_local(count)
+    return reserve_sheet_ids(spreadsheet_id, count, creds_file)
+
+
+def reserve_sheet_ids(spreadsheet_id, count, creds_file=CREDS_FILE):
+    stamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    sheet = build_sheets_service(creds_file).spreadsheets()
+
+    try:
+        result = _append_reservation(sheet, spreadsheet_id, [stamp, count, count])
+    except Exception as e:
+        if not is_missing_tab(e):
+            raise
+        add_tab(sheet, spreadsheet_id, ID_ALLOCATOR_SHEET)
+        result = _append_reservation(sheet, spreadsheet_id, [stamp, count, count])
+
+    rows = appended_rows(result)
+    if not rows:
+        raise RuntimeError(f"Could not read reserved row from append response: {result.get('updates')!r}")
+    row = rows[0]
+
+    start = _last_id_above(sheet, spreadsheet_id, row) + 1
+    try:
+        # Rewriting the same cell is harmless, so this may be retried after a timeout
+        get_scheduler().execute(sheet.values().update(
+            spreadsheetId=spreadsheet_id,
+            range=f"{ID_ALLOCATOR_SHEET}!D{row}",
+            valueInputOption="RAW",
+            body={"values": [[start + count - 1]]}
+        ), kind="write", retry_transient=True)
+    except Exception as e:
+        # Later reservations just read further up past this row
+        print(f"⚠️ Could not record the last ID of reservation row {row}: {e}")
+    print(f"🔢 Reserved story IDs {start}-{start + count - 1} (row {row})")
+    return range(start, start + count)
+
+
+def _last_id_above(sheet, spreadsheet_id, row):
+    """The last ID taken by the reservations above `row`."""
+    taken = 0
+    end = row - 1
+    while end >= 1:
+        first = max(1, end - ID_ALLOCATOR_READ_ROWS + 1)
+        result = get_scheduler().execute(sheet.values().get(
+            spreadsheetId=spreadsheet_id, range=f"{ID_ALLOCATOR_SHEET}!B{first}:D{end}"))
+        values = result.get("values", [])
+        values += [[]] * (end - first + 1 - len(values))
+        for r in reversed(values):
+            if len(r) > 2 and str(r[2]).strip().isdigit():
+                return int(r[2]) + taken
+            taken += _ids_taken(r)
+        end = first - 1
+    return ID_BLOCK_BASE + taken
+
+
+def _append_reservation(sheet, spreadsheet_id, values):
+    return get_scheduler().execute(sheet.values().append(
+        spreadsheetId=spreadsheet_id,
+        range=f"{ID_ALLOCATOR_SHEET}!A1",
+        valueInputOption="RAW",
+        insertDataOption="INSERT_ROWS",
+        body={"values": [values]}
+    ), kind="write")
+
+
+def _ids_taken(row):
+    """IDs a reservation row took: its third column, or a whole block for rows without one."""
+    if not row or not str(row[0]).strip().isdigit():
+        return 0
+    if len(row) > 1 and str(row[1]).strip().isdigit():
+        return int(row[1])
+    return ID_BLOCK_SIZE
+
+
+def reserve_local(count, path=ID_ALLOCATOR_LOCAL_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            raw = f.read().strip()
+            last = int(raw) if raw.isdigit() else ID_BLOCK_BASE
+            f.seek(0)
+            f.truncate()
+            f.write(str(last + count))
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+    print(f"🔢 Reserved story IDs {last + 1}-{last + count} (local counter)")
+    return range(last + 1, last + count + 1)
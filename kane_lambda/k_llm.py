@@ -0,0 +1,87 @@
+"""
+OpenRouter chat completions shared by the headscanner and both prioritizers.
+
+Responses are kept in a container-scoped cache (k_state) keyed by model,
+temperature and prompt, so a warm container re-running the same batch
+(a resumed or retried invocation) doesn't pay for it twice. Callers that
+can't parse a response call forget() so the next attempt asks again.
+Every call's token usage, cost and latency is recorded in k_usage under
+the caller's `stage` label.
+"""
+import hashlib
+import json
+import os
+import time
+
+from kane_lambda.config import LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES, LLM_TIMEOUT_SECONDS
+from kane_lambda.k_deadline import get_deadline
+from kane_lambda.k_http import post_json
+from kane_lambda.k_state import container_cache
+from kane_lambda.k_trace import span
+from kane_lambda.k_usage import record_usage
+
+API_KEY = os.environ.get("OPENROUTER_API_KEY", "")
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+
+def _cache():
+    return container_cache("llm", LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES)
+
+
+def _cache_key(prompt, model, temperature):
+    return hashlib.sha256(f"{model}\0{temperature}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+def chat_completion(prompt, model, temperature=0.2, stage=None):
+    """Message content of a single-prompt completion; raises on HTTP errors."""
+    with span(f"llm:{model}", model=model, stage=stage, prompt_bytes=len(prompt)) as s:
+        key = _cache_key(prompt, model, temperature)
+        cached = _cache().get(key)
+        s.set(cached=cached is not None)
+        if cached is not None:
+            record_usage(stage, model, {}, 0.0, cached=True)
+            return cached
+        start = time.perf_counter()
+        content, usage = _post(prompt, model, temperature)
+        r = record_usage(stage, model, usage, time.perf_counter() - start)
+        s.set(response_bytes=len(content), prompt_tokens=r["prompt_tokens"],
+              completion_tokens=r["completion_tokens"], cost=r["cost"])
+        return _cache().put(key, content)
+
+
+def _post(prompt, model, temperature):
+    import requests
+
+    payload = {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": temperature,
+        "usage": {"include": True}  # adds the call's cost to the usage block
+    }
+    # Through k_http so KANE_HTTP_MODE can record or replay it. Stage deadlines are only
+    # checked between batches, so the wait itself is bounded here
+    response = post_json(OPENROUTER_URL, payload, headers={"Authorization": f"Bearer {API_KEY}"},
+                         timeout=request_timeout())
+    try:
+        response.raise_for_status()
+    except requests.exceptions.HTTPError as e:
+        print("❌ Model request HTTPError:", e)
+        print("🔍 Model:", model)
+        print("🔍 Request payload:", json.dumps(payload))
+        print("🔍 Response status:", response.status_code)
+        print("🔍 Response body:", response.text)
+        raise
+    data = response.json()
+    return data["choices"][0]["message"]["content"], data.get("usage") or {}
+
+
+def request_timeout(cap=LLM_TIMEOUT_SECONDS):
+    """Seconds to wait for a completion: `cap`, or less when the current deadline is sooner."""
+    remaining = get_deadline().remaining()
+    # Thinking models can take minutes on a batch; a call started at the deadline still gets a moment
+    return cap if remaining is None else max(1.0, min(cap, remaining))
+
+
+def forget(prompt, model, temperature=0.2):
+    """Drops a cached response, e.g. one the caller couldn't parse."""
+    _cache().discard(_cache_key(prompt, model, temperature))
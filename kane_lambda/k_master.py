@@ -1,28 +1,74 @@
-from kane_lambda.k_sheet_clean import clean_sheets
-from kane_lambda.k_headscanner import run_headscanner
-from kane_lambda.k_prioritizer import run_prioritizer
-from kane_lambda.k_prioritizer_split import run_split_prioritizer
-from kane_lambda.k_selector import run_selector
-from kane_lambda.config import ENABLE_K_SHEET_CLEAN, ENABLE_K_SELECTOR, USE_SPLIT_PRIORITIZER
-
-def run_kane_pipeline():
-    print("🚀 Starting full Kane pipeline...")
-    run_headscanner(300)
+from kane_lambda.config import ENABLE_K_SHEET_CLEAN, ENABLE_K_SELECTOR, USE_SPLIT_PRIORITIZER, STAGE_TIMEOUTS
+from kane_lambda.k_api_scheduler import reset_scheduler, get_scheduler
+from kane_lambda.k_dag import Stage, run_dag, dag_ok, continuation, report
+from kane_lambda.k_trace import span, begin_trace, finish_trace
+from kane_lambda.k_http import report as http_report
+
+HEADSCANNER_MAX_STORIES = 300
+
+# Stage modules (and feedparser, requests and googleapiclient behind them) are
+# imported when their stage starts, so the handler loads quickly on a cold
+# start and disabled stages never load at all.
+def _headscanner():
+    from kane_lambda.k_headscanner import run_headscanner
+    return run_headscanner(HEADSCANNER_MAX_STORIES)
+
+def _prioritizer(new_stories):
+    if USE_SPLIT_PRIORITIZER:
+        from kane_lambda.k_prioritizer_split import run_split_prioritizer
+        return run_split_prioritizer()
+    from kane_lambda.k_prioritizer import run_prioritizer
+    return run_prioritizer()
+
+def _selector(prioritized):
+    from kane_lambda.k_selector import run_selector
+    return run_selector()
+
+def _sheet_clean(prioritized, selected):
+    from kane_lambda.k_sheet_clean import clean_sheets
+    return clean_sheets()
+
+def build_pipeline():
+    # Artifacts are row counts; the data itself lives in the sheets. The cleaner
+    # rewrites the sheets the selector reads, so it runs after the newsletter.
     if USE_SPLIT_PRIORITIZER:
         print("🔀 Using split prioritizer...")
-        run_split_prioritizer()
     else:
         print("🔀 Using standard prioritizer...")
-        run_prioritizer()
-    if ENABLE_K_SELECTOR:
-        run_selector()
+    return [
+        Stage("headscanner", _headscanner,
+              outputs=["new_stories"], timeout=STAGE_TIMEOUTS.get("headscanner")),
+        # Runs even when headscanner found nothing: earlier unprocessed stories may be waiting
+        Stage("prioritizer", _prioritizer,
+              inputs=["new_stories"], outputs=["prioritized"], timeout=STAGE_TIMEOUTS.get("prioritizer")),
+        Stage("selector", _selector,
+              inputs=["prioritized"], outputs=["selected"], timeout=STAGE_TIMEOUTS.get("selector"),
+              enabled=ENABLE_K_SELECTOR),
+        Stage("sheet_clean", _sheet_clean,
+              inputs=["prioritized", "selected"], outputs=["kept_rows"], timeout=STAGE_TIMEOUTS.get("sheet_clean"),
+              enabled=ENABLE_K_SHEET_CLEAN),
+    ]
+
+def run_kane_pipeline(resume_from=None):
+    if resume_from:
+        print(f"🚀 Resuming Kane pipeline from {resume_from}...")
     else:
-        print("⚠️ k_selector disabled by config")
-    if ENABLE_K_SHEET_CLEAN:
-        clean_sheets()
+        print("🚀 Starting full Kane pipeline...")
+    reset_scheduler()
+    with span("pipeline", resume_from=resume_from):
+        results = run_dag(build_pipeline(), resume_from=resume_from)
+    report(results)
+    if not dag_ok(results):
+        print("⚠️ Pipeline finished with failed stages.")
+    elif continuation(results):
+        print(f"⏸️ Stopped at the Lambda deadline; resume from {continuation(results)['resume_from']}")
     else:
-        print("⚠️ k_sheet_clean disabled by config")
-    print("✅ All stages completed.")
+        print("✅ All stages completed.")
+    get_scheduler().report()
+    http_report()
+    return results
 
 if __name__ == "__main__":
-    run_kane_pipeline()
\ No newline at end of file
+    begin_trace("kane:local")
+    run_kane_pipeline()
+    finish_trace()
\ No newline at end of file
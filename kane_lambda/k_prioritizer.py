@@ -1,17 +1,18 @@
-import requests
 import json
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 import re
 from urllib.parse import urlparse
 import os
-from dateutil import parser as date_parser
-import pytz
 
 # Config-driven constants
-from kane_lambda.config import CATEGORIES, PROMPT_TEMPLATE
-
-API_KEY = os.environ.get("OPENROUTER_API_KEY", "")
+from kane_lambda.config import CATEGORIES, PROMPT_TEMPLATE, PRIORITIZER_BATCH_ESTIMATE_SECONDS
+from kane_lambda.k_sheet_writer import SheetAppendBuffer
+from kane_lambda.k_clients import build_sheets_service
+from kane_lambda.k_api_scheduler import get_scheduler
+from kane_lambda.k_sheet_rows import SheetRows, dict_rows
+from kane_lambda.k_dates import to_iso_date
+from kane_lambda.k_deadline import get_deadline, BatchTimer, DeadlineReached
+from kane_lambda.k_llm import chat_completion, forget
+from kane_lambda.k_trace import span
 
 MODEL = "google/gemini-2.0-flash-001"
 
@@ -32,31 +33,34 @@ OUTPUT_HEADERS = [
     "significance_score",
     "human_priority",
 ]
+# Column order of the rows written to the output sheet
+RESULT_COLUMNS = [
+    "story_id",
+    "author",
+    "publication_date",
+    "headline",
+    "source_name",
+    "fact_summary",
+    "source_url",
+    "category",
+    "category_reason",
+    "significance_score",
+    "human_priority",
+]
+PUBLICATION_DATE_COLUMN = 2  # position in result rows (both layouts), used for the date index
+STORY_ID_COLUMN = 0  # key for telling which rows of a failed append were written
 
 def read_stories_from_sheet(spreadsheet_id, sheet_name, creds_file):
-    SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
-    creds = service_account.Credentials.from_service_account_file(creds_file, scopes=SCOPES)
-
-    service = build('sheets', 'v4', credentials=creds)
+    service = build_sheets_service(creds_file, readonly=True)
     sheet = service.spreadsheets()
 
-    range_str = f"{sheet_name}!A1:Z"
-    result = sheet.values().get(spreadsheetId=spreadsheet_id, range=range_str).execute()
-    values = result.get('values', [])
-
-    if not values:
-        print("No data found.")
-        return []
+    return stories_from_values(SheetRows(sheet, spreadsheet_id, sheet_name))
 
-    headers = values[0]
-    rows = values[1:]
-
-    # Convert to list of dicts
-    story_batch = []
-    for row in rows:
-        story = dict(zip(headers, row))
+def stories_from_values(values):
+    """Yields a normalized story per row of `values` (header first), so a SheetRows can be streamed."""
+    for story in dict_rows(values):
         # Normalize fields so all are present
-        story_batch.append({
+        yield {
             "story_id": story.get("story_id", ""),
             "author": story.get("author", ""),
             "headline": story.get("headline", ""),
@@ -64,31 +68,14 @@ def read_stories_from_sheet(spreadsheet_id, sheet_name, creds_file):
             "source_url": story.get("source_url", ""),
             "publication_date": story.get("publication_date", ""),
             "human_priority": int(story.get("human_priority", "0") or 0)
-        })  
-
-    return story_batch
+        }
 
 def build_prompt(story_batch):
     # Inject the serialized story_batch into the PROMPT_TEMPLATE
     return PROMPT_TEMPLATE.replace("{story_batch}", json.dumps(story_batch, indent=2))
 
 def call_openrouter(prompt):
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "model": MODEL,
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.2
-    }
-    response = requests.post(
-        "https://openrouter.ai/api/v1/chat/completions",
-        headers=headers,
-        json=payload
-    )
-    response.raise_for_status()
-    return response.json()["choices"][0]["message"]["content"]
+    return chat_completion(prompt, MODEL, temperature=0.2, stage="prioritizer")
 
 def parse_source_from_url(url):
     try:
@@ -99,24 +86,69 @@ def parse_source_from_url(url):
         return ""
 
 def get_processed_story_ids(spreadsheet_id, sheet_name, creds_file):
-    SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
-    creds = service_account.Credentials.from_service_account_file(creds_file, scopes=SCOPES)
-    service = build('sheets', 'v4', credentials=creds)
+    service = build_sheets_service(creds_file, readonly=True)
     sheet = service.spreadsheets()
 
     range_str = f"{sheet_name}!A2:A"  # Story IDs are in col A, skip header
-    result = sheet.values().get(spreadsheetId=spreadsheet_id, range=range_str).execute()
+    result = get_scheduler().execute(sheet.values().get(spreadsheetId=spreadsheet_id, range=range_str))
     values = result.get('values', [])
     return {row[0] for row in values if row}  # Set of existing story_ids
 
-def process_story_batch(story_batch, batch_size=5):
+def read_input_and_processed(spreadsheet_id, input_sheet, output_sheet, creds_file):
+    """(SheetRows of the input sheet, processed story IDs).
+
+    The input's first page and the ID column share one batchGet; the rest
+    of the input is read page by page as it is iterated.
+    """
+    sheet = build_sheets_service(creds_file, readonly=True).spreadsheets()
+    input_values = SheetRows(sheet, spreadsheet_id, input_sheet)
+    processed_read = get_scheduler().queue_read(sheet, spreadsheet_id, f"{output_sheet}!A2:A")
+    return input_values, {row[0] for row in processed_read.result() if row}
+
+def select_unprocessed(story_batch, processed_ids, id_range=None):
+    """Stories still to prioritize, optionally only those with numeric IDs in id_range (inclusive).
+
+    `story_batch` can be any iterable; only the selected stories are kept.
+
+    Only the first row per source URL is kept, so concurrent headscanner
+    shards that picked up the same story from different feeds don't get it
+    prioritized twice (clean_sheets later drops the duplicate).
+    """
+    seen_urls = set()
+    selected = []
+    for story in story_batch:
+        url = story.get("source_url", "")
+        if url:
+            if url in seen_urls:
+                continue
+            seen_urls.add(url)
+        if story["story_id"] in processed_ids:
+            continue
+        if id_range is not None:
+            sid = str(story["story_id"]).strip()
+            if not sid.isdigit() or not id_range[0] <= int(sid) <= id_range[1]:
+                continue
+        selected.append(story)
+    return selected
+
+def process_story_batch(story_batch, batch_size=5, writer=None):
     results = []
+    deadline = get_deadline()
+    timer = BatchTimer(PRIORITIZER_BATCH_ESTIMATE_SECONDS)
     for i in range(0, len(story_batch), batch_size):
         batch = story_batch[i:i+batch_size]
+        # Don't start a batch that could be cut off by the Lambda timeout; what's done is already written
+        timer.stop()
+        if not timer.fits(deadline):
+            raise DeadlineReached(
+                f"stopped before batch {i//batch_size + 1} with {len(story_batch) - i} stories left",
+                progress={"processed": i, "remaining": len(story_batch) - i, "next_story_id": batch[0]["story_id"]})
+        timer.start()
         print(f"\n🔄 Processing batch {i//batch_size + 1} ({len(batch)} stories)...")
 
         prompt = build_prompt(batch)
-        raw_response = call_openrouter(prompt)
+        with span("prioritizer.batch", batch=i//batch_size + 1, stories=len(batch)):
+            raw_response = call_openrouter(prompt)
 
         try:
             cleaned_response = re.sub(r"^```(?:json)?\n|\n```$", "", raw_response.strip())
@@ -124,8 +156,10 @@ def process_story_batch(story_batch, batch_size=5):
         except json.JSONDecodeError as e:
             print("❌ Failed to parse response:", e)
             print("🔍 Raw response:", raw_response)
+            forget(prompt, MODEL)
             continue
 
+        batch_results = []
         for result in parsed:
             sid = result.get("story_id")
             original = next((item for item in batch if item["story_id"] == sid), None)
@@ -134,14 +168,9 @@ def process_story_batch(story_batch, batch_size=5):
                 readable_source = parse_source_from_url(source_url)
                 # Normalize publication_date to YYYY-MM-DD UTC
                 raw_pub = original.get("publication_date", "")
-                try:
-                    dt = date_parser.parse(raw_pub)
-                    dt_utc = dt.astimezone(pytz.UTC) if dt.tzinfo else dt.replace(tzinfo=pytz.UTC)
-                    pub_date_str = dt_utc.strftime("%Y-%m-%d")
-                except Exception:
-                    pub_date_str = raw_pub
-
-                results.append({
+                pub_date_str = to_iso_date(raw_pub, default=raw_pub)
+
+                batch_results.append({
                     "story_id": sid,
                     "author": original.get("author", ""),
                     "headline": original.get("headline", ""),
@@ -154,72 +183,47 @@ def process_story_batch(story_batch, batch_size=5):
                     "significance_score": result.get("significance_score", ""),
                     "human_priority": original.get("human_priority", 0),
                 })
+
+        results.extend(batch_results)
+        # Hand finished rows to the write-behind buffer so they survive later failures
+        if writer is not None:
+            writer.extend(result_to_row(r) for r in batch_results)
+            if deadline.active:
+                writer.flush()
     return results
 
-def write_results_to_sheet(spreadsheet_id, sheet_name, results, creds_file):
-    SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
-    creds = service_account.Credentials.from_service_account_file(creds_file, scopes=SCOPES)
-    service = build('sheets', 'v4', credentials=creds)
-    sheet = service.spreadsheets()
+def result_to_row(row, columns=RESULT_COLUMNS):
+    return [row.get(name, "") for name in columns]
 
-    values = []
-    for row in results:
-        values.append([
-            row.get("story_id", ""),
-            row.get("author", ""),
-            row.get("publication_date", ""),
-            row.get("headline", ""),
-            row.get("source_name", ""),
-            row.get("fact_summary", ""),
-            row.get("source_url", ""),
-            row.get("category", ""),
-            row.get("category_reason", ""),
-            row.get("significance_score", ""),
-            row.get("human_priority", "")
-        ])
-
-    if not values:
-        print("⚠️ No new rows to write.")
-        return
-
-    body = {"values": values}
-
-    sheet.values().append(
-        spreadsheetId=spreadsheet_id,
-        range=sheet_name,
-        valueInputOption="USER_ENTERED",
-        insertDataOption="INSERT_ROWS",
-        body=body
-    ).execute()
-
-    print(f"✅ Appended {len(values)} new rows to '{sheet_name}'.")
-
-def run_prioritizer():
-    print("📥 Reading stories from input sheet...")
-    story_batch = read_stories_from_sheet(SHEET_ID, INPUT_SHEET_NAME, CREDS_FILE)
-
-    if not story_batch:
-        print("🚫 No input stories found.")
-        exit()
+def open_results_writer(spreadsheet_id, sheet_name, creds_file):
+    service = build_sheets_service(creds_file)
+    return SheetAppendBuffer(service.spreadsheets(), spreadsheet_id, sheet_name,
+                             index_date_column=PUBLICATION_DATE_COLUMN, key_column=STORY_ID_COLUMN)
 
-    print("📤 Checking processed stories in output sheet...")
-    processed_ids = get_processed_story_ids(SHEET_ID, OUTPUT_SHEET_NAME, CREDS_FILE)
+def run_prioritizer(id_range=None):
+    print("📥 Reading stories from input sheet and processed IDs from output sheet...")
+    input_values, processed_ids = read_input_and_processed(SHEET_ID, INPUT_SHEET_NAME, OUTPUT_SHEET_NAME, CREDS_FILE)
 
     # ⚡ NEW LOGIC: Only keep stories that are NOT yet processed
-    unprocessed_batch = [s for s in story_batch if s["story_id"] not in processed_ids]
+    unprocessed_batch = select_unprocessed(stories_from_values(input_values), processed_ids, id_range)
+
+    if input_values.rows <= 1:
+        print("🚫 No input stories found.")
+        return 0
 
     if not unprocessed_batch:
         print("✅ All stories already processed. Exiting prioritizer...")
-        return
+        return 0
 
     print(f"⚙️ Processing {len(unprocessed_batch)} unprocessed stories...")
-    results = process_story_batch(unprocessed_batch, batch_size=5)
+    with open_results_writer(SHEET_ID, OUTPUT_SHEET_NAME, CREDS_FILE) as writer:
+        results = process_story_batch(unprocessed_batch, batch_size=5, writer=writer)
 
     if results:
-        print(f"\n✍️ Writing {len(results)} new results to output sheet...")
-        write_results_to_sheet(SHEET_ID, OUTPUT_SHEET_NAME, results, CREDS_FILE)
+        print(f"\n✍️ Wrote {len(results)} new results to output sheet.")
     else:
         print("✅ No new results to write.")
+    return len(results)
 
 if __name__ == "__main__":
     run_prioritizer()
\ No newline at end of file
@@ -0,0 +1,171 @@
+"""
+On-demand CPU and memory profiling of selected pipeline stages.
+
+Set KANE_PROFILE_STAGES to a comma-separated list of stage names, or
+"all". A Lambda event can instead carry "profile" (same format) and
+optionally "profile_kinds"; the event setting lasts for that invocation
+only. k_dag runs the stages one at a time in the calling thread, each
+listed one under profiled():
+  - cpu:    cProfile of that thread, which does all of the stage's work.
+  - memory: tracemalloc net allocations by line, plus the peak.
+
+Each profiled stage logs a summary and its hottest functions, and writes
+<stage>.pstats (load it with pstats.Stats) and a <stage>.txt report of
+the top functions and allocation sites to PROFILE_ROOT/dt=YYYY-MM-DD/, a
+local directory or an s3:// prefix. Like k_archive, it won't write to a
+local root inside Lambda, where the files would be lost with the
+container; only the log lines are kept then. When no stage is selected,
+profiled() costs one set lookup per stage.
+
+    python -m kane_lambda.k_profile FILE.pstats [sort] [rows]   # print a saved profile
+"""
+import io
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from kane_lambda.config import PROFILE_STAGES, PROFILE_KINDS, PROFILE_ROOT, PROFILE_TOP, PROFILE_TRACEMALLOC_FRAMES
+from kane_lambda.k_trace import get_trace
+
+KINDS = ("cpu", "memory")
+
+
+def _parse(value):
+    if not value:
+        return frozenset()
+    if isinstance(value, str):
+        value = value.split(",")
+    return frozenset(v.strip() for v in value if v and v.strip())
+
+
+_stages = _parse(PROFILE_STAGES)
+_kinds = _parse(PROFILE_KINDS)
+_memory_lock = threading.Lock()
+_memory_users = 0
+
+
+def configure(stages=None, kinds=None):
+    """Selects the stages (names, a comma-separated string or "all") and kinds; None restores the env settings."""
+    global _stages, _kinds
+    _stages = _parse(PROFILE_STAGES if stages is None else stages)
+    _kinds = _parse(PROFILE_KINDS if kinds is None else kinds)
+    unknown = _kinds - set(KINDS)
+    if unknown:
+        # A typo in a diagnostics setting shouldn't fail the run
+        print(f"⚠️ Ignoring unknown profile kinds {sorted(unknown)}; choose from {KINDS}")
+        _kinds -= unknown
+    if _stages:
+        print(f"🔬 Profiling {', '.join(sorted(_stages))} ({', '.join(sorted(_kinds))})")
+    return sorted(_stages)
+
+
+def event_settings():
+    """The current selection as Lambda event keys, for passing on to shard invocations."""
+    return {"profile": sorted(_stages), "profile_kinds": sorted(_kinds)} if _stages else {}
+
+
+@contextmanager
+def profiled(name):
+    if not _stages or (name not in _stages and "all" not in _stages):
+        yield
+        return
+
+    import cProfile
+    import tracemalloc
+
+    profiler = cProfile.Profile() if "cpu" in _kinds else None
+    before = _start_memory(tracemalloc) if "memory" in _kinds else None
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+        seconds = time.perf_counter() - start
+        memory = _stop_memory(tracemalloc, before) if before is not None else None
+        try:
+            _report(name, seconds, profiler, memory)
+        except Exception as e:
+            print(f"⚠️ Failed to write the {name} profile: {e}")
+
+
+def _start_memory(tracemalloc):
+    global _memory_users
+    with _memory_lock:
+        if _memory_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        _memory_users += 1
+        tracemalloc.reset_peak()
+        return tracemalloc.take_snapshot(), tracemalloc.get_traced_memory()[0]
+
+
+def _stop_memory(tracemalloc, before):
+    global _memory_users
+    snapshot, start_bytes = before
+    with _memory_lock:
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        _memory_users -= 1
+        if _memory_users == 0:
+            tracemalloc.stop()
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    growth = after.filter_traces(ignore).compare_to(snapshot.filter_traces(ignore), "lineno")
+    return {"net_bytes": current - start_bytes, "peak_bytes": peak - start_bytes, "growth": growth}
+
+
+def durable_root(root=PROFILE_ROOT):
+    """False inside Lambda for a local root, which the container takes with it."""
+    return root.startswith("s3://") or not os.environ.get("AWS_LAMBDA_FUNCTION_NAME")
+
+
+def _report(name, seconds, profiler, memory):
+    import marshal
+    import pstats
+    from kane_lambda.k_archive import write_bytes
+
+    now = datetime.now(timezone.utc)
+    key = f"dt={now:%Y-%m-%d}/{now:%H%M%S}-{get_trace().trace_id[:8]}-{os.getpid()}-{name}"
+    text = io.StringIO()
+    text.write(f"Stage {name}: {seconds:.2f}s wall, trace {get_trace().trace_id}\n\n")
+
+    summary = [f"{seconds:.2f}s wall"]
+    hot = []
+    files = {}
+    if profiler:
+        stats = pstats.Stats(profiler, stream=text)
+        summary.append(f"{stats.total_tt:.2f}s in profiled calls")
+        for sort in ("cumulative", "tottime"):
+            text.write(f"=== Top {PROFILE_TOP} functions by {sort} time ===\n")
+            stats.sort_stats(sort).print_stats(PROFILE_TOP)
+        # Own-time hot spots for the log line
+        hot = sorted(stats.stats.items(), key=lambda item: -item[1][2])[:5]
+        files[f"{key}.pstats"] = marshal.dumps(stats.stats)
+    if memory:
+        summary.append(f"{memory['net_bytes'] / 1e6:+.1f} MB net, {memory['peak_bytes'] / 1e6:.1f} MB peak")
+        text.write(f"=== Top {PROFILE_TOP} allocation sites by net growth ===\n")
+        for stat in memory["growth"][:PROFILE_TOP]:
+            text.write(f"{stat}\n")
+    files[f"{key}.txt"] = text.getvalue().encode("utf-8")
+
+    if durable_root():
+        for file_key, data in files.items():
+            write_bytes(PROFILE_ROOT, file_key, data)
+        print(f"🔬 {name} profile: {', '.join(summary)} → {PROFILE_ROOT.rstrip('/')}/{key}.{{txt,pstats}}")
+    else:
+        print(f"🔬 {name} profile: {', '.join(summary)} (not saved: profile root {PROFILE_ROOT!r} is local "
+              "storage, which Lambda discards; set KANE_PROFILE_ROOT to an s3:// prefix)")
+    for (filename, line, function), (_, _, tottime, _, _) in hot:
+        print(f"   {tottime:>7.3f}s  {os.path.basename(filename)}:{line}({function})")
+
+
+if __name__ == "__main__":
+    # Usage: python -m kane_lambda.k_profile FILE.pstats [sort] [rows]
+    import pstats
+    sort_arg = sys.argv[2] if len(sys.argv) > 2 else "cumulative"
+    rows_arg = int(sys.argv[3]) if len(sys.argv) > 3 else PROFILE_TOP
+    pstats.Stats(sys.argv[1]).strip_dirs().sort_stats(sort_arg).print_stats(rows_arg)
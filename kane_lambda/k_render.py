@@ -0,0 +1,159 @@
+"""
+Single-pass newsletter renderer.
+
+build_newsletter() turns the selected stories into a small document model:
+
+    {"date": "YYYY-MM-DD", "title": "...", "sections": [{"heading": "...", "items": ["...", ...]}]}
+
+render_newsletter() walks that model once and produces plain text, Markdown,
+HTML and the Docs layout (text segments plus style ranges in UTF-16 code
+units, relative to the insertion point). docs_requests() places the layout
+at an absolute index: one insertText per section, then one style request
+per range. Renders are cached per date in memory and in RENDER_CACHE_DIR.
+"""
+import hashlib
+import html
+import json
+import os
+from datetime import datetime
+
+from kane_lambda.config import RENDER_CACHE_DIR
+
+TITLE_TEMPLATE = "Exponential View Special AI Daily Newsletter — {date}"
+TITLE_STYLE = {"bold": True, "fontSize": {"magnitude": 16, "unit": "PT"}}
+HEADING_STYLE = {"bold": True, "fontSize": {"magnitude": 14, "unit": "PT"}}
+ITEM_STYLE = {"fontSize": {"magnitude": 11, "unit": "PT"}}
+BULLET_PRESET = "BULLET_DISC_CIRCLE_SQUARE"
+
+_cache = {}
+
+
+def utf16_len(text):
+    # Docs indexes count UTF-16 code units, so astral characters (emoji) count twice
+    return len(text.encode("utf-16-le")) // 2
+
+
+def build_newsletter(grouped, categories, day=None, per_category=6):
+    day = day or datetime.now()
+    sections = []
+    for category in categories:
+        items = [s.get("fact_summary", "").strip() for s in grouped.get(category, [])[:per_category]]
+        items = [item for item in items if item]
+        if items:
+            sections.append({"heading": category, "items": items})
+    return {
+        "date": day.strftime("%Y-%m-%d"),
+        "title": TITLE_TEMPLATE.format(date=day.strftime("%B %d, %Y")),
+        "sections": sections,
+    }
+
+
+def newsletter_key(newsletter):
+    digest = hashlib.sha1(json.dumps(newsletter, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    return f"{newsletter['date']}-{digest}"
+
+
+def render_newsletter(newsletter):
+    key = newsletter_key(newsletter)
+    if key in _cache:
+        return _cache[key]
+
+    title = newsletter["title"]
+    text = [title, "\n\n"]
+    markdown = [f"# {title}\n\n"]
+    html_parts = [
+        '<div style="font-family:Arial, sans-serif;">',
+        f'<h1 style="font-size:16px; font-weight:bold;">{html.escape(title)}</h1>',
+    ]
+
+    # Docs layout: segments are inserted back to back; ranges are relative to the first one
+    segments = [title + "\n\n"]
+    styles = [("text", 0, utf16_len(title), TITLE_STYLE)]
+    offset = utf16_len(segments[0])
+
+    for section in newsletter["sections"]:
+        heading, items = section["heading"], section["items"]
+
+        text.append(heading + "\n")
+        markdown.append(f"## {heading}\n\n")
+        html_parts.append(
+            f'<h2 style="font-size:14px; font-weight:bold; margin-top:20px;">{html.escape(heading)}</h2><ul>')
+
+        body = "".join(item + "\n" for item in items)
+        segment = heading + "\n" + body + "\n"
+        heading_end = offset + utf16_len(heading)
+        body_start = heading_end + 1
+        body_end = body_start + utf16_len(body)
+        styles.append(("text", offset, heading_end, HEADING_STYLE))
+        styles.append(("text", body_start, body_end, ITEM_STYLE))
+        styles.append(("bullets", body_start, body_end, None))
+        segments.append(segment)
+        offset += utf16_len(segment)
+
+        for item in items:
+            text.append(f"- {item}\n")
+            markdown.append(f"- {item}\n")
+            html_parts.append(f'<li style="font-size:11px; margin-bottom:8px;">{html.escape(item)}</li>')
+        text.append("\n")
+        markdown.append("\n")
+        html_parts.append("</ul>")
+
+    html_parts.append("</div>")
+    rendered = {
+        "key": key,
+        "date": newsletter["date"],
+        "title": newsletter["title"],
+        "text": "".join(text),
+        "markdown": "".join(markdown),
+        "html": "".join(html_parts),
+        "docs": {"segments": segments, "styles": styles, "length": offset},
+    }
+    _cache[key] = rendered
+    return rendered
+
+
+def docs_requests(rendered, start_index, range_name=None):
+    """Docs batchUpdate requests placing the rendered newsletter at start_index."""
+    requests = []
+    index = start_index
+    for segment in rendered["docs"]["segments"]:
+        requests.append({"insertText": {"location": {"index": index}, "text": segment}})
+        index += utf16_len(segment)
+
+    for kind, start, end, style in rendered["docs"]["styles"]:
+        rng = {"startIndex": start_index + start, "endIndex": start_index + end}
+        if kind == "bullets":
+            requests.append({"createParagraphBullets": {"range": rng, "bulletPreset": BULLET_PRESET}})
+        else:
+            requests.append({"updateTextStyle": {"range": rng, "textStyle": style, "fields": ",".join(style)}})
+
+    if range_name:
+        requests.append({
+            "createNamedRange": {
+                "name": range_name,
+                "range": {"startIndex": start_index, "endIndex": start_index + rendered["docs"]["length"]},
+            }
+        })
+    return requests
+
+
+def save_render(rendered, cache_dir=RENDER_CACHE_DIR):
+    """Writes the HTML/Markdown/text renders to <cache_dir>/<date>.{html,md,txt}."""
+    os.makedirs(cache_dir, exist_ok=True)
+    paths = {}
+    for fmt, ext in (("html", "html"), ("markdown", "md"), ("text", "txt")):
+        path = os.path.join(cache_dir, f"{rendered['date']}.{ext}")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(rendered[fmt])
+        paths[fmt] = path
+    print(f"💾 Saved newsletter renders for {rendered['date']} to {cache_dir}")
+    return paths
+
+
+def load_render(date_str, fmt="html", cache_dir=RENDER_CACHE_DIR):
+    ext = {"html": "html", "markdown": "md", "text": "txt"}[fmt]
+    path = os.path.join(cache_dir, f"{date_str}.{ext}")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return f.read()
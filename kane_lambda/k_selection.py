@@ -0,0 +1,128 @@
+"""
+Score-ranked top-k story selection for the newsletter.
+
+Stories are streamed once: each gets a composite score (SELECTION_WEIGHTS)
+and is pushed into a bounded min-heap for its category, so selection is
+O(n log k) and memory stays O(categories * k) however many days of stories
+are fed in. A final pass over the surviving candidates, best first, applies
+the per-source cap and drops near-duplicate blurbs.
+"""
+import heapq
+import re
+from datetime import datetime, timezone
+from itertools import count
+from urllib.parse import urlparse
+
+from kane_lambda.config import (
+    SELECTION_PER_CATEGORY,
+    SELECTION_PER_SOURCE_CAP,
+    SELECTION_DEDUP_THRESHOLD,
+    SELECTION_CANDIDATE_FACTOR,
+    SELECTION_RECENCY_DAYS,
+    SELECTION_WEIGHTS,
+)
+from kane_lambda.k_dates import parse_date
+
+TRUE_VALUES = {"true", "yes", "y", "1"}
+WORD_RE = re.compile(r"[a-z0-9$%.]+")
+
+
+def _number(value):
+    try:
+        return float(str(value).strip() or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def composite_score(story, now=None, weights=SELECTION_WEIGHTS):
+    now = now or datetime.now(timezone.utc)
+    relevant = str(story.get("relevant", "")).strip().lower() in TRUE_VALUES
+
+    recency = 0.0
+    published = parse_date(story.get("publication_date"))
+    if published is not None:
+        age_days = max(0.0, (now - published).total_seconds() / 86400)
+        recency = max(0.0, 1 - age_days / SELECTION_RECENCY_DAYS)
+
+    return (
+        weights.get("significance_score", 0) * _number(story.get("significance_score"))
+        + weights.get("relevant", 0) * relevant
+        + weights.get("human_priority", 0) * _number(story.get("human_priority"))
+        + weights.get("recency", 0) * recency
+    )
+
+
+def source_key(story):
+    name = str(story.get("source_name", "")).strip().upper()
+    if name:
+        return name
+    netloc = urlparse(str(story.get("source_url", ""))).netloc.lower()
+    return netloc[4:] if netloc.startswith("www.") else netloc
+
+
+def blurb_words(story):
+    return frozenset(WORD_RE.findall(str(story.get("fact_summary", "")).lower()))
+
+
+def is_near_duplicate(words, selected_words, threshold):
+    for other in selected_words:
+        union = len(words | other)
+        if union and len(words & other) / union >= threshold:
+            return True
+    return False
+
+
+def select_top_stories(stories, categories=None,
+                       per_category=SELECTION_PER_CATEGORY,
+                       per_source_cap=SELECTION_PER_SOURCE_CAP,
+                       dedup_threshold=SELECTION_DEDUP_THRESHOLD,
+                       candidate_factor=SELECTION_CANDIDATE_FACTOR,
+                       now=None):
+    """Returns {category: [story, ...]} with at most `per_category` stories each, best first.
+
+    `stories` may be any iterable (e.g. a multi-day stream); `categories`
+    restricts the output to those categories when given.
+    """
+    now = now or datetime.now(timezone.utc)
+    wanted = set(categories) if categories else None
+    heap_size = per_category * max(1, candidate_factor)
+    heaps = {}
+    tiebreak = count()  # earlier rows win ties, as the sheet order did before
+
+    for story in stories:
+        category = story.get("category", "Uncategorized")
+        if wanted is not None and category not in wanted:
+            continue
+        # Negated sequence number so the earliest row ranks highest among equal scores
+        entry = (composite_score(story, now), -next(tiebreak), story)
+        heap = heaps.setdefault(category, [])
+        if len(heap) < heap_size:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    # Final pass across all categories, best candidates first, so caps favour top stories
+    candidates = sorted(
+        ((score, seq, category, story) for category, heap in heaps.items() for score, seq, story in heap),
+        key=lambda c: (c[0], c[1]),
+        reverse=True,
+    )
+    selected = {category: [] for category in heaps}
+    per_source = {}
+    selected_words = []
+    for score, _, category, story in candidates:
+        if len(selected[category]) >= per_category:
+            continue
+        source = source_key(story)
+        if per_source_cap and source and per_source.get(source, 0) >= per_source_cap:
+            continue
+        words = blurb_words(story)
+        if words and dedup_threshold and is_near_duplicate(words, selected_words, dedup_threshold):
+            continue
+        selected[category].append(story)
+        per_source[source] = per_source.get(source, 0) + 1
+        selected_words.append(words)
+
+    total = sum(len(v) for v in selected.values())
+    print(f"🏆 Selected {total} stories across {len([v for v in selected.values() if v])} categories")
+    return selected
@@ -1,18 +1,21 @@
 import os
-from datetime import datetime, timedelta
-from collections import defaultdict
-import pytz
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from dateutil import parser as date_parser
-import re
+from datetime import datetime, timedelta, timezone
 from kane_lambda.config import ENABLE_K_SELECTOR
+from kane_lambda.k_clients import build_sheets_service, build_docs_service
+from kane_lambda.k_api_scheduler import get_scheduler
+from kane_lambda.k_dates import parse_date
+from kane_lambda.k_sheet_index import read_rows_since
+from kane_lambda.k_sheet_rows import SheetRows, dict_rows
+from kane_lambda.k_doc_shards import resolve_output_doc
+from kane_lambda.k_selection import select_top_stories
+from kane_lambda.k_render import build_newsletter, render_newsletter, docs_requests, save_render
 
 # === CONFIG ===
 CREDS_FILE = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "service_account.json"))
 SPREADSHEET_ID = "11hRH6mnlTGO1qIQUsqkSZawigy1LQlzBPYnJNbpb_RQ"
 INPUT_SHEET = "prioritizer"  # Prioritized stories
-EXISTING_DOC_ID = "1aTV78mQpel4ihw5slFKn_iBR5fcvF1H1_boQl72GLBg"  # 🔁 Replace with your doc ID
+RECENT_DAYS = 1  # stories older than this are left out of the newsletter
+EXISTING_DOC_ID = "1aTV78mQpel4ihw5slFKn_iBR5fcvF1H1_boQl72GLBg"  # 🔁 Replace with your doc ID (used when DOC_ROLLOVER is "none")
 
 CATEGORY_ORDER = [
     "Product_Research",
@@ -22,57 +25,70 @@ CATEGORY_ORDER = [
     "Policy_Geopolitics"
 ]
 
+# Each inserted newsletter is wrapped in a named range, so neither the
+# existence check nor the insert position needs the document text: the next
+# newsletter goes right after the end of the last one.
+NEWSLETTER_RANGE_PREFIX = "kane_newsletter_"
+DOC_STATE_FIELDS = "namedRanges"
+# A doc with no newsletter range yet (new, or last written before the ranges
+# existed) is read once more, for its end index and any newsletter titles
+UNRANGED_DOC_FIELDS = "body.content(endIndex,paragraph.elements(textRun.content))"
+
 # === FUNCTIONS ===
-def newsletter_already_exists(service, doc_id, title_text):
-    doc = service.documents().get(documentId=doc_id).execute()
+def newsletter_range_name(day=None):
+    day = day or datetime.now()
+    return f"{NEWSLETTER_RANGE_PREFIX}{day.strftime('%Y-%m-%d')}"
+
+def fetch_doc_state(service, doc_id):
+    """Named ranges, the insert position and (only for docs without newsletter ranges) paragraph texts."""
+    doc = get_scheduler().execute(
+        service.documents().get(documentId=doc_id, fields=DOC_STATE_FIELDS), api="docs")
+    named = doc.get("namedRanges", {})
+    ends = [
+        r["endIndex"]
+        for name, group in named.items() if name.startswith(NEWSLETTER_RANGE_PREFIX)
+        for named_range in group.get("namedRanges", [])
+        for r in named_range.get("ranges", [])
+    ]
+    if ends:
+        return {"named_ranges": set(named), "end_index": max(ends), "texts": set()}
+
+    doc = get_scheduler().execute(
+        service.documents().get(documentId=doc_id, fields=UNRANGED_DOC_FIELDS), api="docs")
     content = doc.get("body", {}).get("content", [])
-
-    for element in content:
-        if "paragraph" in element:
-            elements = element["paragraph"].get("elements", [])
-            for e in elements:
-                text_run = e.get("textRun", {})
-                text = text_run.get("content", "").strip()
-                if text == title_text:
-                    print(f"⚠️ Newsletter with title already exists: {text}")
-                    return True
+    end_index = 1
+    for element in reversed(content):
+        if "endIndex" in element:
+            end_index = element["endIndex"] - 1
+            break
+    texts = {
+        e.get("textRun", {}).get("content", "").strip()
+        for element in content
+        for e in element.get("paragraph", {}).get("elements", [])
+    }
+    return {"named_ranges": set(named), "end_index": end_index, "texts": texts}
+
+def newsletter_already_exists(doc_state, range_name, title=None):
+    if range_name in doc_state["named_ranges"]:
+        print(f"⚠️ Newsletter already exists: {range_name}")
+        return True
+    # Newsletters inserted before named ranges are found by their title
+    if title and title in doc_state["texts"]:
+        print(f"⚠️ Newsletter with title already exists: {title}")
+        return True
     return False
 
 
-def parse_date_safe(date_str):
-    try:
-        if not date_str or not date_str.strip():
-            return None
-            
-        # Try to handle Excel/Google Sheets date serial numbers
-        if re.match(r'^\d{5}$', str(date_str).strip()):
-            try:
-                # Convert Excel/Google Sheets date serial to datetime
-                # Excel dates start from December 30, 1899
-                excel_epoch = datetime(1899, 12, 30, tzinfo=pytz.UTC)
-                days_since_epoch = int(date_str)
-                dt = excel_epoch + timedelta(days=days_since_epoch)
-                print(f"✅ Converted date serial {date_str} to {dt}")
-                return dt
-            except Exception as e:
-                print(f"⚠️ Failed to convert date serial: '{date_str}' → {e}")
-        
-        # Regular date parsing
-        dt = date_parser.parse(date_str)
-        return dt.astimezone(pytz.UTC) if dt.tzinfo else dt.replace(tzinfo=pytz.UTC)
-    except Exception as e:
-        print(f"⚠️ Failed to parse date: '{date_str}' → {e}")
-        return None
-
 def filter_recent_stories(stories):
-    now_utc = datetime.now(pytz.UTC)
-    cutoff = now_utc - timedelta(days=1)
+    """Recent stories from any iterable of stories; only the ones kept are held in memory."""
+    now_utc = datetime.now(timezone.utc)
+    cutoff = now_utc - timedelta(days=RECENT_DAYS)
     recent_stories = []
     skipped = 0
 
     for s in stories:
         raw_date = s.get("publication_date", "").strip()
-        pub_date = parse_date_safe(raw_date)
+        pub_date = parse_date(raw_date)
 
         if not pub_date:
             print(f"⏭️ Skipping (invalid date): '{raw_date}'")
@@ -92,166 +108,56 @@ def filter_recent_stories(stories):
     print(f"✅ Filtered {len(recent_stories)} recent stories (⏭️ Skipped {skipped})")
     return recent_stories
 
-def load_sheet_data():
-    creds = service_account.Credentials.from_service_account_file(
-        CREDS_FILE, scopes=["https://www.googleapis.com/auth/spreadsheets.readonly"]
-    )
-    service = build('sheets', 'v4', credentials=creds)
-    result = service.spreadsheets().values().get(
-        spreadsheetId=SPREADSHEET_ID,
-        range=f"{INPUT_SHEET}!A1:Z"
-    ).execute()
-
-    values = result.get('values', [])
-    if not values:
-        print("No data found in sheet.")
-        return []
-
-    headers = values[0]
-    rows = values[1:]
-    stories = [dict(zip(headers, row)) for row in rows]
-    return stories
-
-def group_by_category(stories):
-    grouped = defaultdict(list)
-    for story in stories:
-        category = story.get("category", "Uncategorized")
-        grouped[category].append(story)
-    return grouped
-
-def get_doc_end_index(service, doc_id):
-    doc = service.documents().get(documentId=doc_id).execute()
-    content = doc.get("body", {}).get("content", [])
-    
-    # Walk through backwards to find the last non-empty element with an endIndex
-    for element in reversed(content):
-        if "endIndex" in element:
-            return element["endIndex"] -1
-    
-    return 1
-
-def insert_formatted_content(service, doc_id, grouped):
-    now_str = datetime.now().strftime("%B %d, %Y")
-    index = get_doc_end_index(service, doc_id)
-    requests = []
-
-    # Title
-    title = f"Exponential View Special AI Daily Newsletter — {now_str}"
-    requests.append({
-        "insertText": {"location": {"index": index}, "text": title + "\n\n"}
-    })
-    requests.append({
-        "updateTextStyle": {
-            "range": {"startIndex": index, "endIndex": index + len(title)},
-            "textStyle": {"bold": True, "fontSize": {"magnitude": 16, "unit": "PT"}},
-            "fields": "bold,fontSize"
-        }
-    })
-    index += len(title) + 2
-
-    for category in CATEGORY_ORDER:
-        stories = grouped.get(category, [])[:6]
-        if not stories:
-            continue
-
-        # Insert Category Header
-        requests.append({
-            "insertText": {"location": {"index": index}, "text": category + "\n\n"}
-        })
-        requests.append({
-            "updateTextStyle": {
-                "range": {"startIndex": index, "endIndex": index + len(category)},
-                "textStyle": {"bold": True, "fontSize": {"magnitude": 14, "unit": "PT"}},
-                "fields": "bold,fontSize"
-            }
-        })
-        index += len(category) + 1
-
-        # Track where the bullet section starts
-        bullet_start = index
-
-        for story in stories:
-            text = f"{story.get('fact_summary', '').strip()}\n"
-            requests.append({
-                "insertText": {"location": {"index": index}, "text": text}
-            })
-            requests.append({
-                "updateTextStyle": {
-                    "range": {"startIndex": index, "endIndex": index + len(text)},
-                    "textStyle": {"fontSize": {"magnitude": 11, "unit": "PT"}},
-                    "fields": "fontSize"
-                }
-            })
-            index += len(text)
-
-        # Apply bullet style to the entire inserted block
-        requests.append({
-            "createParagraphBullets": {
-                "range": {"startIndex": bullet_start, "endIndex": index},
-                "bulletPreset": "BULLET_DISC_CIRCLE_SQUARE"
-            }
-        })
+def load_sheet_data(since=None):
+    """Yields stories from the input sheet; with `since`, only the date-index blocks that can match are read."""
+    service = build_sheets_service(CREDS_FILE, readonly=True)
+    if since is not None:
+        values = read_rows_since(service.spreadsheets(), SPREADSHEET_ID, INPUT_SHEET, since)
+    else:
+        values = SheetRows(service.spreadsheets(), SPREADSHEET_ID, INPUT_SHEET)
+    return dict_rows(values)
 
-        # Add a newline between sections
-        requests.append({
-            "insertText": {"location": {"index": index}, "text": "\n"}
-        })
-        index += 1
+def insert_formatted_content(service, doc_id, grouped, start_index=None, range_name=None, rendered=None):
+    if rendered is None:
+        rendered = render_newsletter(build_newsletter(grouped, CATEGORY_ORDER))
+    index = fetch_doc_state(service, doc_id)["end_index"] if start_index is None else start_index
+    requests = docs_requests(rendered, index, range_name or newsletter_range_name())
 
     # Final batch update
-    service.documents().batchUpdate(
+    get_scheduler().execute(service.documents().batchUpdate(
         documentId=doc_id,
         body={"requests": requests}
-    ).execute()
-
-def build_html_email_body(grouped_stories):
-    now_str = datetime.now().strftime("%B %d, %Y")
-    html = f"""
-    <div style="font-family:Arial, sans-serif;">
-        <h1 style="font-size:16px; font-weight:bold;">Exponential View Special AI Daily Newsletter — {now_str}</h1>
-    """
-
-    for category in CATEGORY_ORDER:
-        stories = grouped_stories.get(category, [])[:6]
-        if not stories:
-            continue
-
-        html += f'<h2 style="font-size:14px; font-weight:bold; margin-top:20px;">{category}</h2><ul>'
-        for story in stories:
-            summary = story.get('fact_summary', '').strip()
-            html += f'<li style="font-size:11px; margin-bottom:8px;">{summary}</li>'
-        html += "</ul>"
-
-    html += "</div>"
-    return html
+    ), api="docs", kind="write")
 
 
 # === MAIN ===
 def run_selector():
     print("📥 Reading prioritized stories from Google Sheet...")
-    stories = load_sheet_data()
+    stories = load_sheet_data(since=datetime.now(timezone.utc) - timedelta(days=RECENT_DAYS))
     stories = filter_recent_stories(stories)
     if not stories:
-        exit()
+        return 0
 
-    print("📊 Grouping stories by category...")
-    grouped_stories = group_by_category(stories)
+    print("📊 Ranking stories by category...")
+    grouped_stories = select_top_stories(stories, categories=CATEGORY_ORDER)
 
-    print("📝 Appending to existing Google Doc...")
-    creds = service_account.Credentials.from_service_account_file(
-        CREDS_FILE, scopes=["https://www.googleapis.com/auth/documents"]
-    )
-    doc_service = build('docs', 'v1', credentials=creds)
+    print("📝 Appending to Google Doc...")
+    doc_id = resolve_output_doc(SPREADSHEET_ID, EXISTING_DOC_ID)
+    doc_service = build_docs_service(CREDS_FILE)
 
-    html_body = build_html_email_body(grouped_stories)
-    now_str = datetime.now().strftime("%B %d, %Y")
-    title_text = f"Exponential View Special AI Daily Newsletter — {now_str}"
+    # Render every format in one pass; HTML/Markdown/text are kept for emailing
+    rendered = render_newsletter(build_newsletter(grouped_stories, CATEGORY_ORDER))
+    save_render(rendered)
+    range_name = newsletter_range_name()
+    doc_state = fetch_doc_state(doc_service, doc_id)
 
-    if newsletter_already_exists(doc_service, EXISTING_DOC_ID, title_text):
+    if newsletter_already_exists(doc_state, range_name, rendered["title"]):
         print("⏭️ Newsletter already exists in the document. Skipping insertion.")
     else:
-        insert_formatted_content(doc_service, EXISTING_DOC_ID, grouped_stories)
-        print(f"✅ Draft appended successfully: https://docs.google.com/document/d/{EXISTING_DOC_ID}/edit")
+        insert_formatted_content(doc_service, doc_id, grouped_stories,
+                                 start_index=doc_state["end_index"], range_name=range_name, rendered=rendered)
+        print(f"✅ Draft appended successfully: https://docs.google.com/document/d/{doc_id}/edit")
+    return sum(len(v) for v in grouped_stories.values())
 
 if __name__ == "__main__":
     if not ENABLE_K_SELECTOR:
@@ -1,62 +1,37 @@
-import pytz
-from datetime import datetime, timedelta
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from dateutil import parser as date_parser
+from datetime import datetime, timedelta, timezone
 import os
-import re
 # Import feature toggle
-from kane_lambda.config import ENABLE_K_SHEET_CLEAN
+from kane_lambda.config import ENABLE_K_SHEET_CLEAN, ENABLE_ARCHIVE, ENABLE_SHEET_INDEX
+from kane_lambda.k_archive import archive_rows
+from kane_lambda.k_clients import build_sheets_service
+from kane_lambda.k_api_scheduler import get_scheduler
+from kane_lambda.k_dates import parse_date
+from kane_lambda.k_sheet_index import rebuild_index
+from kane_lambda.k_sheet_rows import SheetRows
 
 # === CONFIG ===
 CREDS_FILE = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "service_account.json"))
 SPREADSHEET_ID = "11hRH6mnlTGO1qIQUsqkSZawigy1LQlzBPYnJNbpb_RQ"
 INPUT_SHEET_1 = "headscanner"
 INPUT_SHEET_2 = "prioritizer"
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
-
-def parse_date_safe(date_str):
-    try:
-        if not date_str or not date_str.strip():
-            return None
-            
-        # Try to handle Excel/Google Sheets date serial numbers
-        if re.match(r'^\d{5}$', str(date_str).strip()):
-            try:
-                # Convert Excel/Google Sheets date serial to datetime
-                # Excel dates start from December 30, 1899
-                excel_epoch = datetime(1899, 12, 30, tzinfo=pytz.UTC)
-                days_since_epoch = int(date_str)
-                dt = excel_epoch + timedelta(days=days_since_epoch)
-                print(f"✅ Converted date serial {date_str} to {dt}")
-                return dt
-            except Exception as e:
-                print(f"⚠️ Failed to convert date serial: '{date_str}' → {e}")
-        
-        # Regular date parsing
-        dt = date_parser.parse(date_str)
-        return dt.astimezone(pytz.UTC) if dt.tzinfo else dt.replace(tzinfo=pytz.UTC)
-    except Exception as e:
-        print(f"⚠️ Failed to parse date: '{date_str}' → {e}")
-        return None
+_UNPARSED = object()
 
 def load_sheet(service, sheet_name):
-    result = service.spreadsheets().values().get(
-        spreadsheetId=SPREADSHEET_ID, range=f"{sheet_name}!A1:Z").execute()
-    values = result.get("values", [])
-    if not values:
-        return [], []
-    headers = values[0]
-    rows = [dict(zip(headers, row)) for row in values[1:]]
-    return headers, rows
+    return rows_from_values(SheetRows(service.spreadsheets(), SPREADSHEET_ID, sheet_name))
+
+def rows_from_values(values):
+    """(headers, row dicts); the rows are yielded lazily, so `values` can be a SheetRows."""
+    values = iter(values)
+    headers = next(values, [])
+    return headers, (dict(zip(headers, row)) for row in values)
 
 def write_sheet(service, sheet_name, headers, rows):
     # Clear existing data
-    service.spreadsheets().values().clear(
+    get_scheduler().execute(service.spreadsheets().values().clear(
         spreadsheetId=SPREADSHEET_ID,
         range=f"{sheet_name}!A1:Z",
         body={}
-    ).execute()
+    ), kind="write", retry_transient=True)  # clearing twice is harmless
 
     # Prepare new data
     new_values = [headers]
@@ -70,22 +45,30 @@ def write_sheet(service, sheet_name, headers, rows):
         new_values.append(row_data)
 
     # Write cleaned values
-    service.spreadsheets().values().update(
+    get_scheduler().execute(service.spreadsheets().values().update(
         spreadsheetId=SPREADSHEET_ID,
         range=f"{sheet_name}!A1",
         valueInputOption="USER_ENTERED",
         body={"values": new_values}
-    ).execute()
+    ), kind="write", retry_transient=True)  # so is rewriting the same range
     print(f"✅ Cleaned & updated '{sheet_name}' with {len(rows)} valid rows.")
 
-def should_keep(row):
-    pub_date = parse_date_safe(row.get("publication_date", ""))
+def expiry_reason(row, pub_date=_UNPARSED, cutoff=None):
+    """Returns why a row should be dropped from the live sheet, or None to keep it.
+
+    clean_sheets passes the date it has already parsed and one cutoff for the whole run.
+    """
+    if pub_date is _UNPARSED:
+        pub_date = parse_date(row.get("publication_date", ""))
+    cutoff = cutoff or datetime.now(timezone.utc) - timedelta(days=7)
     # Debug print for dates
     if pub_date:
-        print(f"📅 Story ID: {row.get('story_id', 'unknown')}, Date: {pub_date}, Keeping: {pub_date >= datetime.now(pytz.UTC) - timedelta(days=7)}")
+        print(f"📅 Story ID: {row.get('story_id', 'unknown')}, Date: {pub_date}, Keeping: {pub_date >= cutoff}")
     
-    if not pub_date or pub_date < datetime.now(pytz.UTC) - timedelta(days=7):
-        return False
+    if not pub_date:
+        return "invalid_date"
+    if pub_date < cutoff:
+        return "expired"
     
     # Check for significance score with more flexible parsing
     score_str = row.get("significance_score", "0")
@@ -99,33 +82,55 @@ def should_keep(row):
         except (ValueError, TypeError):
             score = 0
     
-    return score >= 3
+    return None if score >= 3 else "low_score"
+
+def should_keep(row):
+    return expiry_reason(row) is None
 
 def clean_sheets():
-    creds = service_account.Credentials.from_service_account_file(CREDS_FILE, scopes=SCOPES)
-    service = build("sheets", "v4", credentials=creds)
+    service = build_sheets_service(CREDS_FILE)
 
-    # Load both sheets
-    headers_1, rows_1 = load_sheet(service, INPUT_SHEET_1)
-    headers_2, rows_2 = load_sheet(service, INPUT_SHEET_2)
+    # Both first pages come in one coalesced batchGet; the rest is streamed page by page
+    read_1 = SheetRows(service.spreadsheets(), SPREADSHEET_ID, INPUT_SHEET_1)
+    read_2 = SheetRows(service.spreadsheets(), SPREADSHEET_ID, INPUT_SHEET_2)
+    headers_2, rows_2 = rows_from_values(read_2)
 
     # Filter valid rows from Sheet2
     valid_rows_2 = []
     valid_story_ids = set()
+    dropped_rows_2 = []
+    drop_reasons = {}
+    cutoff = datetime.now(timezone.utc) - timedelta(days=7)
     for row in rows_2:
+        pub_date = parse_date(row.get("publication_date", ""))
         story_id = row.get("story_id", "").strip()
-        if should_keep(row):
+        reason = expiry_reason(row, pub_date, cutoff)
+        if reason is None:
             valid_rows_2.append(row)
             valid_story_ids.add(story_id)
+        else:
+            dropped_rows_2.append({**row, "_archive_reason": reason})
+            drop_reasons[story_id] = reason
 
     # Filter and de-duplicate Sheet1
+    headers_1, rows_1 = rows_from_values(read_1)
     seen_ids = set()
     valid_rows_1 = []
+    dropped_rows_1 = []
     for row in rows_1:
         story_id = row.get("story_id", "").strip()
-        if story_id in valid_story_ids and story_id not in seen_ids:
-            seen_ids.add(story_id)
-            valid_rows_1.append(row)
+        if story_id in valid_story_ids:
+            if story_id not in seen_ids:
+                seen_ids.add(story_id)
+                valid_rows_1.append(row)
+        else:
+            reason = drop_reasons.get(story_id, "not_prioritized")
+            dropped_rows_1.append({**row, "_archive_reason": reason})
+
+    # Archive dropped rows (with their original IDs) before the live sheets are rewritten
+    if ENABLE_ARCHIVE:
+        archive_rows(INPUT_SHEET_2, dropped_rows_2)
+        archive_rows(INPUT_SHEET_1, dropped_rows_1)
 
     # Normalize story_id numbers for both sheets consistently
     id_map = {}
@@ -143,7 +148,11 @@ def clean_sheets():
     # Write cleaned and re-IDed sheets
     write_sheet(service, INPUT_SHEET_2, headers_2, valid_rows_2)
     write_sheet(service, INPUT_SHEET_1, headers_1, valid_rows_1)
+    if ENABLE_SHEET_INDEX:
+        rebuild_index(service.spreadsheets(), SPREADSHEET_ID, INPUT_SHEET_2,
+                      [[row.get("publication_date", "")] for row in valid_rows_2], date_column=0)
     print("✅ Cleaned & normalized both sheets without duplicates.")
+    return len(valid_rows_2)
 
 if __name__ == "__main__":
     if not ENABLE_K_SHEET_CLEAN:
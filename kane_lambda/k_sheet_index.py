@@ -0,0 +1,164 @@
+"""
+Date index tabs for reading only recent rows of a sheet.
+
+Each indexed sheet has a companion tab (sheet name + SHEET_INDEX_SUFFIX)
+with one row per block of data rows:
+
+    start_row | end_row | min_date | max_date
+
+SheetAppendBuffer adds an entry per appended chunk (the row numbers come
+from the append response), and clean_sheets rebuilds the whole index after
+rewriting a sheet. read_rows_since() reads the index, then fetches, in one
+coalesced batchGet, the header, the blocks whose max_date is on or after
+the cutoff and any rows the index doesn't cover (gaps and the first page
+of the unindexed tail, which is then read page by page). A missed index
+write costs extra reads but never hides rows.
+"""
+import re
+
+from kane_lambda.config import ENABLE_SHEET_INDEX, SHEET_INDEX_SUFFIX, SHEET_INDEX_BLOCK_ROWS
+from kane_lambda.k_api_scheduler import get_scheduler
+from kane_lambda.k_dates import to_iso_date
+from kane_lambda.k_sheet_rows import SheetRows
+
+INDEX_HEADERS = ["start_row", "end_row", "min_date", "max_date"]
+UPDATED_ROWS_RE = re.compile(r"![A-Z]+(\d+)(?::[A-Z]+(\d+))?$")
+
+
+def index_sheet_name(sheet_name):
+    return f"{sheet_name}{SHEET_INDEX_SUFFIX}"
+
+
+def appended_rows(append_result):
+    """(first_row, last_row) written by a values().append call, or None."""
+    updated_range = append_result.get("updates", {}).get("updatedRange", "")
+    match = UPDATED_ROWS_RE.search(updated_range)
+    if not match:
+        return None
+    first = int(match.group(1))
+    return first, int(match.group(2) or first)
+
+
+def block_entry(start_row, rows, date_column):
+    """Index entry for data rows written starting at `start_row`."""
+    dates = [to_iso_date(r[date_column]) for r in rows if len(r) > date_column]
+    dates = [d for d in dates if d]
+    # Blocks without a parseable date get empty bounds and are never fetched by date
+    return [start_row, start_row + len(rows) - 1, min(dates, default=""), max(dates, default="")]
+
+
+def append_index_entries(sheet, spreadsheet_id, sheet_name, entries):
+    if not entries:
+        return
+    try:
+        get_scheduler().execute(sheet.values().append(
+            spreadsheetId=spreadsheet_id,
+            range=f"{index_sheet_name(sheet_name)}!A1",
+            valueInputOption="RAW",
+            insertDataOption="INSERT_ROWS",
+            body={"values": entries}
+        ), kind="write")
+    except Exception as e:
+        # Readers fetch unindexed rows anyway, so a lost entry only costs read volume
+        print(f"⚠️ Failed to update date index for '{sheet_name}': {e}")
+
+
+def rebuild_index(sheet, spreadsheet_id, sheet_name, rows, date_column, block_rows=SHEET_INDEX_BLOCK_ROWS):
+    """Rewrites the index for a sheet whose data `rows` start at row 2."""
+    entries = [
+        block_entry(2 + i, rows[i:i + block_rows], date_column)
+        for i in range(0, len(rows), block_rows)
+    ]
+    name = index_sheet_name(sheet_name)
+    scheduler = get_scheduler()
+    # Both overwrite a fixed range, so repeating them after a timeout is safe
+    scheduler.execute(sheet.values().clear(spreadsheetId=spreadsheet_id, range=f"{name}!A1:D", body={}),
+                      kind="write", retry_transient=True)
+    scheduler.execute(sheet.values().update(
+        spreadsheetId=spreadsheet_id,
+        range=f"{name}!A1",
+        valueInputOption="RAW",
+        body={"values": [INDEX_HEADERS] + entries}
+    ), kind="write", retry_transient=True)
+    print(f"🗂️ Rebuilt date index for '{sheet_name}': {len(entries)} blocks")
+
+
+def read_index(sheet, spreadsheet_id, sheet_name):
+    """Sorted (start_row, end_row, min_date, max_date) tuples; [] if the index is missing."""
+    try:
+        result = get_scheduler().execute(sheet.values().get(
+            spreadsheetId=spreadsheet_id, range=f"{index_sheet_name(sheet_name)}!A1:D"))
+    except Exception as e:
+        print(f"⚠️ No date index for '{sheet_name}' ({e})")
+        return []
+    entries = []
+    for row in result.get("values", []):
+        if len(row) < 2 or not str(row[0]).isdigit() or not str(row[1]).isdigit():
+            continue  # header or damaged row
+        padded = list(row) + ["", ""]
+        entries.append((int(row[0]), int(row[1]), padded[2], padded[3]))
+    return sorted(entries)
+
+
+def plan_ranges(entries, since_iso):
+    """Row spans to fetch for rows dated on/after since_iso, plus the first unindexed row."""
+    spans = []
+    next_row = 2
+    for start, end, _, max_date in entries:
+        if start > next_row:
+            spans.append((next_row, start - 1))  # not covered by the index
+        if max_date and max_date >= since_iso and end >= next_row:
+            spans.append((max(start, next_row), end))
+        next_row = max(next_row, end + 1)
+
+    merged = []
+    for start, end in spans:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged, next_row
+
+
+def gap_rows(entries):
+    """Rows between index entries that no entry covers."""
+    gaps = 0
+    next_row = 2
+    for start, end, _, _ in entries:
+        gaps += max(0, start - next_row)
+        next_row = max(next_row, end + 1)
+    return gaps
+
+
+def read_rows_since(sheet, spreadsheet_id, sheet_name, since, last_column="Z"):
+    """Yields values (header first) for every row that may be dated on/after `since`.
+
+    Falls back to paging through the whole sheet when there is no index.
+    Callers still filter by date: blocks are fetched whole and the tail is
+    unindexed.
+    """
+    scheduler = get_scheduler()
+    entries = read_index(sheet, spreadsheet_id, sheet_name) if ENABLE_SHEET_INDEX else []
+    if not entries:
+        yield from SheetRows(sheet, spreadsheet_id, sheet_name, last_column=last_column)
+        return
+
+    spans, tail_row = plan_ranges(entries, to_iso_date(since))
+    header = scheduler.queue_read(sheet, spreadsheet_id, f"{sheet_name}!A1:{last_column}1")
+    reads = [
+        scheduler.queue_read(sheet, spreadsheet_id, f"{sheet_name}!A{start}:{last_column}{end}")
+        for start, end in spans
+    ]
+    tail = SheetRows(sheet, spreadsheet_id, sheet_name, first_row=tail_row, last_column=last_column)
+
+    yield from header.result()[:1]
+    for read in reads:
+        yield from read.result()
+    yield from tail
+
+    # The spans hold every gap plus the recent blocks, so what's left after the gaps was indexed
+    indexed = sum(end - start + 1 for start, end, _, _ in entries)
+    gaps = gap_rows(entries)
+    fetched = sum(end - start + 1 for start, end in spans)
+    print(f"🔎 Read {fetched - gaps} of {indexed} indexed '{sheet_name}' rows since {to_iso_date(since)}, "
+          f"plus {gaps + tail.rows} unindexed ({gaps} in gaps, {tail.rows} after the index)")
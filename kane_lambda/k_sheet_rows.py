@@ -0,0 +1,84 @@
+"""
+Paged reads of a sheet's rows.
+
+SheetRows reads a tab in fixed windows of SHEET_PAGE_ROWS rows
+(A1:Z2000, A2001:Z4000, ...) and yields one row of values at a time, so
+a reader holds one page instead of the whole tab. The next page is only
+requested once the current one is used up; a caller that stops early
+never reads the rest. The first page is queued when the SheetRows is
+created, so it shares a batchGet with any read queued next to it.
+
+Sheets leaves trailing empty rows out of a range, so a short page marks
+the end of the data. The pipeline's tabs have no blank rows in the middle:
+appends and clean_sheets' rewrites keep them contiguous.
+
+    values = SheetRows(sheet, SPREADSHEET_ID, "prioritizer")
+    for story in dict_rows(values):   # header first, then one dict per row
+        ...
+
+add_tab() creates a tab that a read or write found missing (is_missing_tab).
+"""
+from kane_lambda.config import SHEET_PAGE_ROWS
+from kane_lambda.k_api_scheduler import get_scheduler, error_status
+
+
+class SheetRows:
+    def __init__(self, sheet, spreadsheet_id, sheet_name, first_row=1, last_row=None,
+                 page_rows=SHEET_PAGE_ROWS, last_column="Z"):
+        self.sheet = sheet
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet_name = sheet_name
+        self.last_row = last_row
+        self.page_rows = page_rows
+        self.last_column = last_column
+        self.pages = 0
+        self.rows = 0
+        self._next = self._queue(first_row)
+
+    def _queue(self, start):
+        if self.last_row is not None and start > self.last_row:
+            return None
+        end = start + self.page_rows - 1
+        if self.last_row is not None:
+            end = min(end, self.last_row)
+        rng = f"{self.sheet_name}!A{start}:{self.last_column}{end}"
+        return start, end, get_scheduler().queue_read(self.sheet, self.spreadsheet_id, rng)
+
+    def __iter__(self):
+        while self._next is not None:
+            start, end, read = self._next
+            self._next = None
+            values = read.result()
+            self.pages += 1
+            self.rows += len(values)
+            yield from values
+            if len(values) == end - start + 1:
+                self._next = self._queue(end + 1)
+
+
+def is_missing_tab(exc):
+    """True for the 400 Sheets returns when a range names a tab that doesn't exist."""
+    return error_status(exc) == 400 and "parse range" in str(exc)
+
+
+def add_tab(sheet, spreadsheet_id, title):
+    try:
+        get_scheduler().execute(sheet.batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={"requests": [{"addSheet": {"properties": {"title": title}}}]}
+        ), kind="write")
+        print(f"🆕 Created the '{title}' tab")
+    except Exception as e:
+        # Another run may have created it first
+        if "already exists" not in str(e):
+            raise
+
+
+def dict_rows(values):
+    """Dicts keyed by the first row of `values`, yielded lazily."""
+    values = iter(values)
+    headers = next(values, None)
+    if headers is None:
+        return
+    for row in values:
+        yield dict(zip(headers, row))
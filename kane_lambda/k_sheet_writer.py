@@ -0,0 +1,242 @@
+"""
+Write-behind buffer for Google Sheets appends.
+
+Rows are queued as they are produced and flushed in chunks bounded by row
+count and JSON payload size, so a failed append only affects one chunk
+instead of a whole run's worth of LLM output. With ``index_date_column``
+set, each chunk also gets an entry in the sheet's date index (k_sheet_index).
+
+An append isn't idempotent: after a timeout or 5xx the rows may have been
+written anyway. A chunk is only retried with ``key_column`` set, and only
+for the rows whose key isn't in that column of the sheet yet; the check
+reads the column from the row after the last one this buffer saw written.
+A 429 was rejected outright, so it is retried as is. Index entries cover
+every row confirmed in the sheet, whichever attempt wrote it.
+"""
+import json
+import os
+import random
+import time
+
+from kane_lambda.config import (
+    SHEET_APPEND_MAX_ROWS,
+    SHEET_APPEND_MAX_BYTES,
+    SHEET_APPEND_FLUSH_SECONDS,
+    SHEET_APPEND_MAX_RETRIES,
+    SHEET_APPEND_SPILL_DIR,
+    API_BACKOFF_CAP_SECONDS,
+)
+from kane_lambda.k_api_scheduler import get_scheduler, is_transient_error, error_status, retry_after_seconds
+from kane_lambda.k_sheet_index import appended_rows, block_entry, append_index_entries
+from kane_lambda.k_trace import span
+
+
+def row_payload_bytes(row):
+    return len(json.dumps(row, ensure_ascii=False).encode("utf-8")) + 1
+
+
+def contiguous_runs(placed):
+    """Splits (row number, row) pairs into runs of consecutive row numbers."""
+    runs = []
+    for row_number, row in sorted(placed, key=lambda p: p[0]):
+        if runs and row_number == runs[-1][-1][0] + 1:
+            runs[-1].append((row_number, row))
+        else:
+            runs.append([(row_number, row)])
+    return runs
+
+
+class SheetAppendBuffer:
+    """Queues rows for a sheet and appends them in bounded chunks.
+
+    Flushes happen when a full chunk is pending, when ``flush_seconds``
+    have passed since the last flush (checked on every add), or on close().
+    """
+
+    def __init__(self, sheet, spreadsheet_id, range_name,
+                 max_rows=SHEET_APPEND_MAX_ROWS,
+                 max_bytes=SHEET_APPEND_MAX_BYTES,
+                 flush_seconds=SHEET_APPEND_FLUSH_SECONDS,
+                 max_retries=SHEET_APPEND_MAX_RETRIES,
+                 index_date_column=None,
+                 key_column=None):
+        self.sheet = sheet
+        self.spreadsheet_id = spreadsheet_id
+        self.range_name = range_name
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.flush_seconds = flush_seconds
+        self.max_retries = max_retries
+        self.index_date_column = index_date_column
+        self.key_column = key_column
+
+        self.pending = []  # list of (row, payload_bytes)
+        self.pending_bytes = 0
+        self.last_flush = time.monotonic()
+        self.index_pending = []
+        self.next_row = None  # rows appended from now on land at or after this one
+
+        self.stats = {
+            "rows": 0,
+            "bytes": 0,
+            "chunks": 0,
+            "write_seconds": 0.0,
+            "max_chunk_seconds": 0.0,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Flush even when the stage failed so finished work is not lost
+        self.close()
+        return False
+
+    def add(self, row):
+        size = row_payload_bytes(row)
+        self.pending.append((row, size))
+        self.pending_bytes += size
+        if len(self.pending) >= self.max_rows or self.pending_bytes >= self.max_bytes:
+            self._flush_full_chunks()
+        self.flush_if_due()
+
+    def extend(self, rows):
+        for row in rows:
+            self.add(row)
+
+    def flush_if_due(self):
+        if self.pending and time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        while self.pending:
+            self._append_chunk(self._take_chunk())
+        self.last_flush = time.monotonic()
+        self._write_index()
+
+    def close(self):
+        try:
+            self.flush()
+        except Exception:
+            self._spill()
+            raise
+        finally:
+            self.report()
+
+    def report(self):
+        s = self.stats
+        print(
+            f"📊 Sheet writes '{self.range_name}': {s['rows']} rows, {s['bytes']} bytes "
+            f"in {s['chunks']} chunks, {s['write_seconds']:.2f}s total "
+            f"(max {s['max_chunk_seconds']:.2f}s/chunk)"
+        )
+
+    def _flush_full_chunks(self):
+        while len(self.pending) >= self.max_rows or self.pending_bytes >= self.max_bytes:
+            self._append_chunk(self._take_chunk())
+        self.last_flush = time.monotonic()
+        self._write_index()
+
+    def _take_chunk(self):
+        # Always take at least one row so an oversized row still gets written
+        count, size = 0, 0
+        for _, row_size in self.pending:
+            if count and (count >= self.max_rows or size + row_size > self.max_bytes):
+                break
+            count += 1
+            size += row_size
+        return self.pending[:count]
+
+    def _append_chunk(self, chunk):
+        values = [row for row, _ in chunk]
+        size = sum(row_size for _, row_size in chunk)
+
+        start = time.monotonic()
+        with span("sheets.append_chunk", range=self.range_name, rows=len(values), bytes=size):
+            placed = self._append_with_retries(values)
+        elapsed = time.monotonic() - start
+
+        # Only drop rows from the queue once the append succeeded
+        del self.pending[:len(chunk)]
+        self.pending_bytes -= size
+
+        if placed:
+            self.next_row = max(row_number for row_number, _ in placed) + 1
+        if self.index_date_column is not None:
+            for run in contiguous_runs(placed):
+                self.index_pending.append(block_entry(run[0][0], [row for _, row in run], self.index_date_column))
+
+        self.stats["rows"] += len(chunk)
+        self.stats["bytes"] += size
+        self.stats["chunks"] += 1
+        self.stats["write_seconds"] += elapsed
+        self.stats["max_chunk_seconds"] = max(self.stats["max_chunk_seconds"], elapsed)
+
+    def _append_with_retries(self, values):
+        """Appends `values`; returns (row number, row) for each row confirmed in the sheet.
+
+        Rows whose position the append response doesn't give are left out.
+        """
+        placed = []
+        attempt = 0
+        while True:
+            try:
+                # The scheduler handles quota waits; retries are decided here
+                result = get_scheduler().execute(
+                    self.sheet.values().append(
+                        spreadsheetId=self.spreadsheet_id,
+                        range=self.range_name,
+                        valueInputOption="USER_ENTERED",
+                        insertDataOption="INSERT_ROWS",
+                        body={"values": values}
+                    ),
+                    api="sheets", kind="write", max_retries=0,
+                )
+                rows = appended_rows(result)
+                if rows:
+                    placed.extend(zip(range(rows[0], rows[1] + 1), values))
+                return placed
+            except Exception as e:
+                rejected = error_status(e) == 429
+                if attempt >= self.max_retries or not is_transient_error(e) or (self.key_column is None and not rejected):
+                    raise
+                attempt += 1
+                delay = max(random.uniform(0, min(API_BACKOFF_CAP_SECONDS, 2 ** attempt)), retry_after_seconds(e) or 0)
+                print(f"⚠️ Append to '{self.range_name}' failed ({e}); retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+            if not rejected:
+                landed = self._existing_keys()
+                found = [(landed[self._key(row)], row) for row in values if self._key(row) in landed]
+                placed.extend(found)
+                values = [row for row in values if self._key(row) not in landed]
+                if found:
+                    rest = f"retrying the other {len(values)}" if values else "nothing left to retry"
+                    print(f"↩️ {len(found)} rows of the failed append to '{self.range_name}' were written; {rest}")
+                if not values:
+                    return placed
+
+    def _key(self, row):
+        return str(row[self.key_column]) if len(row) > self.key_column else ""
+
+    def _existing_keys(self):
+        """{key: row number} for the key column, from the first row our appends can have landed on."""
+        column = chr(ord("A") + self.key_column)
+        first = self.next_row or 1  # the whole column until an append has told us where the sheet ends
+        result = get_scheduler().execute(self.sheet.values().get(
+            spreadsheetId=self.spreadsheet_id, range=f"{self.range_name.split('!')[0]}!{column}{first}:{column}"))
+        return {str(row[0]): first + i for i, row in enumerate(result.get("values", [])) if row}
+
+    def _write_index(self):
+        entries, self.index_pending = self.index_pending, []
+        append_index_entries(self.sheet, self.spreadsheet_id, self.range_name.split("!")[0], entries)
+
+    def _spill(self):
+        if not self.pending:
+            return
+        os.makedirs(SHEET_APPEND_SPILL_DIR, exist_ok=True)
+        safe_name = self.range_name.split("!")[0].replace("/", "_")
+        path = os.path.join(SHEET_APPEND_SPILL_DIR, f"{safe_name}-{int(time.time())}.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            for row, _ in self.pending:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        print(f"💾 Spilled {len(self.pending)} unwritten rows for '{self.range_name}' to {path}")
@@ -0,0 +1,123 @@
+"""
+Container-scoped state reused by warm Lambda invocations.
+
+Lambda keeps module globals alive between invocations in the same
+container, so anything stored here survives until the container is
+recycled. Each cache has a TTL and an optional validate() check at lookup;
+an expired or invalid entry counts as a miss and is rebuilt. Everything
+else (the API scheduler, the deadline, stage results) stays
+invocation-scoped and is reset by lambda_handler / run_kane_pipeline.
+
+Caches in use: Google credentials and discovery documents (k_clients),
+the headscanner source_url dedup index (k_headscanner), feed validators
+and entries (k_headscanner), and LLM responses (k_llm).
+begin_invocation() marks each invocation warm or cold;
+invocation_report() summarizes what the caches saved.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from kane_lambda.config import ENABLE_CONTAINER_CACHE
+
+CONTAINER_STARTED_AT = time.time()
+
+_invocations = 0
+_caches = {}
+
+
+class TTLCache:
+    def __init__(self, name, ttl_seconds, max_entries=None):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (stored_at, value), oldest first
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, validate=None):
+        """Cached value, or None when missing, expired or rejected by validate(value)."""
+        with self.lock:
+            entry = self.entries.get(key) if ENABLE_CONTAINER_CACHE else None
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self.entries[key]
+                entry = None
+        if entry is not None and validate is not None and not validate(entry[1]):
+            self.discard(key)
+            entry = None
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        if not ENABLE_CONTAINER_CACHE:
+            return value
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (time.monotonic(), value)
+            while self.max_entries and len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+    def get_or_create(self, key, factory, validate=None):
+        value = self.get(key, validate)
+        return value if value is not None else self.put(key, factory())
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+def container_cache(name, ttl_seconds, max_entries=None):
+    """The container-wide cache called `name`, created on first use."""
+    if name not in _caches:
+        _caches[name] = TTLCache(name, ttl_seconds, max_entries)
+    return _caches[name]
+
+
+def clear_caches():
+    for cache in _caches.values():
+        cache.clear()
+
+
+def begin_invocation():
+    """Call once per invocation; returns (and prints) whether this container was warm."""
+    global _invocations
+    _invocations += 1
+    for cache in _caches.values():
+        cache.reset_stats()
+    info = {
+        "warm": _invocations > 1,
+        "invocation": _invocations,
+        "container_age_seconds": round(time.time() - CONTAINER_STARTED_AT, 1),
+        "cached_entries": {name: len(c.entries) for name, c in _caches.items()},
+    }
+    if info["warm"]:
+        print(f"♨️ Warm container: invocation {_invocations}, up {info['container_age_seconds']:.0f}s, "
+              f"cached {info['cached_entries']}")
+    else:
+        print("🧊 Cold start")
+    return info
+
+
+def invocation_report():
+    """Per-cache hits and misses since begin_invocation()."""
+    report = {name: c.stats() for name, c in _caches.items()}
+    for name, r in report.items():
+        if r["hits"] or r["misses"]:
+            print(f"🗃️ {name} cache: {r['hits']} hits, {r['misses']} misses, {r['entries']} entries")
+    return report
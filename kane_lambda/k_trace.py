@@ -0,0 +1,206 @@
+"""
+Lightweight span tracing for runs, stages, batches and external calls.
+
+    with span("prioritizer.batch", batch=3, stories=5) as s:
+        ...
+        s.set(rows=len(results))
+
+Spans nest through a contextvar, so each one records its parent; code
+that hands work to a thread pool (k_fanout's shard invokes) copies the
+context into it. begin_trace() starts an
+invocation's trace and finish_trace() prints a table of the top time
+sinks (by self time, i.e. excluding child spans) and exports the spans
+per TRACE_EXPORT: "jsonl" writes one span per line to TRACE_DIR, and "emf"
+prints CloudWatch embedded-metric lines (one per span name) that
+CloudWatch turns into Duration/Count metrics. With ENABLE_TRACING off,
+span() is a no-op.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from kane_lambda.config import ENABLE_TRACING, TRACE_EXPORT, TRACE_DIR, TRACE_METRIC_NAMESPACE, TRACE_SUMMARY_TOP
+
+_current = ContextVar("kane_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start", "end", "attrs", "error", "_t0")
+
+    def __init__(self, name, parent_id, attrs):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self.end = None
+        self.attrs = attrs
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    @property
+    def seconds(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self._t0
+
+    def to_dict(self, trace_id):
+        return {
+            "trace_id": trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration_ms": round(self.seconds * 1000, 3),
+            "attrs": self.attrs,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    def set(self, **attrs):
+        pass
+
+
+class Trace:
+    def __init__(self, name, trace_id=None):
+        self.name = name
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def record(self, s):
+        with self.lock:
+            self.spans.append(s)
+
+
+_trace = Trace("default")
+
+
+def begin_trace(name, trace_id=None):
+    """Starts collecting spans for a new run (one per invocation)."""
+    global _trace
+    _trace = Trace(name, trace_id)
+    return _trace
+
+
+def get_trace():
+    return _trace
+
+
+@contextmanager
+def span(name, **attrs):
+    if not ENABLE_TRACING:
+        yield _NoopSpan()
+        return
+    parent = _current.get()
+    s = Span(name, parent.span_id if parent else None, attrs)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.end = time.perf_counter()
+        _current.reset(token)
+        _trace.record(s)
+
+
+def current_span():
+    return _current.get() or _NoopSpan()
+
+
+def summarize(trace=None):
+    """Per span name: count, total and self seconds, slowest single span."""
+    trace = trace or _trace
+    with trace.lock:
+        spans = list(trace.spans)
+    child_seconds = {}
+    for s in spans:
+        if s.parent_id:
+            child_seconds[s.parent_id] = child_seconds.get(s.parent_id, 0.0) + s.seconds
+    rows = {}
+    for s in spans:
+        r = rows.setdefault(s.name, {"name": s.name, "count": 0, "total": 0.0, "self": 0.0, "max": 0.0, "errors": 0})
+        r["count"] += 1
+        r["total"] += s.seconds
+        # Concurrent children (e.g. shard invokes running side by side) can add up to more than their parent
+        r["self"] += max(0.0, s.seconds - child_seconds.get(s.span_id, 0.0))
+        r["max"] = max(r["max"], s.seconds)
+        r["errors"] += 1 if s.error else 0
+    return sorted(rows.values(), key=lambda r: -r["self"])
+
+
+def print_summary(rows, top=TRACE_SUMMARY_TOP):
+    if not rows:
+        return
+    print(f"⏱️ Top time sinks ({_trace.name}, trace {_trace.trace_id[:8]}):")
+    print(f"   {'span':<46} {'count':>6} {'self s':>9} {'total s':>9} {'max s':>8}")
+    for r in rows[:top]:
+        errors = f"  ({r['errors']} errors)" if r["errors"] else ""
+        print(f"   {r['name'][:46]:<46} {r['count']:>6} {r['self']:>9.2f} {r['total']:>9.2f} {r['max']:>8.2f}{errors}")
+
+
+def export_jsonl(trace=None, directory=TRACE_DIR):
+    trace = trace or _trace
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{time.strftime('%Y%m%dT%H%M%S')}_{trace.trace_id[:8]}.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        for s in trace.spans:
+            f.write(json.dumps(s.to_dict(trace.trace_id), default=str) + "\n")
+    print(f"🧾 Wrote {len(trace.spans)} spans to {path}")
+    return path
+
+
+def emit_metrics(dimensions, metrics, namespace=TRACE_METRIC_NAMESPACE):
+    """Logs one CloudWatch embedded-metric-format line.
+
+    `dimensions` maps dimension name to value; `metrics` maps metric name
+    to (value, unit). The trace id rides along as a searchable property.
+    """
+    print(json.dumps({
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": namespace,
+                "Dimensions": [list(dimensions)],
+                "Metrics": [{"Name": name, "Unit": unit} for name, (_, unit) in metrics.items()],
+            }],
+        },
+        **dimensions,
+        **{name: value for name, (value, _) in metrics.items()},
+        "trace_id": _trace.trace_id,
+    }))
+
+
+def emit_emf(rows):
+    """One metrics line per span name."""
+    for r in rows:
+        emit_metrics({"Span": r["name"]}, {
+            "Duration": (round(r["total"] * 1000, 1), "Milliseconds"),
+            "SelfDuration": (round(r["self"] * 1000, 1), "Milliseconds"),
+            "Count": (r["count"], "Count"),
+            "Errors": (r["errors"], "Count"),
+        })
+
+
+def finish_trace(export=TRACE_EXPORT):
+    """Prints the time-sink table and exports the trace; returns the summary rows."""
+    if not ENABLE_TRACING:
+        return []
+    rows = summarize()
+    print_summary(rows)
+    targets = {t.strip() for t in (export or "").split(",") if t.strip()}
+    if "jsonl" in targets:
+        try:
+            export_jsonl()
+        except OSError as e:
+            print(f"⚠️ Failed to write trace: {e}")
+    if "emf" in targets:
+        emit_emf(rows)
+    return rows
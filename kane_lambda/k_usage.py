@@ -0,0 +1,164 @@
+"""
+Per-call LLM token, cost and latency accounting.
+
+k_llm records every completion under the caller's stage label
+("headscanner", "prioritizer", "prioritizer.category", ...) with the
+prompt/completion tokens and cost from OpenRouter's usage block; when
+the block has no cost, LLM_PRICES_PER_MTOK is used, and cache hits are
+recorded with zero tokens. Records are invocation-scoped: begin_usage()
+clears them and finish_usage() prints a per stage/model table, logs
+CloudWatch EMF metrics (including cost per story), and persists the
+records through k_archive under llm_usage/dt=YYYY-MM-DD in USAGE_ROOT.
+
+    python -m kane_lambda.k_usage [start] [end]   # daily spend by stage and model
+"""
+import sys
+import threading
+from datetime import datetime, timezone
+
+from kane_lambda.config import ENABLE_USAGE_LOG, USAGE_ROOT, LLM_PRICES_PER_MTOK
+from kane_lambda.k_trace import get_trace, emit_metrics
+
+USAGE_LOG_NAME = "llm_usage"
+
+_records = []
+_lock = threading.Lock()
+
+
+def _cost(model, usage, prompt_tokens, completion_tokens):
+    if usage.get("cost") is not None:
+        return float(usage["cost"]), "openrouter"
+    if model in LLM_PRICES_PER_MTOK:
+        prompt_price, completion_price = LLM_PRICES_PER_MTOK[model]
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000, "price_table"
+    return 0.0, None
+
+
+def record_usage(stage, model, usage, seconds, cached=False):
+    """Records one completion; `usage` is OpenRouter's usage block ({} for cache hits)."""
+    prompt_tokens = int(usage.get("prompt_tokens") or 0)
+    completion_tokens = int(usage.get("completion_tokens") or 0)
+    cost, cost_source = _cost(model, usage, prompt_tokens, completion_tokens)
+    now = datetime.now(timezone.utc)
+    record = {
+        "date": now.strftime("%Y-%m-%d"),
+        "ts": now.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "trace_id": get_trace().trace_id,
+        "stage": stage or "unknown",
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cost": round(cost, 8),
+        "cost_source": cost_source,
+        "latency_ms": round(seconds * 1000, 1),
+        "cached": cached,
+    }
+    with _lock:
+        _records.append(record)
+    return record
+
+
+def begin_usage():
+    with _lock:
+        _records.clear()
+
+
+def get_records():
+    with _lock:
+        return list(_records)
+
+
+def summarize(records):
+    """Per (stage, model): calls, cache hits, tokens, cost and latency."""
+    rows = {}
+    for r in records:
+        row = rows.setdefault((r["stage"], r["model"]), {
+            "stage": r["stage"], "model": r["model"], "calls": 0, "cached": 0,
+            "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0, "latency_ms": 0.0,
+        })
+        row["calls"] += 1
+        row["cached"] += 1 if r["cached"] else 0
+        row["prompt_tokens"] += r["prompt_tokens"]
+        row["completion_tokens"] += r["completion_tokens"]
+        row["cost"] += r["cost"]
+        row["latency_ms"] += r["latency_ms"]
+    return sorted(rows.values(), key=lambda row: -row["cost"])
+
+
+def stage_cost(rows, stage):
+    # "prioritizer" covers its "prioritizer.<step>" calls too
+    return sum(r["cost"] for r in rows if r["stage"] == stage or r["stage"].startswith(stage + "."))
+
+
+def print_summary(rows, cost_per_story):
+    if not rows:
+        return
+    print("💸 LLM usage by stage and model:")
+    print(f"   {'stage':<26} {'model':<44} {'calls':>5} {'prompt tok':>11} {'compl tok':>10} {'cost $':>9} {'avg s':>6}")
+    for r in rows:
+        live = r["calls"] - r["cached"]
+        avg = r["latency_ms"] / live / 1000 if live else 0.0
+        print(f"   {r['stage']:<26} {r['model'][:44]:<44} {r['calls']:>5} {r['prompt_tokens']:>11,} "
+              f"{r['completion_tokens']:>10,} {r['cost']:>9.4f} {avg:>6.1f}")
+    total = sum(r["cost"] for r in rows)
+    per_story = ", ".join(f"{stage} ${cost:.4f}" for stage, cost in cost_per_story.items())
+    print(f"   total ${total:.4f}" + (f"; per story: {per_story}" if per_story else ""))
+
+
+def finish_usage(stories=None, persist=ENABLE_USAGE_LOG, root=USAGE_ROOT):
+    """Reports and persists this invocation's usage.
+
+    `stories` maps stage name to stories that stage produced (its DAG
+    output count) and is used for the cost-per-story metrics.
+    """
+    records = get_records()
+    if not records:
+        return {"by_model": [], "total_cost": 0.0, "cost_per_story": {}}
+    rows = summarize(records)
+    cost_per_story = {
+        stage: stage_cost(rows, stage) / count
+        for stage, count in (stories or {}).items()
+        if isinstance(count, int) and count > 0 and stage_cost(rows, stage) > 0
+    }
+    print_summary(rows, cost_per_story)
+
+    for r in rows:
+        emit_metrics(
+            {"Stage": r["stage"], "Model": r["model"]},
+            {"LLMCalls": (r["calls"], "Count"), "CachedCalls": (r["cached"], "Count"),
+             "PromptTokens": (r["prompt_tokens"], "Count"), "CompletionTokens": (r["completion_tokens"], "Count"),
+             "CostUSD": (round(r["cost"], 6), "None"), "LLMLatency": (round(r["latency_ms"], 1), "Milliseconds")},
+        )
+    for stage, cost in cost_per_story.items():
+        emit_metrics({"Stage": stage}, {"CostPerStoryUSD": (round(cost, 6), "None")})
+
+    if persist:
+        from kane_lambda.k_archive import archive_rows
+        try:
+            archive_rows(USAGE_LOG_NAME, records, reason="llm_usage", root=root, date_field="date")
+        except Exception as e:
+            print(f"⚠️ Failed to persist LLM usage: {e}")
+    return {"by_model": rows, "total_cost": round(sum(r["cost"] for r in rows), 6), "cost_per_story": cost_per_story}
+
+
+def trend(start=None, end=None, root=USAGE_ROOT):
+    """Daily totals per (date, stage, model) from the persisted records."""
+    from kane_lambda.k_archive import scan_archive
+    days = {}
+    for r in scan_archive(USAGE_LOG_NAME, start, end, root=root):
+        day = days.setdefault((r["date"], r["stage"], r["model"]), {"calls": 0, "tokens": 0, "cost": 0.0, "latency_ms": 0.0})
+        day["calls"] += 1
+        day["tokens"] += r["prompt_tokens"] + r["completion_tokens"]
+        day["cost"] += r["cost"]
+        day["latency_ms"] += r["latency_ms"]
+    return days
+
+
+if __name__ == "__main__":
+    # Usage: python -m kane_lambda.k_usage [start] [end]
+    start_arg = sys.argv[1] if len(sys.argv) > 1 else None
+    end_arg = sys.argv[2] if len(sys.argv) > 2 else None
+    print(f"{'date':<11} {'stage':<26} {'model':<44} {'calls':>6} {'tokens':>11} {'cost $':>9} {'avg s':>6}")
+    for (day, stage, model), t in sorted(trend(start_arg, end_arg).items()):
+        print(f"{day:<11} {stage:<26} {model[:44]:<44} {t['calls']:>6} {t['tokens']:>11,} {t['cost']:>9.4f} "
+              f"{t['latency_ms'] / max(t['calls'], 1) / 1000:>6.1f}")
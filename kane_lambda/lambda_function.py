@@ -1,10 +1,87 @@
+import json
+
+from kane_lambda.config import FANOUT_SHARDS, FANOUT_INVOKER
 from kane_lambda.k_master import run_kane_pipeline
+from kane_lambda.k_dag import dag_ok, continuation, BLOCKING_STATUSES
+from kane_lambda.k_deadline import Deadline, set_deadline
+from kane_lambda.k_state import begin_invocation, invocation_report
+from kane_lambda.k_trace import begin_trace, finish_trace, span
+from kane_lambda.k_usage import begin_usage, finish_usage
+from kane_lambda.k_profile import configure as configure_profiling
 
 def lambda_handler(event, context):
-    run_kane_pipeline()
+    event = event if isinstance(event, dict) else {}
+    # Container-scoped caches (k_state) carry over; everything else is per invocation
+    container = begin_invocation()
+    set_deadline(Deadline.from_context(context))
+    mode = event.get("mode", "pipeline")
+    trace = begin_trace(f"kane:{mode}", getattr(context, "aws_request_id", None))
+    begin_usage()
+    try:
+        # {"profile": "sheet_clean"} profiles that stage for this invocation only (see k_profile.py)
+        configure_profiling(event.get("profile"), event.get("profile_kinds"))
+        with span("invocation", mode=mode, warm=container["warm"]):
+            response = _handle(event, mode, container)
+    finally:
+        finish_trace()
+    response["trace_id"] = trace.trace_id
+    return response
+
+def _handle(event, mode, container):
+    # One stage on one shard (see k_fanout.py for the event schema)
+    if mode == "shard":
+        from kane_lambda.k_fanout import run_shard
+        result = run_shard(event)
+        container["caches"] = invocation_report()
+        result["container"] = container
+        result["usage"] = finish_usage(stories={result["stage"]: result["output"]})
+        return {
+            "statusCode": 500 if result["status"] in BLOCKING_STATUSES else 200,
+            "result": result,
+            "body": json.dumps(result, default=str)
+        }
+
+    # Coordinator: fan stages out over concurrent invocations, then select and clean
+    if mode == "fanout":
+        from kane_lambda.k_fanout import run_fanout, SHARDED_STAGES
+        outcome = run_fanout(
+            stages=event.get("stages", SHARDED_STAGES),
+            shards=int(event.get("shards", FANOUT_SHARDS)),
+            invoker=event.get("invoker", FANOUT_INVOKER),
+        )
+        ok = outcome["continuation"] is not None or (outcome["pipeline"] is not None and dag_ok(outcome["pipeline"]))
+        # Stopped before a stage the deadline left no time for, or the pipeline itself was deferred
+        marker = outcome["continuation"] or (continuation(outcome["pipeline"]) if outcome["pipeline"] else None)
+        if marker:
+            marker["attempt"] = int(event.get("attempt", 0)) + 1
+        outcome["continuation"] = marker
+        container["caches"] = invocation_report()
+        outcome["container"] = container
+        outcome["usage"] = finish_usage()
+        return {
+            "statusCode": 200 if ok else 500,
+            "continuation": marker,
+            "body": json.dumps(outcome, default=str)
+        }
+
+    # Stages stop scheduling work near the timeout; the returned continuation is the next event
+    results = run_kane_pipeline(resume_from=event.get("resume_from"))
+    ok = dag_ok(results)
+    container["caches"] = invocation_report()
+    usage = finish_usage(stories={name: r["output"] for name, r in results.items()})
+    marker = continuation(results)
+    if marker:
+        marker["attempt"] = int(event.get("attempt", 0)) + 1
+    if not ok:
+        message = "Kane pipeline finished with failed stages."
+    elif marker:
+        message = "Kane pipeline stopped at the Lambda deadline; invoke again with the continuation."
+    else:
+        message = "Kane pipeline completed successfully."
     return {
-        "statusCode": 200,
-        "body": "Kane pipeline completed successfully."
+        "statusCode": 200 if ok else 500,
+        "continuation": marker,
+        "body": json.dumps({"message": message, "stages": results, "continuation": marker, "container": container, "usage": usage}, default=str)
     }
 
 if __name__ == "__main__":
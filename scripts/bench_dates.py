@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""Micro-benchmark: legacy parse_date_safe vs kane_lambda.k_dates.
+
+Usage (from the repo root):
+
+    python scripts/bench_dates.py [rows] [repeats]
+
+The synthetic column mirrors the live sheets: mostly YYYY-MM-DD values
+written by format_date(), plus a few Sheets serials, RFC 822 feed dates,
+ISO timestamps and blanks.
+"""
+import contextlib
+import io
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytz
+from dateutil import parser as date_parser
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from kane_lambda.k_dates import parse_date, parse_dates  # noqa: E402
+
+
+def legacy_parse_date_safe(date_str):
+    # Verbatim copy of the helper formerly duplicated in k_selector and k_sheet_clean
+    try:
+        if not date_str or not date_str.strip():
+            return None
+        if re.match(r'^\d{5}$', str(date_str).strip()):
+            try:
+                excel_epoch = datetime(1899, 12, 30, tzinfo=pytz.UTC)
+                days_since_epoch = int(date_str)
+                dt = excel_epoch + timedelta(days=days_since_epoch)
+                print(f"✅ Converted date serial {date_str} to {dt}")
+                return dt
+            except Exception as e:
+                print(f"⚠️ Failed to convert date serial: '{date_str}' → {e}")
+        dt = date_parser.parse(date_str)
+        return dt.astimezone(pytz.UTC) if dt.tzinfo else dt.replace(tzinfo=pytz.UTC)
+    except Exception as e:
+        print(f"⚠️ Failed to parse date: '{date_str}' → {e}")
+        return None
+
+
+def synthetic_column(rows, seed=7):
+    rng = random.Random(seed)
+    base = datetime(2025, 1, 1)
+    values = []
+    for _ in range(rows):
+        day = base + timedelta(days=rng.randrange(60), minutes=rng.randrange(1440))
+        roll = rng.random()
+        if roll < 0.90:
+            values.append(day.strftime("%Y-%m-%d"))
+        elif roll < 0.94:
+            values.append(str((day - datetime(1899, 12, 30)).days))
+        elif roll < 0.97:
+            values.append(day.strftime("%a, %d %b %Y %H:%M:%S +0000"))
+        elif roll < 0.99:
+            values.append(day.strftime("%Y-%m-%dT%H:%M:%SZ"))
+        else:
+            values.append("")
+    return values
+
+
+def bench(label, fn, values, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn(values)
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<28} {best * 1000:9.1f} ms   {len(values) / best:12,.0f} rows/sec")
+    return best
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    values = synthetic_column(rows)
+
+    # Same answers first, then timings
+    with contextlib.redirect_stdout(io.StringIO()):
+        legacy = [legacy_parse_date_safe(v) for v in values[:5000]]
+    mismatches = sum(1 for a, b in zip(legacy, parse_dates(values[:5000])) if a != b)
+    print(f"📊 {rows} rows, best of {repeats}; {mismatches} mismatches vs legacy on the first 5000\n")
+
+    slow = bench("legacy parse_date_safe", lambda vs: [legacy_parse_date_safe(v) for v in vs], values, repeats)
+    fast = bench("k_dates.parse_date", lambda vs: [parse_date(v) for v in vs], values, repeats)
+    batch = bench("k_dates.parse_dates", parse_dates, values, repeats)
+    print(f"\n⚡ parse_date {slow / fast:.1f}x, parse_dates {slow / batch:.1f}x faster than legacy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""Micro-benchmark: feedparser.parse vs kane_lambda.k_feedparse on the feed mix.
+
+Usage (from the repo root):
+
+    python scripts/bench_feedparse.py [--archive exchanges.jsonl.gz] [--size N] [--repeat N]
+
+With --archive, the feeds are the 200 responses to GET requests in a k_http
+recording (KANE_HTTP_MODE=record), i.e. our real feed mix as it was fetched,
+with the recording time as "now". Without it, every RSS_FEEDS URL gets
+bench_pipeline's fixture feed holding --size new stories in all; the
+Atom URLs get the same entries as Atom.
+
+First the fast path is checked against feedparser, entry by entry, on the
+fields the headscanner reads. Summaries are compared by the story link the
+headscanner extracts from them, since feedparser sanitizes the HTML. Then
+per feed: best-of-N time for feedparser, the fast path reading everything,
+and the fast path with the headscanner's 24h cutoff, plus peak traced memory.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import escape
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import feedparser  # noqa: E402
+
+from bench_pipeline import synthetic_feeds  # noqa: E402
+from kane_lambda.k_feedparse import fast_parse  # noqa: E402
+from kane_lambda.k_headscanner import RSS_FEEDS, extract_real_url  # noqa: E402
+from kane_lambda.k_http import read_archive, _decode_body  # noqa: E402
+
+COMPARED_FIELDS = ("title", "link", "author")
+
+
+def archived_feeds(path):
+    """{url: body} of the successful feed fetches in a recording, and when it was recorded."""
+    feeds = {}
+    recorded_at = None
+    for record in read_archive(path):
+        if record["method"] == "GET" and record["status"] == 200:
+            feeds[record["url"]] = _decode_body(record)
+            recorded_at = recorded_at or record["ts"]
+    now = datetime.strptime(recorded_at, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc) if recorded_at else None
+    return feeds, now
+
+
+def as_atom(rss):
+    """The same entries as an Atom document, for the feeds that publish Atom."""
+    parsed = feedparser.parse(rss)
+    entries = []
+    for e in parsed.entries:
+        published = datetime(*e.published_parsed[:6], tzinfo=timezone.utc).isoformat()
+        author = f"<author><name>{escape(e.author)}</name></author>" if e.get("author") else ""
+        entries.append(
+            f"<entry><title>{escape(e.title)}</title><link rel=\"alternate\" href=\"{escape(e.link)}\"/>"
+            f"<id>{escape(e.id)}</id><published>{published}</published><updated>{published}</updated>{author}"
+            f"<summary type=\"html\">{escape(e.summary)}</summary></entry>"
+        )
+    return (
+        '<?xml version="1.0" encoding="utf-8"?><feed xmlns="http://www.w3.org/2005/Atom">'
+        f"<title>{escape(parsed.feed.get('title', ''))}</title>" + "".join(entries) + "</feed>"
+    ).encode("utf-8")
+
+
+def fixture_feeds(size, now):
+    feeds = synthetic_feeds(RSS_FEEDS, size, history=size, now=now)
+    return {url: as_atom(body) if url.endswith("atom.xml") else body for url, body in feeds.items()}
+
+
+def field(entry, name):
+    value = entry.get(name)
+    return value.strip() if isinstance(value, str) else value
+
+
+def mismatches(fast, slow):
+    """Per field, how many entries differ between the two parsers."""
+    counts = {name: 0 for name in COMPARED_FIELDS + ("published_parsed", "summary_link", "count")}
+    if len(fast.entries) != len(slow.entries):
+        counts["count"] += 1
+    for a, b in zip(fast.entries, slow.entries):
+        for name in COMPARED_FIELDS:
+            counts[name] += field(a, name) != field(b, name)
+        pa, pb = a.get("published_parsed"), b.get("published_parsed")
+        counts["published_parsed"] += (pa and tuple(pa[:6])) != (pb and tuple(pb[:6]))
+        counts["summary_link"] += extract_real_url(a.get("summary", "")) != extract_real_url(b.get("summary", ""))
+    return counts
+
+
+def best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def peak_memory(fn):
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="feedparser vs the fast feed parser on the feed mix.")
+    parser.add_argument("--archive", help="k_http recording to take the feeds from")
+    parser.add_argument("--size", type=int, default=1000, help="new stories across the fixture feeds")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per parser; the best is kept")
+    opts = parser.parse_args()
+
+    if opts.archive:
+        feeds, now = archived_feeds(opts.archive)
+        now = now or datetime.now(timezone.utc)
+        source = f"{len(feeds)} feeds recorded in {opts.archive}"
+    else:
+        now = datetime.now(timezone.utc)
+        feeds = fixture_feeds(opts.size, now)
+        source = f"{len(feeds)} fixture feeds, {opts.size} new stories"
+    cutoff = now - timedelta(days=1)
+    print(f"📊 {source}, best of {opts.repeat}\n")
+
+    totals = {"bytes": 0, "entries": 0, "read": 0, "feedparser": 0.0, "fast": 0.0, "cutoff": 0.0,
+              "mem_feedparser": 0, "mem_fast": 0, "fallbacks": 0}
+    diffs = {}
+    print(f"{'feed':<44} {'KB':>7} {'entries':>7} {'read':>5} {'feedparser ms':>13} {'fast ms':>8} {'cutoff ms':>9}")
+    for url, body in feeds.items():
+        slow_s, slow = best_time(lambda: feedparser.parse(body), opts.repeat)
+        try:
+            fast_s, fast = best_time(lambda: fast_parse(body, base=url), opts.repeat)
+            cut_s, cut = best_time(lambda: fast_parse(body, cutoff=cutoff, base=url), opts.repeat)
+        except Exception as e:
+            # parse_feed would hand this feed to feedparser
+            totals["fallbacks"] += 1
+            print(f"{url[:44]:<44} falls back to feedparser ({e})")
+            continue
+        for name, count in mismatches(fast, slow).items():
+            diffs[name] = diffs.get(name, 0) + count
+        with contextlib.redirect_stdout(io.StringIO()):
+            totals["mem_feedparser"] = max(totals["mem_feedparser"], peak_memory(lambda: feedparser.parse(body)))
+            totals["mem_fast"] = max(totals["mem_fast"], peak_memory(lambda: fast_parse(body, cutoff=cutoff, base=url)))
+        totals["bytes"] += len(body)
+        totals["entries"] += len(slow.entries)
+        totals["read"] += len(cut.entries)
+        totals["feedparser"] += slow_s
+        totals["fast"] += fast_s
+        totals["cutoff"] += cut_s
+        print(f"{url[:44]:<44} {len(body) / 1024:>7.1f} {len(slow.entries):>7} {len(cut.entries):>5} "
+              f"{slow_s * 1000:>13.2f} {fast_s * 1000:>8.2f} {cut_s * 1000:>9.2f}")
+
+    t = totals
+    print(f"\n{'total':<44} {t['bytes'] / 1024:>7.1f} {t['entries']:>7} {t['read']:>5} "
+          f"{t['feedparser'] * 1000:>13.2f} {t['fast'] * 1000:>8.2f} {t['cutoff'] * 1000:>9.2f}")
+    print(f"⚡ fast path {t['feedparser'] / max(t['fast'], 1e-9):.1f}x faster than feedparser, "
+          f"{t['feedparser'] / max(t['cutoff'], 1e-9):.1f}x with the cutoff stop")
+    print(f"🧠 peak traced memory on the largest feed: feedparser {t['mem_feedparser'] / 1e6:.1f} MB, "
+          f"fast {t['mem_fast'] / 1e6:.1f} MB")
+    print(f"🔍 differences vs feedparser: {diffs or 'none'}; {t['fallbacks']} feeds fall back")
+
+
+if __name__ == "__main__":
+    main()
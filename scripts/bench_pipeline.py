@@ -0,0 +1,418 @@
+#!/usr/bin/env python
+"""End-to-end offline benchmark of run_kane_pipeline.
+
+Usage (from the repo root):
+
+    python scripts/bench_pipeline.py [--sizes 100,1000,10000] [--repeat N] [--out FILE]
+    python scripts/bench_pipeline.py --replay exchanges.jsonl.gz [--replay-latency 0]
+    python scripts/bench_pipeline.py --compare BASE.json NEW.json [--threshold PCT]
+
+Each size runs all four stages in a fresh interpreter against local
+stand-ins, with no network or credentials:
+- Feeds: every RSS_FEEDS URL serves a fixture RSS document, parsed as
+  in production (KANE_FEED_PARSER). Together the fixtures hold `size`
+  new stories.
+  Techmeme gets the biggest share. Every feed also carries entries
+  older than the cutoff and links already in the sheet.
+- OpenRouter: k_llm._post returns canned JSON in the shape each prompt
+  template asks for, built from the batch inside the prompt.
+- Sheets/Docs: k_emulator, seeded with `--history` earlier stories
+  (default: as many as `size`) on top of an optional --sheet-snapshot.
+
+With --replay ARCHIVE, feeds and OpenRouter are served instead from a
+k_http recording (KANE_HTTP_MODE=record), with the recorded latencies
+scaled by --replay-latency. That is one run over whatever the recording
+holds.
+
+Stage timeouts are lifted, so a slow stage shows up as time, not as a
+timeout. Per size the results record wall and CPU time, per-stage
+seconds, stories/sec, peak RSS, the top trace spans, and external call
+counts: feed fetches, LLM calls per stage, and Sheets/Docs calls per
+method. --compare prints the deltas between two result files and exits
+non-zero when a time or memory metric regressed by more than
+--threshold percent. --profile STAGES also writes k_profile reports for
+those stages to --profile-root; profiled runs are slower, so don't
+compare them with unprofiled ones.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import escape
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+DEFAULT_SIZES = [100, 1000, 10000]
+RIVER_SHARE = 0.2  # Techmeme River's share of the new stories; the other feeds split the rest
+OLD_FRACTION = 0.15  # entries per feed older than the headscanner's 24h cutoff
+SEEN_FRACTION = 0.1  # entries per feed whose link is already in the headscanner sheet
+LINK_IN_SUMMARY = ("techmeme.com", "rss.app")  # these feeds wrap the story link in the summary HTML
+VOCAB = [f"w{n}" for n in range(600)] + ["AI", "Nvidia", "GPU", "OpenAI", "funding", "data centre", "chip", "EU"]
+
+# Relative change (%) above which --compare flags a metric; "higher" metrics regress when they drop
+COMPARED_METRICS = {
+    "wall_seconds": "lower",
+    "cpu_seconds": "lower",
+    "stories_per_second": "higher",
+    "peak_rss_mb": "lower",
+}
+
+
+# === FIXTURES ===
+def synthetic_feeds(feeds, size, history, now, seed=0):
+    """{url: RSS bytes} holding `size` new stories spread over `feeds`, plus stale and already-seen entries."""
+    rng = random.Random(seed + size)
+    shares = [RIVER_SHARE] + [(1 - RIVER_SHARE) / (len(feeds) - 1)] * (len(feeds) - 1)
+    counts = [int(size * s) for s in shares]
+    for i in range(size - sum(counts)):
+        counts[1 + i % (len(feeds) - 1)] += 1
+
+    documents = {}
+    story = 0
+    for (url, label), new in zip(feeds, counts):
+        entries = []
+        for _ in range(new):
+            story += 1
+            entries.append((f"https://news{story % 40}.example.com/{story}", now - timedelta(minutes=rng.randrange(1, 1380))))
+        for _ in range(int(new * SEEN_FRACTION) + 1 if history else 0):
+            seen = rng.randint(1, history)
+            entries.append((f"https://example{seen % 25}.com/story/{seen}", now - timedelta(minutes=rng.randrange(1, 1380))))
+        for _ in range(int(new * OLD_FRACTION) + 1):
+            story += 1
+            entries.append((f"https://news{story % 40}.example.com/{story}", now - timedelta(days=rng.uniform(1.1, 5))))
+        entries.sort(key=lambda e: e[1], reverse=True)  # feeds list newest first
+        documents[url] = _rss(label, url, entries, rng)
+    return documents
+
+
+def _rss(label, url, entries, rng):
+    wrap_link = any(host in url for host in LINK_IN_SUMMARY)
+    items = []
+    for link, published in entries:
+        title = " ".join(rng.sample(VOCAB, rng.randint(6, 14))).capitalize()
+        text = ". ".join(" ".join(rng.sample(VOCAB, rng.randint(10, 22))) for _ in range(rng.randint(2, 5))) + "."
+        summary = f'<p><a href="{link}">{title}</a></p><p>{text}</p>' if wrap_link else f"<p>{text}</p>"
+        creator = f"<dc:creator>Reporter {rng.randrange(80)}</dc:creator>" if rng.random() < 0.5 else ""
+        items.append(
+            f"<item><title>{escape(title)} ({label})</title>"
+            f"<link>{escape(url if wrap_link else link)}</link>"
+            f"<description>{escape(summary)}</description>"
+            f"<pubDate>{format_datetime(published)}</pubDate>{creator}"
+            f"<guid isPermaLink=\"false\">{escape(link)}</guid></item>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/">'
+        f"<channel><title>{escape(label)}</title><link>{escape(url)}</link><description>fixture</description>"
+        + "".join(items) + "</channel></rss>"
+    ).encode("utf-8")
+
+
+def canned_response(prompt, templates, categories):
+    """JSON answer in the shape the prompt's template asks for, one item per story in its batch."""
+    for kind, template, placeholder in templates:
+        prefix, suffix = template.split(placeholder)
+        if prompt.startswith(prefix) and prompt.endswith(suffix):
+            batch = json.loads(prompt[len(prefix):len(prompt) - len(suffix)])
+            break
+    else:
+        raise ValueError("prompt doesn't match any known template")
+
+    items = []
+    for story in batch:
+        text = story.get("summary") or story.get("context_snippet") or story.get("headline", "")
+        h = sum(map(ord, text))
+        if kind == "headscanner":
+            sentence = text.replace("<p>", " ").replace("</p>", " ").split(".")[0].strip()
+            items.append({"context_snippet": sentence[:240] + ".", "author": "" if story.get("has_author") else f"Writer {h % 30}"})
+        elif kind == "category":
+            items.append({"story_id": story["story_id"], "category": categories[h % len(categories)],
+                          "category_reason": "canned benchmark label"})
+        elif kind == "significance":
+            items.append({"story_id": story["story_id"], "significance_score": 1 + h % 10})
+        elif kind == "relevance":
+            items.append({"story_id": story["story_id"], "relevant": "IN" if h % 3 else "SKIP"})
+        else:  # single-prompt prioritizer
+            items.append({"story_id": story["story_id"], "fact_summary": text[:200],
+                          "category": categories[h % len(categories)], "category_reason": "canned benchmark label",
+                          "significance_score": 1 + h % 10})
+    return json.dumps(items, indent=2)
+
+
+# === ONE RUN (child process) ===
+def run_size(size, history, llm_latency_ms, feed_latency_ms, trace_malloc, replay=None):
+    import resource
+    import tracemalloc
+
+    from kane_lambda import config
+    for stage in config.STAGE_TIMEOUTS:
+        config.STAGE_TIMEOUTS[stage] = None
+
+    from kane_lambda import k_emulator, k_http, k_master
+    from kane_lambda.k_headscanner import RSS_FEEDS, SHEET_ID
+    from kane_lambda.k_api_scheduler import get_scheduler
+    from kane_lambda.k_trace import begin_trace, summarize
+    from kane_lambda.k_usage import begin_usage, get_records, summarize as summarize_usage
+
+    if history:
+        k_emulator.seed_synthetic_stories(SHEET_ID, history)
+    templates = [
+        ("headscanner", config.HEADSCANNER_PROMPT_TEMPLATE, "{batch}"),
+        ("category", config.CATEGORY_PROMPT_TEMPLATE, "{story_batch}"),
+        ("significance", config.SIGNIFICANCE_PROMPT_TEMPLATE, "{story_batch}"),
+        ("relevance", config.RELEVANCE_PROMPT_TEMPLATE, "{story_batch}"),
+        ("prioritizer", config.PROMPT_TEMPLATE, "{story_batch}"),
+    ]
+
+    def fixture_transport(method, url, headers, body, timeout):
+        if method == "GET":
+            time.sleep(feed_latency_ms / 1000)
+            return k_http.Response(200, {"Content-Type": "application/rss+xml; charset=utf-8"}, fixtures[url], url)
+        time.sleep(llm_latency_ms / 1000)
+        prompt = json.loads(body)["messages"][0]["content"]
+        content = canned_response(prompt, templates, config.CATEGORIES)
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4}
+        answer = {"choices": [{"message": {"role": "assistant", "content": content}}], "usage": usage}
+        return k_http.Response(200, {"Content-Type": "application/json"}, json.dumps(answer).encode("utf-8"), url)
+
+    # Replays serve KANE_HTTP_ARCHIVE (set by the driver); otherwise fixtures and canned answers
+    if replay:
+        transport = k_http.get_transport()
+    else:
+        fixtures = synthetic_feeds(RSS_FEEDS, size, history, datetime.now(timezone.utc))
+        transport = fixture_transport
+        k_master.HEADSCANNER_MAX_STORIES = size
+    feed_calls = Counter()
+
+    def counting_transport(method, url, headers, body, timeout):
+        if method == "GET":
+            feed_calls[url] += 1
+        return transport(method, url, headers, body, timeout)
+
+    k_http.set_transport(counting_transport)
+    k_master.ENABLE_K_SELECTOR = True
+    k_master.ENABLE_K_SHEET_CLEAN = True
+
+    label = f"replay:{os.path.basename(replay)}" if replay else str(size)
+    begin_trace(f"bench:{label}")
+    begin_usage()
+    if trace_malloc:
+        tracemalloc.start()
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    results = k_master.run_kane_pipeline()
+    wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+    traced_peak = tracemalloc.get_traced_memory()[1] if trace_malloc else None
+
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    google = k_emulator.get_state().stats()
+    if replay:
+        size = results["headscanner"]["output"] if isinstance(results["headscanner"]["output"], int) else 0
+    return {
+        "label": label,
+        "stories": size,
+        "history": history,
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(cpu, 3),
+        "stories_per_second": round(size / wall, 1),
+        "peak_rss_mb": round(rss, 1),
+        "peak_traced_mb": round(traced_peak / 1_000_000, 1) if traced_peak is not None else None,
+        "stages": {name: {"status": r["status"], "seconds": r["seconds"], "output": r["output"]}
+                   for name, r in results.items()},
+        "calls": {
+            "feeds": sum(feed_calls.values()),
+            "llm": {r["stage"]: r["calls"] for r in summarize_usage(get_records())},
+            "google": google["calls"],
+            "google_total": google["total_calls"],
+            "throttle_seconds": round(sum(r["throttle_seconds"] for r in get_scheduler().headroom().values()), 2),
+        },
+        "top_spans": [{"name": s["name"], "count": s["count"], "self_seconds": round(s["self"], 3)}
+                      for s in summarize()[:10]],
+    }
+
+
+def child_main(opts):
+    # The stages' progress lines are discarded; only the result JSON goes back to the parent
+    with open(os.devnull, "w") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            result = run_size(opts.child, opts.history_for(opts.child), opts.llm_latency_ms,
+                              opts.feed_latency_ms, opts.tracemalloc, opts.replay)
+        finally:
+            sys.stdout = stdout
+    print(json.dumps(result))
+
+
+# === DRIVER ===
+def spawn(size, opts, scratch):
+    env = dict(os.environ, KANE_GOOGLE_BACKEND="emulator", KANE_TRACE_EXPORT="",
+               KANE_EMULATOR_SEED=os.path.abspath(opts.sheet_snapshot) if opts.sheet_snapshot else "",
+               KANE_ARCHIVE_ROOT=os.path.join(scratch, "archive"), KANE_ARCHIVE="1", KANE_USAGE_LOG="1",
+               KANE_RENDER_CACHE_DIR=os.path.join(scratch, "renders"),
+               KANE_ID_ALLOCATOR="sheet")
+    args = [sys.executable, os.path.abspath(__file__), "--child", str(size),
+            "--llm-latency-ms", str(opts.llm_latency_ms), "--feed-latency-ms", str(opts.feed_latency_ms)]
+    if opts.history is not None:
+        args += ["--history", str(opts.history)]
+    if opts.tracemalloc:
+        args.append("--tracemalloc")
+    if opts.profile:
+        env.update(KANE_PROFILE_STAGES=opts.profile, KANE_PROFILE_ROOT=os.path.abspath(opts.profile_root))
+    if opts.replay:
+        env.update(KANE_HTTP_MODE="replay", KANE_HTTP_ARCHIVE=os.path.abspath(opts.replay),
+                   KANE_HTTP_REPLAY_LATENCY=str(opts.replay_latency))
+        args += ["--replay", opts.replay]
+    proc = subprocess.run(args, capture_output=True, text=True, env=env, cwd=ROOT)
+    if proc.returncode != 0:
+        sys.exit(f"❌ {'Replay' if opts.replay else f'{size}-story'} run failed:\n{proc.stderr[-3000:]}")
+    return json.loads(proc.stdout.splitlines()[-1])
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=ROOT, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def print_run(r):
+    source = f"replay of {r['label'][7:]}, " if r["label"].startswith("replay:") else ""
+    print(f"\n📊 {r['stories']:,} stories ({source}{r['history']:,} already in the sheet): "
+          f"{r['wall_seconds']:.2f}s wall, {r['cpu_seconds']:.2f}s CPU, {r['stories_per_second']:,.0f} stories/s, "
+          f"peak RSS {r['peak_rss_mb']:.0f} MB"
+          + (f", traced peak {r['peak_traced_mb']:.0f} MB" if r["peak_traced_mb"] is not None else ""))
+    for name, s in r["stages"].items():
+        print(f"   {name:<14} {s['status']:<8} {s['seconds']:>8.2f}s  output {s['output']}")
+    calls = r["calls"]
+    llm = ", ".join(f"{stage} {n}" for stage, n in sorted(calls["llm"].items()))
+    print(f"   calls: {calls['feeds']} feeds, LLM [{llm}], {calls['google_total']} Sheets/Docs"
+          f" ({calls['throttle_seconds']:.1f}s throttled)")
+
+
+def run_benchmarks(opts):
+    # A replay runs once, with whatever the recording holds
+    sizes = [0] if opts.replay else [int(s) for s in opts.sizes.split(",")]
+    runs = []
+    with tempfile.TemporaryDirectory() as scratch:
+        for size in sizes:
+            samples = [spawn(size, opts, scratch) for _ in range(opts.repeat)]
+            samples.sort(key=lambda r: r["wall_seconds"])
+            run = samples[len(samples) // 2]  # the median run by wall time
+            run["wall_samples"] = [r["wall_seconds"] for r in samples]
+            print_run(run)
+            runs.append(run)
+
+    revision = git_revision()
+    result = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "revision": revision,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": opts.repeat,
+            "llm_latency_ms": opts.llm_latency_ms,
+            "feed_latency_ms": opts.feed_latency_ms,
+            "replay": opts.replay and os.path.abspath(opts.replay),
+            "replay_latency": opts.replay_latency if opts.replay else None,
+            "sheet_snapshot": opts.sheet_snapshot,
+            "profile": opts.profile,
+        },
+        "runs": runs,
+    }
+    out = opts.out or os.path.join(ROOT, "bench_results",
+                                   f"pipeline_{time.strftime('%Y%m%dT%H%M%S')}{'_' + revision if revision else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"\n💾 Wrote {out}")
+
+
+# === COMPARE ===
+def _delta(base, new):
+    return (new - base) / base * 100 if base else 0.0
+
+
+def compare(base_path, new_path, threshold):
+    with open(base_path, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"🔬 {base['meta'].get('revision') or base_path} → {new['meta'].get('revision') or new_path}")
+    for key in ("llm_latency_ms", "feed_latency_ms", "replay_latency", "python"):
+        if base["meta"].get(key) != new["meta"].get(key):
+            print(f"⚠️ {key} differs ({base['meta'].get(key)} vs {new['meta'].get(key)}); deltas include that")
+
+    regressions = []
+    # Files written before replays existed have no label; their runs are keyed by size
+    base_runs = {r.get("label", str(r["stories"])): r for r in base["runs"]}
+    for run in new["runs"]:
+        old = base_runs.get(run.get("label", str(run["stories"])))
+        if old is None:
+            continue
+        print(f"\n   {run.get('label', run['stories'])} ({run['stories']:,} stories)")
+        print(f"   {'metric':<28} {'base':>11} {'new':>11} {'change':>9}")
+        rows = [(metric, old[metric], run[metric], direction) for metric, direction in COMPARED_METRICS.items()]
+        rows += [(f"stage {name} s", old["stages"][name]["seconds"], s["seconds"], "lower")
+                 for name, s in run["stages"].items() if name in old["stages"]]
+        rows += [("google calls", old["calls"]["google_total"], run["calls"]["google_total"], None),
+                 ("llm calls", sum(old["calls"]["llm"].values()), sum(run["calls"]["llm"].values()), None)]
+        for metric, b, n, direction in rows:
+            change = _delta(b, n)
+            worse = change > threshold if direction == "lower" else change < -threshold if direction == "higher" else False
+            flag = "  ▲ regression" if worse else ""
+            if worse:
+                regressions.append(f"{run.get('label', run['stories'])}: {metric} {change:+.1f}%")
+            print(f"   {metric:<28} {b:>11,.2f} {n:>11,.2f} {change:>+8.1f}%{flag}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} metric(s) regressed by more than {threshold:.0f}%:")
+        for r in regressions:
+            print(f"   {r}")
+        return 1
+    print(f"\n✅ No time or memory regression above {threshold:.0f}%")
+    return 0
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="comma-separated story counts")
+    args.add_argument("--history", type=int, help="stories already in the sheets (default: same as each size)")
+    args.add_argument("--repeat", type=int, default=1, help="runs per size; the median run by wall time is kept")
+    args.add_argument("--llm-latency-ms", type=float, default=0.0, help="added to every canned LLM call")
+    args.add_argument("--feed-latency-ms", type=float, default=0.0, help="added to every feed fetch")
+    args.add_argument("--replay", metavar="ARCHIVE",
+                      help="serve feeds and LLM calls from a k_http recording instead of fixtures")
+    args.add_argument("--replay-latency", type=float, default=1.0, help="recorded latency scale when replaying (0 = none)")
+    args.add_argument("--sheet-snapshot", help="k_emulator JSON snapshot to preload the sheets from")
+    args.add_argument("--profile", metavar="STAGES",
+                      help="write k_profile reports for these stages (comma-separated or all); adds overhead")
+    args.add_argument("--profile-root", default=os.path.join(ROOT, "bench_results", "profiles"))
+    args.add_argument("--tracemalloc", action="store_true", help="also record the traced Python heap peak (slower)")
+    args.add_argument("--out", help="result file (default: bench_results/pipeline_<time>_<revision>.json)")
+    args.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two result files")
+    args.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    opts = args.parse_args()
+    opts.history_for = lambda size: size if opts.history is None else opts.history
+
+    if opts.compare:
+        sys.exit(compare(*opts.compare, opts.threshold))
+    if opts.child is not None:
+        child_main(opts)
+    else:
+        run_benchmarks(opts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+"""Builds a minimal, precompiled Lambda zip for the Kane pipeline.
+
+Usage (from the repo root):
+
+    python scripts/build_lambda_artifact.py [--site-packages DIR] [--out ZIP] [--runs N]
+
+Steps:
+1. Install requirements.txt into a staging dir. With --site-packages,
+   an existing install is used instead, e.g. for offline builds.
+2. Find the import closure in a clean interpreter that sees only the
+   staged packages and the repo. It imports the handler and every stage
+   module (RUNTIME_IMPORTS). It also builds the Google services with
+   anonymous credentials and parses a tiny feed, which catches modules
+   that are only imported at call time. Packages outside the closure,
+   like google-auth-oauthlib, are left out.
+3. Copy only those packages and their dist-info. Test and doc
+   directories are pruned, along with every bundled discovery document
+   except DISCOVERY_DOCUMENTS.
+4. Precompile .pyc files with unchecked hashes. /var/task is read-only,
+   so without them Lambda recompiles every module on each cold start.
+5. Zip the build, report its size, and time the imports with and
+   without the precompiled bytecode.
+"""
+import argparse
+import compileall
+import json
+import os
+import py_compile
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BUILD_DIR = os.path.join(ROOT, "lambda_package", "build")
+DEFAULT_OUT = os.path.join(ROOT, "lambda_package", "kane_lambda_package.zip")
+DEFAULT_CREDS = os.path.join(ROOT, "lambda_package", "service_account.json")
+LAMBDA_RUNTIME = "python3.11"
+
+RUNTIME_IMPORTS = [
+    "kane_lambda.lambda_function",
+    "kane_lambda.k_headscanner",
+    "kane_lambda.k_prioritizer",
+    "kane_lambda.k_prioritizer_split",
+    "kane_lambda.k_selector",
+    "kane_lambda.k_sheet_clean",
+    "kane_lambda.k_fanout",
+    "google.oauth2.service_account",
+    "googleapiclient.discovery",
+    "feedparser",
+    "dateutil.parser",
+    "requests",  # k_http's live transport imports it on the first feed fetch or OpenRouter call
+]
+DISCOVERY_DOCUMENTS = {"sheets.v4.json", "docs.v1.json", "drive.v3.json"}
+PRUNED_DIRS = {"tests", "test", "docs", "doc", "examples", "__pycache__"}
+PRUNED_SUFFIXES = (".pyc", ".pyo", ".pyi", ".c", ".h", ".pxd", ".pyx")
+
+# Runs in a clean interpreter with sys.path = [staged packages, repo] + stdlib
+CLOSURE_PROBE = """
+import json, sys
+for name in MODULES:
+    __import__(name)
+from google.auth.credentials import AnonymousCredentials
+from googleapiclient.discovery import build
+for api, version in [("sheets", "v4"), ("docs", "v1"), ("drive", "v3")]:
+    build(api, version, credentials=AnonymousCredentials(), cache_discovery=False)
+# Sign a token assertion the way a service account does, with a throwaway key
+try:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+except ImportError:
+    pass  # google-auth falls back to the pure-Python rsa package, imported above
+else:
+    from google.oauth2 import service_account
+    pem = rsa.generate_private_key(public_exponent=65537, key_size=2048).private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()).decode()
+    service_account.Credentials.from_service_account_info(
+        {"private_key": pem, "client_email": "probe@example.com", "token_uri": "https://oauth2.googleapis.com/token"}
+    )._make_authorization_grant_assertion()
+import feedparser
+feedparser.parse("<rss><channel><item><title>t</title><pubDate>Mon, 01 Jan 2024 00:00:00 GMT</pubDate></item></channel></rss>")
+from kane_lambda.k_feedparse import parse_feed
+parse_feed(b"<rss><channel><item><title>t</title><pubDate>Mon, 01 Jan 2024 00:00:00 GMT</pubDate></item></channel></rss>")
+from kane_lambda.k_dates import parse_date
+parse_date("Mon, 01 Jan 2024 00:00:00 GMT")
+print(json.dumps({n: getattr(m, "__file__", None) for n, m in list(sys.modules.items())}))
+"""
+
+IMPORT_BENCH = """
+import sys, time
+start = time.perf_counter()
+import kane_lambda.lambda_function
+handler = time.perf_counter()
+for name in MODULES:
+    __import__(name)
+print(handler - start, time.perf_counter() - start)
+"""
+
+
+def run_clean(code, path, extra_args=()):
+    """Runs `code` in an interpreter that only sees `path` plus the standard library."""
+    # -I ignores PYTHONPATH and user site; -S skips site-packages
+    prelude = f"import sys; sys.path[:0] = {list(path)!r}; MODULES = {RUNTIME_IMPORTS!r}\n"
+    proc = subprocess.run([sys.executable, "-I", "-S", *extra_args, "-c", prelude + code],
+                          capture_output=True, text=True, env={"KANE_GOOGLE_BACKEND": "google"})
+    if proc.returncode != 0:
+        sys.exit(f"❌ Clean-interpreter run failed:\n{proc.stderr[-3000:]}")
+    return proc.stdout
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def mb(n):
+    return f"{n / 1_000_000:.1f} MB"
+
+
+# === 1. DEPENDENCIES ===
+def install_requirements(target):
+    print(f"📥 Installing requirements.txt into {target}")
+    subprocess.run([sys.executable, "-m", "pip", "install", "--quiet", "--upgrade",
+                    "-r", os.path.join(ROOT, "requirements.txt"), "--target", target], check=True)
+
+
+# === 2. IMPORT CLOSURE ===
+def import_closure(site_packages):
+    """Relative paths (under site_packages) of the packages and modules the runtime imports."""
+    modules = json.loads(run_clean(CLOSURE_PROBE, [site_packages, ROOT]).splitlines()[-1])
+    roots = set()
+    for path in filter(None, modules.values()):
+        path = os.path.abspath(path)
+        if not path.startswith(site_packages + os.sep):
+            continue  # standard library or the repo
+        parts = os.path.relpath(path, site_packages).split(os.sep)
+        # Namespace packages (google/) have no __init__.py: keep only the subpackages in use
+        depth = 1
+        while depth < len(parts) and not os.path.exists(os.path.join(site_packages, *parts[:depth], "__init__.py")):
+            depth += 1
+        roots.add(os.path.join(*parts[:depth]))
+    return sorted(roots)
+
+
+def owning_dist_infos(site_packages, roots):
+    """dist-info dirs whose RECORD lists a file under one of `roots`."""
+    owners = set()
+    for entry in os.listdir(site_packages):
+        record = os.path.join(site_packages, entry, "RECORD")
+        if not entry.endswith(".dist-info") or not os.path.exists(record):
+            continue
+        with open(record, encoding="utf-8") as f:
+            files = [line.split(",", 1)[0] for line in f]
+        if any(f == root or f.startswith(root.replace(os.sep, "/") + "/") for f in files for root in roots):
+            owners.add(entry)
+    return sorted(owners)
+
+
+# === 3. COPY & PRUNE ===
+def _ignore(directory, names):
+    ignored = {n for n in names if n in PRUNED_DIRS and os.path.isdir(os.path.join(directory, n))}
+    ignored |= {n for n in names if n.endswith(PRUNED_SUFFIXES)}
+    if directory.replace(os.sep, "/").endswith("googleapiclient/discovery_cache/documents"):
+        ignored |= {n for n in names if n.endswith(".json") and n not in DISCOVERY_DOCUMENTS}
+    return ignored
+
+
+def copy_tree_or_file(src, dst):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.isdir(src):
+        shutil.copytree(src, dst, ignore=_ignore)
+    else:
+        shutil.copy2(src, dst)
+
+
+def assemble(build_dir, site_packages, roots, dist_infos, creds):
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+    for rel in roots + dist_infos:
+        copy_tree_or_file(os.path.join(site_packages, rel), os.path.join(build_dir, rel))
+    copy_tree_or_file(os.path.join(ROOT, "kane_lambda"), os.path.join(build_dir, "kane_lambda"))
+    if os.path.exists(creds):
+        shutil.copy2(creds, os.path.join(build_dir, "service_account.json"))
+    else:
+        print(f"⚠️ No credentials at {creds}; the artifact will need them supplied another way")
+
+
+# === 4. PRECOMPILE ===
+def precompile(build_dir):
+    # Zip entries carry their own mtimes, so skip the source-timestamp check altogether
+    ok = compileall.compile_dir(build_dir, quiet=1, workers=0,
+                                invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+    if not ok:
+        print("⚠️ Some files failed to compile; they'll be compiled (slowly) at import time")
+
+
+# === 5. ZIP & REPORT ===
+def write_zip(build_dir, out):
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+        for directory, dirs, files in os.walk(build_dir):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(directory, name)
+                zf.write(path, os.path.relpath(path, build_dir))
+
+
+def bench_imports(build_dir, runs):
+    """Median (handler, all stages) import seconds, with the shipped .pyc and without any."""
+    def median_of(extra_args):
+        samples = [tuple(map(float, run_clean(IMPORT_BENCH, [build_dir], extra_args).split()))
+                   for _ in range(runs)]
+        return statistics.median(s[0] for s in samples), statistics.median(s[1] for s in samples)
+
+    with tempfile.TemporaryDirectory() as empty:
+        # An empty pycache prefix plus -B forces a compile from source on every run
+        return median_of(()), median_of(("-B", "-X", f"pycache_prefix={empty}"))
+
+
+def report(site_packages, build_dir, roots, out, timings):
+    installed = dir_size(site_packages)
+    shipped = dir_size(build_dir)
+    print(f"\n📦 {out}")
+    print(f"   zip {mb(os.path.getsize(out))}, unpacked {mb(shipped)} "
+          f"(dependencies installed: {mb(installed)})")
+    print("   largest packages:")
+    sizes = sorted(((dir_size(p) if os.path.isdir(p) else os.path.getsize(p), rel)
+                    for rel in roots for p in [os.path.join(build_dir, rel)]), reverse=True)
+    for size, rel in sizes[:8]:
+        print(f"     {mb(size):>9}  {rel}")
+    (handler, full), (handler_src, full_src) = timings
+    print(f"\n⏱️ Cold-start imports (median): handler {handler * 1000:.0f} ms, all stages {full * 1000:.0f} ms")
+    print(f"   without precompiled .pyc:    handler {handler_src * 1000:.0f} ms, all stages {full_src * 1000:.0f} ms")
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument("--site-packages", help="use this existing install instead of pip-installing requirements.txt")
+    args.add_argument("--build-dir", default=BUILD_DIR)
+    args.add_argument("--out", default=DEFAULT_OUT)
+    args.add_argument("--creds", default=DEFAULT_CREDS)
+    args.add_argument("--runs", type=int, default=5)
+    opts = args.parse_args()
+
+    runtime = f"python{sys.version_info.major}.{sys.version_info.minor}"
+    if runtime != LAMBDA_RUNTIME:
+        print(f"⚠️ Building with {runtime} for a {LAMBDA_RUNTIME} function: Lambda will ignore the .pyc files")
+
+    with tempfile.TemporaryDirectory() as staging:
+        site_packages = os.path.abspath(opts.site_packages or staging)
+        if not opts.site_packages:
+            install_requirements(site_packages)
+
+        roots = import_closure(site_packages)
+        dist_infos = owning_dist_infos(site_packages, roots)
+        print(f"🔗 Import closure: {len(roots)} packages/modules, {len(dist_infos)} distributions")
+
+        assemble(opts.build_dir, site_packages, roots, dist_infos, opts.creds)
+        # The pruned build must still import everything on its own
+        run_clean(CLOSURE_PROBE, [opts.build_dir])
+        precompile(opts.build_dir)
+        write_zip(opts.build_dir, opts.out)
+        report(site_packages, opts.build_dir, roots, opts.out, bench_imports(opts.build_dir, opts.runs))
+    print("\n✅ Built", opts.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""Cold-start import check for the Lambda handler.
+
+Usage (from the repo root):
+
+    python scripts/import_budget.py [--module M] [--budget-ms N] [--runs N] [--top N]
+
+Imports the module in fresh interpreters under `python -X importtime`,
+takes the median cumulative time, and lists the slowest imports. Exits 1
+when the median is over budget or when a heavy dependency that should only
+load once a stage starts (HEAVY_MODULES) is imported eagerly.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+DEFAULT_MODULE = "kane_lambda.lambda_function"
+DEFAULT_BUDGET_MS = 100.0
+HEAVY_MODULES = [
+    "feedparser",
+    "requests",
+    "googleapiclient",
+    "google.oauth2",
+    "dateutil",
+    "pytz",
+    "kane_lambda.k_headscanner",
+    "kane_lambda.k_prioritizer",
+    "kane_lambda.k_prioritizer_split",
+    "kane_lambda.k_selector",
+    "kane_lambda.k_sheet_clean",
+]
+
+# "import time:  self [us] | cumulative | imported package", nesting shown by indentation
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s*\|\s*(\d+)\s*\|( *)(\S+)\s*$")
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us, depth)] in the order -X importtime reports them."""
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return rows
+
+
+def measure(module):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.exit(f"❌ import {module} failed:\n{proc.stderr[-2000:]}")
+    return parse_importtime(proc.stderr)
+
+
+def module_total_us(rows, module):
+    return next((cumulative for name, _, cumulative, depth in rows if name == module and depth == 0), 0)
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument("--module", default=DEFAULT_MODULE)
+    args.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    args.add_argument("--runs", type=int, default=5)
+    args.add_argument("--top", type=int, default=10)
+    opts = args.parse_args()
+
+    runs = [measure(opts.module) for _ in range(opts.runs)]
+    totals_ms = [module_total_us(rows, opts.module) / 1000 for rows in runs]
+    median_ms = statistics.median(totals_ms)
+
+    # The run closest to the median is the one worth reading
+    rows = runs[min(range(len(runs)), key=lambda i: abs(totals_ms[i] - median_ms))]
+    print(f"📦 import {opts.module}: median {median_ms:.1f} ms over {opts.runs} runs "
+          f"(min {min(totals_ms):.1f}, max {max(totals_ms):.1f}); budget {opts.budget_ms:.0f} ms\n")
+    print(f"{'self ms':>9} {'cum ms':>9}  module")
+    for name, self_us, cumulative_us, depth in sorted(rows, key=lambda r: -r[1])[:opts.top]:
+        print(f"{self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}  {name}")
+
+    imported = {name for name, _, _, _ in rows}
+    eager = [m for m in HEAVY_MODULES if m in imported]
+    failed = False
+    if eager:
+        print(f"\n❌ Imported eagerly (should load when their stage starts): {', '.join(eager)}")
+        failed = True
+    if median_ms > opts.budget_ms:
+        print(f"\n❌ Import time {median_ms:.1f} ms is over the {opts.budget_ms:.0f} ms budget")
+        failed = True
+    if not failed:
+        print("\n✅ Within the cold-start import budget")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,11 @@
+import pytest
+
+from kane_lambda.k_api_scheduler import reset_scheduler
+
+
+@pytest.fixture(autouse=True)
+def fresh_scheduler():
+    # Quota windows are per scheduler; a shared one would throttle later tests
+    reset_scheduler()
+    yield
+    reset_scheduler()
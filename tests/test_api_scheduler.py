@@ -0,0 +1,89 @@
+import pytest
+
+from kane_lambda.k_api_scheduler import ApiScheduler
+
+
+class HttpError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.resp = type("Resp", (dict,), {"status": status})()
+
+
+class Request:
+    """Fails with each status in turn, then returns "done"."""
+
+    def __init__(self, *statuses, result="done"):
+        self.statuses = list(statuses)
+        self.result = result
+        self.calls = 0
+
+    def execute(self):
+        self.calls += 1
+        if self.statuses:
+            raise HttpError(self.statuses.pop(0))
+        return self.result
+
+
+@pytest.fixture
+def scheduler():
+    return ApiScheduler(backoff_cap=0)
+
+
+def test_reads_retry_transient_errors(scheduler):
+    request = Request(503, 429)
+    assert scheduler.execute(request) == "done"
+    assert request.calls == 3
+
+
+def test_writes_retry_only_rejections_by_default(scheduler):
+    request = Request(429)
+    assert scheduler.execute(request, kind="write") == "done"
+    request = Request(503)
+    with pytest.raises(HttpError):
+        scheduler.execute(request, kind="write")
+    assert request.calls == 1
+
+
+def test_writes_can_opt_in_to_transient_retries(scheduler):
+    request = Request(503, 500)
+    assert scheduler.execute(request, kind="write", retry_transient=True) == "done"
+    assert request.calls == 3
+
+
+def test_non_transient_errors_are_not_retried(scheduler):
+    request = Request(400)
+    with pytest.raises(HttpError):
+        scheduler.execute(request)
+    assert request.calls == 1
+
+
+class Values:
+    def __init__(self, fail):
+        self.fail = fail
+
+    def get(self, spreadsheetId, range):
+        return Request(*([400] if self.fail else []), result={"values": [[range]]})
+
+    def batchGet(self, spreadsheetId, ranges):
+        return Request(*([400] if self.fail else []), result={"valueRanges": [{"values": [[r]]} for r in ranges]})
+
+
+class Sheet:
+    def __init__(self, fail=False):
+        self.fail = fail
+
+    def values(self):
+        return Values(self.fail)
+
+
+def test_failed_batch_is_raised_to_every_queued_read(scheduler):
+    broken, ok = Sheet(fail=True), Sheet()
+    first = scheduler.queue_read(broken, "A", "s!A1:B2")
+    second = scheduler.queue_read(broken, "A", "s!A3:B4")
+    other = scheduler.queue_read(ok, "B", "s!A1:B2")
+    with pytest.raises(HttpError):
+        first.result()
+    with pytest.raises(HttpError):
+        second.result()
+    assert other.result() == [["s!A1:B2"]]
+    assert scheduler.pending_reads == []
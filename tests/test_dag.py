@@ -0,0 +1,123 @@
+import time
+
+import pytest
+
+from kane_lambda.k_dag import Stage, continuation, dag_ok, run_dag
+from kane_lambda.k_deadline import Deadline, DeadlineReached, get_deadline, set_deadline
+
+
+@pytest.fixture(autouse=True)
+def no_deadline():
+    set_deadline(None)
+    yield
+    set_deadline(None)
+
+
+def statuses(results):
+    return {name: r["status"] for name, r in results.items()}
+
+
+def fail():
+    raise RuntimeError("boom")
+
+
+def test_outputs_feed_downstream_stages():
+    results = run_dag([
+        Stage("a", lambda: 2, outputs=["x"]),
+        Stage("b", lambda x: {"y": x * 10}, inputs=["x"], outputs=["y"]),
+        Stage("c", lambda x, y: x + y, inputs=["x", "y"]),
+    ])
+    assert statuses(results) == {"a": "ok", "b": "ok", "c": "ok"}
+    assert results["c"]["output"] == 22
+    assert dag_ok(results)
+
+
+def test_failure_blocks_only_downstream():
+    results = run_dag([
+        Stage("a", fail, outputs=["x"]),
+        Stage("b", lambda x: x, inputs=["x"], outputs=["y"]),
+        Stage("c", lambda y: y, inputs=["y"]),
+        Stage("d", lambda: "independent"),
+    ])
+    assert statuses(results) == {"a": "failed", "b": "blocked", "c": "blocked", "d": "ok"}
+    assert results["a"]["reason"] == "RuntimeError: boom"
+    assert results["b"]["reason"] == "upstream a failed"
+    assert not dag_ok(results)
+
+
+def test_disabled_stage_is_skipped_and_dependents_run_on_initial_artifacts():
+    results = run_dag([
+        Stage("a", fail, outputs=["x"], enabled=False),
+        Stage("b", lambda x: x, inputs=["x"]),
+    ], initial={"x": "seed"})
+    assert statuses(results) == {"a": "skipped", "b": "ok"}
+    assert results["b"]["output"] == "seed"
+
+
+def stops_at_deadline(**inputs):
+    while not get_deadline().near(0.01):
+        time.sleep(0.005)
+    raise DeadlineReached("stopping", progress={"done": 3})
+
+
+def test_stage_stopping_at_its_own_timeout():
+    results = run_dag([Stage("a", stops_at_deadline, outputs=["x"], timeout=0.05)])
+    assert statuses(results) == {"a": "timeout"}
+    assert results["a"]["output"] == {"done": 3}
+    assert not get_deadline().active  # the stage deadline is removed afterwards
+
+
+def test_timed_out_middle_stage_does_not_block_downstream():
+    # Like a prioritizer stopping at its timeout: the selector still runs on what was written
+    results = run_dag([
+        Stage("a", lambda: 1, outputs=["x"]),
+        Stage("b", stops_at_deadline, inputs=["x"], outputs=["y"], timeout=0.05),
+        Stage("c", lambda y: f"selected from {y}", inputs=["y"]),
+    ])
+    assert statuses(results) == {"a": "ok", "b": "timeout", "c": "ok"}
+    assert results["c"]["output"] == "selected from None"
+    assert dag_ok(results)
+    assert continuation(results) is None
+
+
+def test_lambda_deadline_defers_stages_and_continuation_resumes():
+    clock = {"ms": 600_000}
+    lambda_deadline = set_deadline(Deadline(lambda: clock["ms"], margin_seconds=1))
+
+    def runs_out(x):
+        assert get_deadline().remaining() > 500
+        clock["ms"] = 0
+        raise DeadlineReached("out of time", progress={"batch": 2})
+
+    stages = [
+        Stage("a", lambda: 1, outputs=["x"]),
+        Stage("b", runs_out, inputs=["x"], outputs=["y"]),
+        Stage("c", lambda y: y, inputs=["y"]),
+        Stage("d", lambda x: x, inputs=["x"]),
+    ]
+    results = run_dag(stages)
+    assert statuses(results) == {"a": "ok", "b": "deferred", "c": "deferred", "d": "deferred"}
+    assert results["d"]["reason"] == "Lambda deadline reached before start"
+    assert get_deadline() is lambda_deadline
+    assert dag_ok(results)
+
+    marker = continuation(results)
+    assert marker == {"resume_from": ["b", "d"], "progress": {"b": {"batch": 2}}}
+
+    set_deadline(None)
+    stages[1].fn = lambda x: x + 1
+    resumed = run_dag(stages, initial={"x": 5}, resume_from=marker["resume_from"])
+    assert statuses(resumed) == {"a": "skipped", "b": "ok", "c": "ok", "d": "ok"}
+    assert resumed["c"]["output"] == 6
+    assert continuation(resumed) is None
+
+
+def test_invalid_graphs_are_rejected():
+    with pytest.raises(ValueError, match="unknown stage"):
+        run_dag([Stage("a", lambda: 1)], resume_from="nope")
+    with pytest.raises(ValueError, match="produced by both"):
+        run_dag([Stage("a", lambda: 1, outputs=["x"]), Stage("b", lambda: 1, outputs=["x"])])
+    with pytest.raises(ValueError, match="nothing produces"):
+        run_dag([Stage("a", lambda x: x, inputs=["x"])])
+    with pytest.raises(ValueError, match="cycle"):
+        run_dag([Stage("a", lambda y: y, inputs=["y"], outputs=["x"]), Stage("b", lambda x: x, inputs=["x"], outputs=["y"])])
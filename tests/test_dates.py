@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+
+from kane_lambda import k_dates
+from kane_lambda.k_dates import parse_date, parse_dates, to_iso_date
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_iso_date():
+    assert parse_date("2026-10-19") == utc(2026, 10, 19)
+
+
+def test_iso_datetime_is_converted_to_utc():
+    assert parse_date("2026-10-19T08:30:00+02:00") == utc(2026, 10, 19, 6, 30)
+    assert parse_date("2026-10-19 08:30:00") == utc(2026, 10, 19, 8, 30)
+
+
+def test_sheets_serial():
+    assert parse_date("46314") == utc(2026, 10, 19)
+
+
+def test_datetime_values_pass_through_as_utc():
+    assert parse_date(datetime(2026, 10, 19, 12)) == utc(2026, 10, 19, 12)
+
+
+def test_empty_values():
+    assert parse_date(None) is None
+    assert parse_date("") is None
+    assert parse_date("   ") is None
+
+
+def test_fallback_parses_other_formats_once(capsys):
+    k_dates._fallback_parse.cache_clear()
+    assert parse_date("Oct 19, 2026") == utc(2026, 10, 19)
+    assert parse_date("not a date") is None
+    assert parse_date("not a date") is None
+    assert capsys.readouterr().out.count("Failed to parse date") == 1
+    assert k_dates.cache_info().hits == 1
+
+
+def test_invalid_iso_date_is_unparseable():
+    assert parse_date("2026-02-31") is None
+
+
+def test_parse_dates_resolves_each_value_once(monkeypatch):
+    calls = []
+    real = k_dates.parse_date
+    monkeypatch.setattr(k_dates, "parse_date", lambda v: calls.append(v) or real(v))
+    out = parse_dates(["2026-10-19", "2026-10-19", "", "2026-10-18"])
+    assert out == [utc(2026, 10, 19), utc(2026, 10, 19), None, utc(2026, 10, 18)]
+    assert calls == ["2026-10-19", "", "2026-10-18"]
+
+
+def test_to_iso_date():
+    assert to_iso_date("2026-10-19T23:30:00-05:00") == "2026-10-20"
+    assert to_iso_date("garbage", default="unknown") == "unknown"
+    assert to_iso_date(None) is None
@@ -0,0 +1,42 @@
+from datetime import date
+
+import pytest
+
+from kane_lambda import config, k_doc_shards, k_emulator
+
+
+@pytest.fixture
+def emulator(monkeypatch):
+    monkeypatch.setattr(config, "GOOGLE_BACKEND", "emulator")
+    monkeypatch.setattr(k_doc_shards, "DOC_SHARE_WITH", ["editor@example.com"])
+    monkeypatch.setattr(k_doc_shards, "_resolved", {})
+    state = k_emulator.reset_state(auto_create=False)
+    state.seed_sheet("S", "headscanner", [["story_id"]])
+    yield state
+    k_emulator.reset_state()
+
+
+def test_period_rows():
+    assert k_doc_shards.period_for(date(2024, 1, 1), "month") == ("2024-01", 2)
+    assert k_doc_shards.period_for(date(2026, 10, 19), "month") == ("2026-10", 35)
+    assert k_doc_shards.period_for(date(2024, 1, 8), "week") == ("2024-W02", 3)
+    with pytest.raises(ValueError):
+        k_doc_shards.period_for(date(2023, 12, 31), "month")
+
+
+def test_creates_the_index_tab_and_one_doc_per_period(emulator):
+    doc = k_doc_shards.resolve_output_doc("S", "default", day=date(2026, 10, 19), rollover="month")
+    assert doc in emulator.documents
+    assert emulator.spreadsheets["S"]["doc_index"][34][:2] == ["2026-10", doc]
+    assert emulator.permissions[doc][0]["emailAddress"] == "editor@example.com"
+
+    k_doc_shards._resolved.clear()
+    assert k_doc_shards.resolve_output_doc("S", "default", day=date(2026, 10, 1), rollover="month") == doc
+    assert len(emulator.documents) == 1
+
+
+def test_rollover_needs_someone_to_share_with(emulator, monkeypatch):
+    monkeypatch.setattr(k_doc_shards, "DOC_SHARE_WITH", [])
+    with pytest.raises(ValueError, match="KANE_DOC_SHARE_WITH"):
+        k_doc_shards.resolve_output_doc("S", "default", rollover="week")
+    assert k_doc_shards.resolve_output_doc("S", "default", rollover="none") == "default"
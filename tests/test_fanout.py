@@ -0,0 +1,40 @@
+import pytest
+
+from kane_lambda import k_fanout
+from kane_lambda.k_deadline import Deadline, set_deadline
+
+
+@pytest.fixture
+def fanout(monkeypatch):
+    calls = {"invoked": [], "pipeline": []}
+
+    def invoke(events):
+        calls["invoked"].append(events[0]["stage"])
+        return [{"stage": e["stage"], "status": "ok", "output": 1, "seconds": 1.0, "shard": e["shard"]} for e in events]
+
+    monkeypatch.setattr(k_fanout, "plan_shards", lambda stage, count: [
+        {"mode": "shard", "stage": stage, "shard": {"index": i, "count": count}} for i in range(count)])
+    monkeypatch.setitem(k_fanout.INVOKERS, "test", invoke)
+    monkeypatch.setattr(k_fanout, "run_kane_pipeline", lambda resume_from: calls["pipeline"].append(resume_from) or {})
+    yield calls
+    set_deadline(None)
+
+
+def test_runs_the_rest_of_the_pipeline_with_time_left(fanout):
+    outcome = k_fanout.run_fanout(shards=2, invoker="test")
+    assert fanout == {"invoked": ["headscanner", "prioritizer"], "pipeline": [["selector"]]}
+    assert outcome["continuation"] is None
+
+
+def test_stops_before_a_sharded_stage_the_deadline_cannot_cover(fanout):
+    set_deadline(Deadline.after(400, margin_seconds=0))  # under the prioritizer's 480s budget
+    outcome = k_fanout.run_fanout(shards=2, invoker="test")
+    assert fanout == {"invoked": ["headscanner"], "pipeline": []}
+    assert outcome["continuation"] == {"mode": "fanout", "stages": ["prioritizer"], "shards": 2, "invoker": "test"}
+
+
+def test_stops_before_the_pipeline_at_the_deadline(fanout):
+    set_deadline(Deadline.after(0, margin_seconds=1))
+    outcome = k_fanout.run_fanout(stages=("prioritizer",), shards=2, invoker="test")
+    assert fanout == {"invoked": ["prioritizer"], "pipeline": []}
+    assert outcome["continuation"] == {"resume_from": ["selector"], "progress": {}}
@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+
+from kane_lambda.k_feedparse import fast_parse, parse_date
+
+
+def rss(dates):
+    items = "".join(
+        f"<item><title>t{i}</title><link>https://example.com/{i}</link><pubDate>{d}</pubDate></item>"
+        for i, d in enumerate(dates)
+    )
+    return f"<rss version='2.0'><channel><title>f</title>{items}</channel></rss>".encode()
+
+
+def test_rfc822_with_zone_is_converted_to_utc():
+    assert parse_date("Mon, 06 Jan 2025 10:00:00 +0100")[:6] == (2025, 1, 6, 9, 0, 0)
+
+
+def test_zoneless_rfc822_is_read_as_utc():
+    assert parse_date("Mon, 06 Jan 2025 10:00:00")[:6] == (2025, 1, 6, 10, 0, 0)
+
+
+def test_iso_dates_and_junk():
+    assert parse_date("2025-01-06T10:00:00+02:00")[:6] == (2025, 1, 6, 8, 0, 0)
+    assert parse_date("2025-01-06T10:00:00")[:6] == (2025, 1, 6, 10, 0, 0)
+    assert parse_date("not a date") is None
+    assert parse_date("") is None
+
+
+def test_stops_after_a_run_of_old_entries():
+    new, old = "Mon, 06 Jan 2025 10:00:00 +0000", "Mon, 30 Dec 2024 10:00:00 +0000"
+    cutoff = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    feed = fast_parse(rss([new, old, new, old, old, old, new]), cutoff=cutoff, stale_run=3)
+    assert feed.stopped_early
+    assert [e["link"] for e in feed.entries] == [f"https://example.com/{i}" for i in range(6)]
+    assert not fast_parse(rss([new, old, new]), cutoff=cutoff, stale_run=3).stopped_early
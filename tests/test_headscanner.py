@@ -0,0 +1,41 @@
+from itertools import count
+
+from kane_lambda.k_headscanner import interleave
+
+
+def feed(prefix, n=None):
+    return iter(f"{prefix}{i}" for i in (count() if n is None else range(n)))
+
+
+def untouched():
+    raise AssertionError("stream was read")
+    yield
+
+
+def items(pairs):
+    return [item for _, item in pairs]
+
+
+def test_equal_weights_take_turns_and_skip_dry_streams():
+    out = items(interleave([feed("R"), feed("a", 3), feed("b", 10)], [1, 1, 1], [None] * 3, 12))
+    assert out == ["R0", "a0", "b0", "R1", "a1", "b1", "R2", "a2", "b2", "R3", "R4", "b3"]
+
+
+def test_weights_set_the_share():
+    out = items(interleave([feed("R"), feed("a")], [2, 1], [None, None], 9))
+    assert out == ["R0", "a0", "R1", "R2", "a1", "R3", "R4", "a2", "R5"]
+
+
+def test_quota_caps_a_stream():
+    pairs = list(interleave([feed("R"), feed("a")], [1, 1], [None, 2], 6))
+    assert items(pairs) == ["R0", "a0", "R1", "a1", "R2", "R3"]
+    assert [i for i, _ in pairs].count(1) == 2
+
+
+def test_weight_or_quota_of_zero_never_reads_the_stream():
+    assert items(interleave([feed("R"), untouched()], [1, 0], [None, None], 3)) == ["R0", "R1", "R2"]
+    assert items(interleave([feed("R"), untouched()], [1, 1], [None, 0], 3)) == ["R0", "R1", "R2"]
+
+
+def test_stops_when_every_stream_is_dry():
+    assert items(interleave([feed("a", 1), feed("b", 2)], [1, 1], [None, None], 10)) == ["a0", "b0", "b1"]
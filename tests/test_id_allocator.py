@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from kane_lambda import config, k_emulator, k_id_allocator
+from kane_lambda.k_id_allocator import reserve_story_ids
+
+
+@pytest.fixture
+def emulator(monkeypatch):
+    monkeypatch.setattr(config, "GOOGLE_BACKEND", "emulator")
+    state = k_emulator.reset_state(auto_create=False)
+    state.seed_sheet("S", "headscanner", [["story_id"]])
+    yield state
+    k_emulator.reset_state()
+
+
+def reserve(count, spreadsheet_id="S"):
+    return list(reserve_story_ids(spreadsheet_id, count, backend="sheet"))
+
+
+def test_reservations_take_consecutive_ids_and_create_the_tab(emulator):
+    assert reserve(3) == [100001, 100002, 100003]
+    assert reserve(2) == [100004, 100005]
+    assert [r[1:] for r in emulator.spreadsheets["S"]["id_blocks"]] == [["3", "3", "100003"], ["2", "2", "100005"]]
+
+
+def test_legacy_rows_take_a_whole_block(emulator):
+    emulator.seed_sheet("L", "id_blocks", [["2026-01-01T00:00:00Z", "40"], ["2026-01-02T00:00:00Z", "12"]])
+    assert reserve(5, "L") == list(range(102001, 102006))
+    assert reserve(1, "L") == [102006]
+
+
+def test_reads_back_only_to_the_last_recorded_id(emulator, monkeypatch):
+    monkeypatch.setattr(k_id_allocator, "ID_ALLOCATOR_READ_ROWS", 2)
+    for _ in range(5):
+        reserve(1)
+    # A reservation that never recorded its last ID
+    emulator.spreadsheets["S"]["id_blocks"][4] = emulator.spreadsheets["S"]["id_blocks"][4][:3]
+    emulator.calls.clear()
+    assert reserve(10) == list(range(100006, 100016))
+    assert emulator.calls["sheets.values.get"] == 1
+
+
+def test_concurrent_reservations_never_overlap(emulator):
+    with ThreadPoolExecutor(8) as pool:
+        blocks = list(pool.map(reserve, range(1, 21)))
+    ids = [i for block in blocks for i in block]
+    assert len(ids) == len(set(ids)) == sum(range(1, 21))
+    assert max(ids) == 100000 + len(ids)
@@ -0,0 +1,17 @@
+import importlib.util
+import os
+import statistics
+
+SCRIPT = os.path.join(os.path.dirname(__file__), "..", "scripts", "import_budget.py")
+spec = importlib.util.spec_from_file_location("import_budget", SCRIPT)
+import_budget = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(import_budget)
+
+
+def test_handler_import_stays_light_and_within_budget():
+    module = import_budget.DEFAULT_MODULE
+    runs = [import_budget.measure(module) for _ in range(3)]
+    imported = {name for rows in runs for name, _, _, _ in rows}
+    assert [m for m in import_budget.HEAVY_MODULES if m in imported] == []
+    median_ms = statistics.median(import_budget.module_total_us(rows, module) / 1000 for rows in runs)
+    assert median_ms <= import_budget.DEFAULT_BUDGET_MS
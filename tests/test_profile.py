@@ -0,0 +1,40 @@
+import pytest
+
+from kane_lambda import k_profile
+from kane_lambda.k_profile import configure, profiled
+
+
+@pytest.fixture
+def profile_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(k_profile, "PROFILE_ROOT", str(tmp_path))
+    configure("busy", "cpu,memory")
+    yield tmp_path
+    configure()
+
+
+def busy():
+    with profiled("busy"):
+        sum(i * i for i in range(10000))
+
+
+def test_writes_reports_to_the_profile_root(profile_root, monkeypatch):
+    monkeypatch.delenv("AWS_LAMBDA_FUNCTION_NAME", raising=False)
+    busy()
+    written = sorted(p.suffix for p in profile_root.rglob("*busy*"))
+    assert written == [".pstats", ".txt"]
+
+
+def test_only_logs_in_lambda_with_a_local_root(profile_root, monkeypatch, capsys):
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "kane")
+    busy()
+    assert not list(profile_root.rglob("*"))
+    assert "not saved" in capsys.readouterr().out
+
+
+def test_unknown_kinds_are_ignored(capsys):
+    configure("busy", "cpu,disk")
+    try:
+        assert k_profile.event_settings() == {"profile": ["busy"], "profile_kinds": ["cpu"]}
+        assert "Ignoring unknown profile kinds ['disk']" in capsys.readouterr().out
+    finally:
+        configure()
@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+
+from kane_lambda.k_selection import composite_score, select_top_stories, source_key
+
+NOW = datetime(2026, 10, 19, 12, tzinfo=timezone.utc)
+
+
+def story(n, category="Product_Research", score=5, source="SRC", summary=None, **extra):
+    return {
+        "story_id": str(n),
+        "category": category,
+        "significance_score": str(score),
+        "source_name": source,
+        "fact_summary": summary if summary is not None else f"headline{n} detail{n}",
+        "publication_date": "2026-10-19",
+        **extra,
+    }
+
+
+def ids(stories):
+    return [s["story_id"] for s in stories]
+
+
+def test_composite_score_weights_relevance_priority_and_recency():
+    base = composite_score(story(1, score=4, publication_date="2026-10-01"), NOW)
+    assert base == 4.0  # older than the recency window
+    assert composite_score(story(1, score=4, relevant="TRUE", publication_date="2026-10-01"), NOW) == 7.0
+    assert composite_score(story(1, score=4, human_priority="1", publication_date="2026-10-01"), NOW) == 9.0
+    assert composite_score(story(1, score=4, publication_date="2026-10-19T12:00:00Z"), NOW) == 6.0
+
+
+def test_keeps_best_per_category_and_earliest_row_on_ties():
+    stories = [story(i, score=s, source=f"S{i}") for i, s in enumerate([3, 9, 5, 9, 1, 7, 7, 2])]
+    selected = select_top_stories(stories, per_category=4, now=NOW)
+    assert ids(selected["Product_Research"]) == ["1", "3", "5", "6"]
+
+
+def test_filters_categories():
+    stories = [story(1, category="Policy_Geopolitics", source="A"), story(2, source="B")]
+    selected = select_top_stories(stories, categories=["Product_Research"], now=NOW)
+    assert list(selected) == ["Product_Research"]
+    assert ids(selected["Product_Research"]) == ["2"]
+
+
+def test_per_source_cap_spans_categories():
+    stories = [
+        story(1, score=9, source="SAME"),
+        story(2, score=8, source="SAME", category="Policy_Geopolitics"),
+        story(3, score=7, source="SAME"),
+        story(4, score=1, source="OTHER"),
+    ]
+    selected = select_top_stories(stories, per_source_cap=2, now=NOW)
+    assert ids(selected["Product_Research"]) == ["1", "4"]
+    assert ids(selected["Policy_Geopolitics"]) == ["2"]
+
+
+def test_drops_near_duplicate_blurbs():
+    stories = [
+        story(1, score=9, source="A", summary="chip maker raises $2bn for new fab"),
+        story(2, score=8, source="B", summary="chip maker raises $2bn for a new fab"),
+        story(3, score=1, source="C", summary="regulator opens inquiry into cloud deals"),
+    ]
+    selected = select_top_stories(stories, dedup_threshold=0.6, now=NOW)
+    assert ids(selected["Product_Research"]) == ["1", "3"]
+
+
+def test_candidate_heap_absorbs_caps():
+    # The top stories all share a source; lower-ranked ones must still fill the category
+    stories = [story(i, score=10, source="SAME") for i in range(10)]
+    stories += [story(100 + i, score=1, source=f"S{i}") for i in range(5)]
+    selected = select_top_stories(stories, per_category=3, per_source_cap=1, candidate_factor=4, now=NOW)
+    assert ids(selected["Product_Research"]) == ["0", "100", "101"]
+
+
+def test_source_key_falls_back_to_domain():
+    assert source_key({"source_name": " reuters "}) == "REUTERS"
+    assert source_key({"source_url": "https://www.ft.com/content/1"}) == "ft.com"
@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from kane_lambda import config, k_emulator, k_sheet_clean
+from kane_lambda.k_sheet_clean import SPREADSHEET_ID, clean_sheets
+
+
+@pytest.fixture
+def emulator(monkeypatch):
+    monkeypatch.setattr(config, "GOOGLE_BACKEND", "emulator")
+    monkeypatch.setattr(k_sheet_clean, "ENABLE_ARCHIVE", False)
+    state = k_emulator.reset_state(auto_create=True)
+    yield state
+    k_emulator.reset_state()
+
+
+def day(days_ago):
+    return (datetime.now(timezone.utc) - timedelta(days=days_ago)).strftime("%Y-%m-%d")
+
+
+def test_keeps_row_order_and_renumbers(emulator):
+    emulator.seed_sheet(SPREADSHEET_ID, "prioritizer", [
+        ["story_id", "publication_date", "significance_score"],
+        ["10", day(1), "5"],
+        ["11", day(3), "5"],
+        ["12", day(30), "9"],  # expired
+        ["13", day(2), "1"],   # low score
+        ["14", day(0), "7"],
+    ])
+    emulator.seed_sheet(SPREADSHEET_ID, "headscanner", [
+        ["story_id", "headline"], ["10", "a"], ["11", "b"], ["11", "b again"], ["12", "c"], ["13", "d"], ["14", "e"],
+    ])
+
+    assert clean_sheets() == 3
+    tabs = emulator.spreadsheets[SPREADSHEET_ID]
+    assert tabs["prioritizer"][1:] == [["1", day(1), "5"], ["2", day(3), "5"], ["3", day(0), "7"]]
+    assert tabs["headscanner"][1:] == [["1", "a"], ["2", "b"], ["3", "e"]]
+    assert tabs["prioritizer_index"][1] == ["2", "4", day(3), day(0)]
@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+
+from kane_lambda.k_emulator import EmulatorState, SheetsService
+from kane_lambda.k_sheet_index import appended_rows, block_entry, gap_rows, plan_ranges, read_rows_since, rebuild_index
+
+
+def test_appended_rows():
+    assert appended_rows({"updates": {"updatedRange": "'headscanner'!A5:K9"}}) == (5, 9)
+    assert appended_rows({"updates": {"updatedRange": "s!A7"}}) == (7, 7)
+    assert appended_rows({}) is None
+
+
+def test_block_entry_bounds():
+    rows = [["1", "2026-10-18"], ["2", "Oct 19, 2026"], ["3"], ["4", "garbage"]]
+    assert block_entry(10, rows, 1) == [10, 13, "2026-10-18", "2026-10-19"]
+    assert block_entry(2, [["1", ""]], 1) == [2, 2, "", ""]
+
+
+def test_plan_ranges_fetches_recent_blocks_and_gaps():
+    entries = [
+        (2, 3, "2026-10-01", "2026-10-02"),   # old
+        (4, 5, "2026-10-17", "2026-10-18"),   # recent
+        (6, 7, "2026-10-18", "2026-10-19"),   # recent, merged with the one above
+        (10, 11, "2026-10-01", "2026-10-01"),  # old, but rows 8-9 are a gap
+        (12, 13, "", ""),                      # no dates: never fetched by date
+    ]
+    spans, next_row = plan_ranges(entries, "2026-10-18")
+    assert spans == [(4, 9)]
+    assert next_row == 14
+    assert gap_rows(entries) == 2
+
+
+def test_plan_ranges_leading_gap_and_overlap():
+    spans, next_row = plan_ranges([(5, 8, "2026-10-19", "2026-10-19"), (7, 9, "2026-10-19", "2026-10-19")],
+                                  "2026-10-18")
+    assert spans == [(2, 9)]
+    assert next_row == 10
+
+
+def test_plan_ranges_without_entries():
+    assert plan_ranges([], "2026-10-18") == ([], 2)
+
+
+def test_read_rows_since_skips_old_blocks_and_reads_the_tail(capsys):
+    state = EmulatorState(auto_create=True)
+    dates = ["2026-10-01", "2026-10-02", "2026-10-03", "2026-10-18", "2026-10-19", "2026-10-19"]
+    rows = [[str(i), d] for i, d in enumerate(dates)]
+    state.seed_sheet("S", "stories", [["story_id", "date"]] + rows)
+    sheet = SheetsService(state).spreadsheets()
+    rebuild_index(sheet, "S", "stories", rows, date_column=1, block_rows=2)
+    state.spreadsheets["S"]["stories"].append(["6", "2026-10-01"])  # appended without an index entry
+
+    got = list(read_rows_since(sheet, "S", "stories", datetime(2026, 10, 18, tzinfo=timezone.utc), last_column="B"))
+    assert got[0] == ["story_id", "date"]
+    assert [r[0] for r in got[1:]] == ["2", "3", "4", "5", "6"]
+    assert "Read 4 of 6 indexed 'stories' rows since 2026-10-18, plus 1 unindexed" in capsys.readouterr().out
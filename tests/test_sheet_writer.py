@@ -0,0 +1,86 @@
+import pytest
+
+from kane_lambda import k_sheet_writer
+from kane_lambda.k_emulator import EmulatorState, SheetsService
+from kane_lambda.k_sheet_writer import SheetAppendBuffer, contiguous_runs
+
+
+class HttpError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.resp = type("Resp", (), {"status": status})()
+
+
+class FlakySheet:
+    """Emulator sheet whose data appends follow `script`: "ok", "landed-503" (written, then 503) or "lost-503"."""
+
+    def __init__(self, state, script):
+        self.sheet = SheetsService(state).spreadsheets()
+        self.script = list(script)
+        self.reads = []
+
+    def values(self):
+        return FlakyValues(self)
+
+
+class FlakyValues:
+    def __init__(self, flaky):
+        self.flaky = flaky
+        self.values = flaky.sheet.values()
+
+    def append(self, **kwargs):
+        request = self.values.append(**kwargs)
+        return request if kwargs["range"].endswith("_index!A1") else FlakyAppend(self.flaky, request)
+
+    def get(self, spreadsheetId, range, **kwargs):
+        self.flaky.reads.append(range)
+        return self.values.get(spreadsheetId=spreadsheetId, range=range, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.values, name)
+
+
+class FlakyAppend:
+    def __init__(self, flaky, request):
+        self.flaky = flaky
+        self.request = request
+
+    def execute(self):
+        step = self.flaky.script.pop(0) if self.flaky.script else "ok"
+        if step == "lost-503":
+            raise HttpError(503)
+        result = self.request.execute()
+        if step == "landed-503":
+            raise HttpError(503)
+        return result
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(k_sheet_writer.time, "sleep", lambda seconds: None)
+
+
+def story_rows(*ids):
+    return [[str(i), f"2026-10-{10 + i:02d}"] for i in ids]
+
+
+def test_contiguous_runs():
+    assert contiguous_runs([(5, "c"), (2, "a"), (3, "b")]) == [[(2, "a"), (3, "b")], [(5, "c")]]
+    assert contiguous_runs([]) == []
+
+
+def test_rows_that_landed_before_an_error_are_indexed_once():
+    state = EmulatorState()
+    state.seed_sheet("S", "out", [["story_id", "date"]])
+    flaky = FlakySheet(state, ["ok", "landed-503", "lost-503", "ok"])
+    with SheetAppendBuffer(flaky, "S", "out", max_rows=2, key_column=0, index_date_column=1) as buffer:
+        buffer.extend(story_rows(1, 2, 3, 4, 5, 6))
+
+    assert [r[0] for r in state.spreadsheets["S"]["out"][1:]] == ["1", "2", "3", "4", "5", "6"]
+    index = state.spreadsheets["S"]["out_index"]
+    entries = [r for r in index if r and r[0].isdigit()]
+    assert entries == [["2", "3", "2026-10-11", "2026-10-12"],
+                       ["4", "5", "2026-10-13", "2026-10-14"],
+                       ["6", "7", "2026-10-15", "2026-10-16"]]
+    # Key checks start after the rows already confirmed
+    assert flaky.reads == ["out!A4:A", "out!A6:A"]